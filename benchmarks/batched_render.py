@@ -0,0 +1,81 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Compares frames per second of rendering every variation as a still image with rendering
+batches of variations as one animation job.
+
+Run inside blender:
+    blender -b -P benchmarks/batched_render.py -- --input_path ./input_images --frames 32 --batch_size 16
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sim2real_docs.batch_render import get_batches, render_batch
+from sim2real_docs.config import (
+    Variation_tuple,
+    default_config_path,
+    get_render_names,
+    get_required_files,
+    get_variations,
+)
+from sim2real_docs.scene_graph import SceneGraph
+from sim2real_docs.scene_utils import Scene
+from sim2real_docs.utils import install_addons, render_scene
+
+
+def get_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--batch_size", type=int, default=16)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = get_arguments()
+    with open(default_config_path) as f:
+        config = json.load(f)
+    # a single document so that consecutive variations can share a batch
+    image_file = get_required_files(args.input_path)[0]
+    render_names = get_render_names(image_file, args.frames)
+    scene_params, light_params, camera_params, _, image_params = get_variations(
+        args.frames, config, [image_file] * args.frames, [], render_names
+    )
+    variations = [
+        Variation_tuple(*variation)
+        for variation in zip(
+            render_names, scene_params, light_params, camera_params, image_params
+        )
+    ]
+    install_addons()
+    save_path = tempfile.mkdtemp()
+
+    scene_graph = SceneGraph(args.input_path)
+    start = time.perf_counter()
+    for variation in variations:
+        scene_graph.apply_variation(
+            variation.scene, variation.camera, variation.light, variation.image
+        )
+        render_scene(
+            save_path, variation.render_name, scene_graph.camera.camera_object.name
+        )
+    still_fps = args.frames / (time.perf_counter() - start)
+    Scene(None).clear_scene()
+
+    scene_graph = SceneGraph(args.input_path)
+    start = time.perf_counter()
+    for batch in get_batches(variations, args.batch_size):
+        render_batch(scene_graph, batch, save_path)
+    batch_fps = args.frames / (time.perf_counter() - start)
+    Scene(None).clear_scene()
+    print("per still render: {:.3f} frames/sec".format(still_fps))
+    print("batched render: {:.3f} frames/sec".format(batch_fps))
+    print("rendered images are in {}".format(os.path.abspath(save_path)))
+
+
+main()
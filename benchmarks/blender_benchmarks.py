@@ -0,0 +1,207 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Tier 2 benchmarks, run inside headless blender on synthetic documents:
+scene setup and teardown, image import, bounding boxes from the scene, tiny low sample renders,
+the time per frame of the render presets and analytical masks against the object index pass.
+Results are added to the json file written by benchmarks/run_benchmarks.py.
+
+    blender -b --factory-startup -P benchmarks/blender_benchmarks.py -- --output results.json --frames 20
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (
+    print_results,
+    repository_path,
+    time_benchmark,
+    write_results,
+    write_synthetic_document,
+)
+
+sys.path.insert(0, repository_path)
+import bpy
+
+from sim2real_docs.config import (
+    apply_render_preset,
+    default_config_path,
+    get_variations,
+    render_presets,
+)
+from sim2real_docs.image_utils import create_image_plane
+from sim2real_docs.masks import get_document_mask, get_mask_iou, read_mask
+from sim2real_docs.run_variations import (
+    run_camera_settings,
+    run_image_settings,
+    run_light_settings,
+    run_scene_settings,
+)
+from sim2real_docs.scene_graph import SceneGraph
+from sim2real_docs.scene_utils import Scene
+from sim2real_docs.segmentation import SegmentationGraph, get_document_view_polygons
+from sim2real_docs.utils import (
+    get_collection_name,
+    image_3d_to_2d_coords,
+    install_addons,
+    render_scene,
+)
+
+# frames rendered with every render preset
+preset_frames = 3
+
+
+def get_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--frames", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def get_synthetic_variations(
+    input_path: str, frames: int, render_preset: str = None, resolution: int = 64
+):
+    """
+    Variations of the default configuration over a few synthetic documents, rendered at resolution x resolution.
+    With a render preset, the render quality settings of the preset are used
+    """
+    image_files = []
+    for i in range(4):
+        image_files.append("document_{}.png".format(i))
+        write_synthetic_document(os.path.join(input_path, image_files[-1]))
+    with open(default_config_path) as f:
+        config = json.load(f)
+    config["scene_configs"]["resolution"] = {"range": [[resolution, resolution]]}
+    config["scene_configs"]["render_engine"] = {"range": ["CYCLES"]}
+    if render_preset is not None:
+        config["scene_configs"]["resolution_percentage"] = {"range": [100, 100]}
+        config["scene_configs"]["render_preset"] = render_preset
+        apply_render_preset(config)
+    scene_params, light_params, camera_params, _, image_params = get_variations(
+        frames, config, [image_files[i % 4] for i in range(frames)], []
+    )
+    return list(zip(scene_params, light_params, camera_params, image_params))
+
+
+def rebuild_frame(variation, input_path: str, use_bpy_ops: bool):
+    scene_variation, light_variation, camera_variation, image_variation = variation
+    scene = run_scene_settings(scene_variation, use_bpy_ops=use_bpy_ops)
+    run_camera_settings(camera_variation, get_collection_name())
+    run_light_settings(light_variation, use_bpy_ops=use_bpy_ops)
+    run_image_settings(
+        image_variation, input_path, scene_variation, use_bpy_ops=use_bpy_ops
+    )
+    scene.clear_scene()
+
+
+def render_frame(scene_graph, variation, save_path: str):
+    scene_graph.apply_variation(*[variation[i] for i in [0, 2, 1, 3]])
+    render_scene(save_path, "frame.png", scene_graph.camera.camera_object.name, False)
+
+
+def run_frames(setup_frame, variations):
+    for variation in variations:
+        setup_frame(variation)
+
+
+def main():
+    args = get_arguments()
+    input_path = tempfile.mkdtemp()
+    save_path = tempfile.mkdtemp()
+    variations = get_synthetic_variations(input_path, args.frames)
+    install_addons()
+    results = {}
+    for use_bpy_ops in [True, False]:
+        suffix = "bpy_ops" if use_bpy_ops else "bpy_data"
+        results["scene.rebuild_{}".format(suffix)] = time_benchmark(
+            lambda: run_frames(
+                lambda v: rebuild_frame(v, input_path, use_bpy_ops), variations
+            ),
+            repeats=3,
+        )
+        scene_graph = SceneGraph(input_path, use_bpy_ops=use_bpy_ops)
+        results["scene.reuse_{}".format(suffix)] = time_benchmark(
+            lambda: run_frames(
+                lambda v: scene_graph.apply_variation(v[0], v[2], v[1], v[3]),
+                variations,
+            ),
+            repeats=3,
+        )
+        Scene(None, use_bpy_ops).clear_scene()
+    image_filepath = os.path.join(input_path, variations[0][3].image_name)
+    results["image.import_bpy_data"] = time_benchmark(
+        lambda: create_image_plane(image_filepath, "document"),
+        repeats=3,
+        number=args.frames,
+    )
+    Scene(None, False).clear_scene()
+    scene_graph = SceneGraph(input_path, use_bpy_ops=False)
+    scene_variation = variations[0][0]
+    scene_graph.apply_variation(*[variations[0][i] for i in [0, 2, 1, 3]])
+    image_object = scene_graph.image.image_object
+    vertices = [
+        image_object.matrix_world @ vertex.co for vertex in image_object.data.vertices
+    ]
+    results["bbox.image_3d_to_2d_coords"] = time_benchmark(
+        lambda: image_3d_to_2d_coords(vertices, scene_variation),
+        repeats=5,
+        number=1000,
+    )
+    bpy.context.scene.cycles.samples = 1
+    results["render.tiny_cycles_1_sample"] = time_benchmark(
+        lambda: render_scene(
+            save_path, "tiny.png", scene_graph.camera.camera_object.name, False
+        ),
+        repeats=3,
+    )
+    # analytical mask of the tiny render against the mask of the object index pass
+    segmentation_graph = SegmentationGraph(save_path)
+    segmentation_graph.set_frame(image_object, scene_variation, "mask.png")
+    render_scene(save_path, "mask.png", scene_graph.camera.camera_object.name, False)
+    segmentation_graph.clear()
+    view_polygons = get_document_view_polygons(
+        image_object, scene_graph.camera.camera_object
+    )
+    results["segmentation.analytical_mask"] = time_benchmark(
+        lambda: get_document_mask(view_polygons, scene_variation),
+        repeats=5,
+        number=100,
+    )
+    # the file output node adds the frame number to the file name
+    index_mask = read_mask(os.path.join(save_path, "mask0001.png"))
+    results["segmentation.analytical_mask"]["iou"] = get_mask_iou(
+        get_document_mask(view_polygons, scene_variation), index_mask
+    )
+    Scene(None, False).clear_scene()
+    # time per frame of the render presets at 512 x 512
+    for render_preset in render_presets:
+        preset_variations = get_synthetic_variations(
+            input_path, args.frames, render_preset, resolution=512
+        )
+        scene_graph = SceneGraph(input_path, use_bpy_ops=False)
+        results["render.preset_{}".format(render_preset)] = time_benchmark(
+            lambda: run_frames(
+                lambda v: render_frame(scene_graph, v, save_path),
+                preset_variations[:preset_frames],
+            ),
+            repeats=1,
+        )
+        Scene(None, False).clear_scene()
+    shutil.rmtree(input_path)
+    shutil.rmtree(save_path)
+    # times of the scene and preset benchmarks are per frame
+    for name in results:
+        frames = len(variations) if name.startswith("scene.") else preset_frames
+        if name.startswith("scene.") or name.startswith("render.preset_"):
+            for key in ["min", "median", "mean", "stdev"]:
+                results[name][key] /= frames
+    print_results(results)
+    write_results(results, os.path.abspath(args.output), tier=2)
+
+
+main()
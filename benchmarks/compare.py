@@ -0,0 +1,147 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Compares two benchmark results files, or runs the tier 1 benchmarks on two commits and compares them.
+Benchmarks slower than the threshold are reported as regressions and the exit code is 1.
+
+    python benchmarks/compare.py base_results.json head_results.json
+    python benchmarks/compare.py --commits main HEAD
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import repository_path
+
+
+def load_results(results_path: str):
+    with open(results_path) as f:
+        return json.load(f)["benchmarks"]
+
+
+def compare_results(base: dict, head: dict, threshold: float = 0.1):
+    """
+    Ratio of head to base median time of every benchmark present in both results.
+    Returns the rows of the comparison and the names of the regressed benchmarks
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(base) | set(head)):
+        if name not in base or name not in head:
+            rows.append(
+                (
+                    name,
+                    None,
+                    None,
+                    "only in {}".format("head" if name in head else "base"),
+                )
+            )
+            continue
+        if "skipped" in base[name] or "skipped" in head[name]:
+            rows.append((name, None, None, "skipped"))
+            continue
+        ratio = head[name]["median"] / base[name]["median"]
+        if ratio > 1 + threshold:
+            status = "slower"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = ""
+        rows.append((name, base[name]["median"], head[name]["median"], status))
+    return rows, regressions
+
+
+def print_comparison(rows: list):
+    print(
+        "{:45} {:>12} {:>12} {:>8}".format(
+            "benchmark", "base (ms)", "head (ms)", "ratio"
+        )
+    )
+    for name, base_time, head_time, status in rows:
+        if base_time is None:
+            print("{:45} {:>12} {:>12} {:>8} {}".format(name, "-", "-", "-", status))
+        else:
+            print(
+                "{:45} {:>12.3f} {:>12.3f} {:>8.2f} {}".format(
+                    name,
+                    1000 * base_time,
+                    1000 * head_time,
+                    head_time / base_time,
+                    status,
+                )
+            )
+
+
+def run_commit(commit: str, results_path: str, benchmark_args: list):
+    """
+    Checks the commit out in a temporary worktree and runs the tier 1 benchmarks of the current checkout against it
+    """
+    worktree = tempfile.mkdtemp()
+    subprocess.run(
+        ["git", "-C", repository_path, "worktree", "add", "--detach", worktree, commit],
+        check=True,
+    )
+    try:
+        # the benchmark scripts of the current checkout are used on both commits so that the same work is measured
+        benchmarks_path = os.path.join(worktree, "benchmarks")
+        shutil.rmtree(benchmarks_path, ignore_errors=True)
+        shutil.copytree(os.path.dirname(os.path.abspath(__file__)), benchmarks_path)
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.join(benchmarks_path, "run_benchmarks.py"),
+                "--output",
+                results_path,
+            ]
+            + benchmark_args,
+            check=True,
+        )
+    finally:
+        subprocess.run(
+            ["git", "-C", repository_path, "worktree", "remove", "--force", worktree],
+            check=True,
+        )
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("results", nargs="*", help="base and head results files")
+    parser.add_argument("--commits", nargs=2, metavar=("BASE", "HEAD"))
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument(
+        "--benchmark_args",
+        default="",
+        help="arguments passed to run_benchmarks.py with --commits, e.g. '--scale 2'",
+    )
+    args = parser.parse_args(argv)
+    if args.commits is not None:
+        results_paths = []
+        for commit in args.commits:
+            results_paths.append(
+                os.path.abspath(
+                    "benchmark_results_{}.json".format(commit.replace("/", "_"))
+                )
+            )
+            run_commit(commit, results_paths[-1], args.benchmark_args.split())
+    else:
+        assert (
+            len(args.results) == 2
+        ), "Provide two results files or --commits BASE HEAD"
+        results_paths = args.results
+    rows, regressions = compare_results(
+        load_results(results_paths[0]), load_results(results_paths[1]), args.threshold
+    )
+    print_comparison(rows)
+    if len(regressions) > 0:
+        print("Regressions above {:.0%}: {}".format(args.threshold, regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
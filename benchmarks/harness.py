@@ -0,0 +1,118 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Timing and result helpers shared by the benchmark scripts.
+Results are written as json so that runs on two commits can be compared with benchmarks/compare.py.
+"""
+import json
+import os
+import platform
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_benchmark(function, repeats: int = 5, number: int = 1, setup=None):
+    """
+    Runs function number times per repeat and returns statistics of the time per call in seconds.
+    setup is called before every repeat and its result is passed to function
+    """
+    timings = []
+    for _ in range(repeats):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        for _ in range(number):
+            function(argument) if setup is not None else function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "repeats": repeats,
+        "number": number,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "-C", repository_path, "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_environment():
+    environment = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import numpy
+
+        environment["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+    if "bpy" in sys.modules:
+        environment["blender"] = sys.modules["bpy"].app.version_string
+    return environment
+
+
+def write_results(results: dict, output_path: str, tier: int):
+    """
+    Writes benchmark results, merging them into an existing results file so both tiers can share one file
+    """
+    document = {"environment": get_environment(), "benchmarks": {}}
+    if os.path.exists(output_path):
+        with open(output_path) as f:
+            document["benchmarks"] = json.load(f).get("benchmarks", {})
+    for name, result in results.items():
+        document["benchmarks"][name] = dict(result, tier=tier)
+    with open(output_path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def print_results(results: dict):
+    for name, result in results.items():
+        if "skipped" in result:
+            print("{}: skipped - {}".format(name, result["skipped"]))
+        else:
+            print(
+                "{}: median {:.3f} ms, min {:.3f} ms".format(
+                    name, 1000 * result["median"], 1000 * result["min"]
+                )
+            )
+
+
+def write_synthetic_document(filepath: str, width: int = 850, height: int = 1100):
+    """
+    Writes an 8 bit RGB png of a white page with dark text-like lines, without any imaging library
+    """
+    rows = []
+    for y in range(height):
+        line = y % 40 < 8 and 60 < y < height - 60
+        pixel = b"\x20\x20\x20" if line else b"\xf5\xf5\xf5"
+        margin = b"\xf5\xf5\xf5" * 60
+        rows.append(b"\x00" + margin + pixel * (width - 120) + margin)
+
+    def chunk(chunk_type, data):
+        body = chunk_type + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    with open(filepath, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(b"".join(rows), 6)))
+        f.write(chunk(b"IEND", b""))
+    return filepath
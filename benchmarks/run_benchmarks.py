@@ -0,0 +1,375 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Benchmark suite of sim2real_docs.
+Tier 1 runs in plain python - parameter sampling, configuration parsing, metadata serialization and bounding box math.
+Tier 2 runs in headless blender (benchmarks/blender_benchmarks.py) - scene setup and teardown, image import,
+bounding boxes from the scene and tiny low sample renders of synthetic documents.
+Results of both tiers are written to one json file, compare two of them with benchmarks/compare.py.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --tier all --blender_path blender --output results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (
+    print_results,
+    repository_path,
+    time_benchmark,
+    write_results,
+    write_synthetic_document,
+)
+
+# the sim2real_docs package of this checkout is benchmarked, not an installed one
+sys.path.insert(0, repository_path)
+default_config_path = os.path.join(
+    repository_path, "sim2real_docs", "default_config.json"
+)
+
+
+def get_config():
+    with open(default_config_path) as f:
+        return json.load(f)
+
+
+def get_table(n_variations: int):
+    import numpy as np
+    from sim2real_docs.create_random_values import sample_parameters
+
+    return sample_parameters(
+        n_variations,
+        get_config(),
+        ["document.png"],
+        ["background.png"],
+        np.random.default_rng(0),
+    )
+
+
+def get_records(n_records: int):
+    from sim2real_docs.config import get_parameter_record
+    from sim2real_docs.create_random_values import get_other_blender_parameters
+
+    config = get_config()
+    other_parameters = get_other_blender_parameters(config["others"])
+    table = get_table(n_records)
+    records = []
+    for i in range(n_records):
+        scene, light, camera, image = table.get_variation(i)
+        records.append(
+            get_parameter_record(scene, light, camera, image, other_parameters)
+        )
+    return records
+
+
+def benchmark_sample_parameters(scale):
+    import numpy as np
+    from sim2real_docs.create_random_values import sample_parameters
+
+    config = get_config()
+    return time_benchmark(
+        lambda: sample_parameters(
+            100000 * scale, config, ["document.png"], [], np.random.default_rng(0)
+        ),
+        repeats=5,
+    )
+
+
+def benchmark_sample_seeded(scale):
+    import numpy as np
+    from sim2real_docs.create_random_values import (
+        get_name_hashes,
+        get_variation_seeds,
+        sample_parameters,
+    )
+
+    config = get_config()
+    n_variations = 100000 * scale
+    variation_seeds = get_variation_seeds(
+        0,
+        get_name_hashes(["document.png"])[np.zeros(n_variations, dtype=int)],
+        np.arange(n_variations),
+    )
+    return time_benchmark(
+        lambda: sample_parameters(
+            n_variations, config, ["document.png"], [], variation_seeds=variation_seeds
+        ),
+        repeats=5,
+    )
+
+
+def benchmark_table_rows(scale):
+    table = get_table(10000 * scale)
+    return time_benchmark(
+        lambda: [table.get_variation(i) for i in range(len(table))], repeats=3
+    )
+
+
+def benchmark_generate_variations(scale):
+    from sim2real_docs.config import generate_variations
+
+    input_path = tempfile.mkdtemp()
+    try:
+        for i in range(10):
+            write_synthetic_document(
+                os.path.join(input_path, "document_{}.png".format(i)), 85, 110
+            )
+        config = get_config()
+        return time_benchmark(
+            lambda: list(
+                generate_variations(
+                    input_path, config, "range", num_times=1000 * scale, seed=0
+                )
+            ),
+            repeats=3,
+        )
+    finally:
+        shutil.rmtree(input_path)
+
+
+def benchmark_discover_files(scale):
+    from sim2real_docs.file_utils import iter_files, listing_cache
+
+    input_path = tempfile.mkdtemp()
+    try:
+        for i in range(10000 * scale):
+            directory = os.path.join(input_path, "folder_{}".format(i % 100))
+            os.makedirs(directory, exist_ok=True)
+            open(os.path.join(directory, "document_{}.png".format(i)), "w").close()
+
+        def discover():
+            # the in process listing cache is cleared so that every repeat scans the directory
+            listing_cache.clear()
+            return list(iter_files(input_path, recursive=True))
+
+        return time_benchmark(discover, repeats=5)
+    finally:
+        shutil.rmtree(input_path)
+
+
+def benchmark_parse_configurations(scale):
+    from sim2real_docs.config import get_render_variations
+
+    text = json.dumps(get_records(10000 * scale))
+    return time_benchmark(lambda: get_render_variations(json.loads(text)), repeats=3)
+
+
+def benchmark_stream_configurations(scale):
+    from sim2real_docs.config import generate_variations, get_configuration_file
+
+    records = get_records(10000 * scale)
+    save_path = tempfile.mkdtemp()
+    try:
+        configurations_path = os.path.join(save_path, "configurations.json")
+        with open(configurations_path, "w") as f:
+            json.dump(records, f)
+
+        def stream_variations():
+            configurations, config_type = get_configuration_file(
+                None, configurations_path
+            )
+            for _ in generate_variations(None, configurations, config_type):
+                pass
+
+        return time_benchmark(stream_variations, repeats=3)
+    finally:
+        shutil.rmtree(save_path)
+
+
+def benchmark_serialize_metadata(scale):
+    records = get_records(10000 * scale)
+    return time_benchmark(lambda: json.dumps(records), repeats=5)
+
+
+def benchmark_journal(scale):
+    from sim2real_docs.journal import MetadataJournal
+
+    records = get_records(1000 * scale)
+
+    def write_journal(save_path):
+        journal = MetadataJournal(save_path)
+        for i, record in enumerate(records):
+            journal.append("image_{}.png".format(i), "image_{}.png".format(i), record)
+        journal.compact(os.path.join(save_path, "metadata.json"))
+        journal.close()
+        shutil.rmtree(save_path)
+
+    return time_benchmark(write_journal, repeats=3, setup=tempfile.mkdtemp)
+
+
+def benchmark_metadata_store(scale):
+    from sim2real_docs.metadata_store import MetadataStore, write_store
+
+    records = get_records(10000 * scale)
+
+    def write_read_store(store_path):
+        write_store(records, store_path)
+        store = MetadataStore(store_path)
+        store.get_image_bbs()[:].sum()
+        store.get_record(len(store) // 2)
+        store.close()
+        shutil.rmtree(store_path)
+
+    return time_benchmark(write_read_store, repeats=3, setup=tempfile.mkdtemp)
+
+
+def benchmark_project_quads(scale):
+    import numpy as np
+    from sim2real_docs.projection import get_table_quads
+
+    table = get_table(100000 * scale)
+    plane_aspects = np.full(len(table), 850 / 1100)
+    return time_benchmark(lambda: get_table_quads(table, plane_aspects), repeats=5)
+
+
+def benchmark_acceptance(scale):
+    import numpy as np
+    from sim2real_docs.acceptance import Acceptance_tuple, get_accepted
+
+    table = get_table(100000 * scale)
+    plane_aspects = np.full(len(table), 850 / 1100)
+    acceptance = Acceptance_tuple(min_visible_fraction=0.9, min_size=64)
+    return time_benchmark(
+        lambda: get_accepted(table, plane_aspects, acceptance), repeats=5
+    )
+
+
+def benchmark_image_writer(scale):
+    import numpy as np
+    from PIL import Image as PILImage
+    from sim2real_docs.image_writer import ImageWriter
+
+    pixels = np.random.default_rng(0).integers(0, 255, (512, 512, 4), np.uint8)
+
+    def stage_images():
+        # staged files are written before the timing starts, blender saves them before they are submitted
+        image_writer = ImageWriter(tempfile.mkdtemp())
+        staging_files = []
+        for i in range(20 * scale):
+            staging_files.append(image_writer.get_staging_file("image_{}".format(i)))
+            PILImage.fromarray(pixels).save(staging_files[-1], compress_level=0)
+        return image_writer, staging_files
+
+    def write_images(staged):
+        image_writer, staging_files = staged
+        for i, staging_file in enumerate(staging_files):
+            image_writer.submit(staging_file, "image_{}.png".format(i))
+        image_writer.close()
+        shutil.rmtree(image_writer.save_path)
+
+    return time_benchmark(write_images, repeats=3, setup=stage_images)
+
+
+def benchmark_render_cache(scale):
+    from sim2real_docs.render_cache import RenderCache
+
+    records = get_records(1000 * scale)
+
+    def fill_cache():
+        path = tempfile.mkdtemp()
+        document_path = os.path.join(path, "document.png")
+        write_synthetic_document(document_path, 85, 110)
+        render_cache = RenderCache(os.path.join(path, "cache"))
+        for record in records:
+            key = render_cache.get_key(record, [document_path])
+            render_cache.store(key, {"image": document_path}, [], 1.0)
+        return path, document_path
+
+    def restore_renders(cache):
+        path, document_path = cache
+        render_cache = RenderCache(os.path.join(path, "cache"))
+        for i, record in enumerate(records):
+            key = render_cache.get_key(record, [document_path])
+            render_cache.restore(
+                key, {"image": os.path.join(path, "out", "image_{}.png".format(i))}
+            )
+        assert render_cache.hits == len(records)
+        shutil.rmtree(path)
+
+    return time_benchmark(restore_renders, repeats=3, setup=fill_cache)
+
+
+tier_1_benchmarks = {
+    "sampling.sample_parameters_100k": benchmark_sample_parameters,
+    "sampling.sample_seeded_100k": benchmark_sample_seeded,
+    "sampling.table_rows_10k": benchmark_table_rows,
+    "sampling.generate_variations_10k": benchmark_generate_variations,
+    "files.discover_recursive_10k": benchmark_discover_files,
+    "config.parse_all_configurations_10k": benchmark_parse_configurations,
+    "config.stream_all_configurations_10k": benchmark_stream_configurations,
+    "metadata.serialize_10k": benchmark_serialize_metadata,
+    "metadata.journal_1k": benchmark_journal,
+    "metadata.columnar_store_10k": benchmark_metadata_store,
+    "bbox.project_quads_100k": benchmark_project_quads,
+    "bbox.acceptance_100k": benchmark_acceptance,
+    "io.image_writer_20": benchmark_image_writer,
+    "io.render_cache_hits_1k": benchmark_render_cache,
+}
+
+
+def run_tier_1(scale: int = 1, names: list = None):
+    """
+    Runs the plain python benchmarks. Benchmarks whose modules cannot be imported without blender are skipped
+    """
+    results = {}
+    for name, benchmark in tier_1_benchmarks.items():
+        if names is not None and name not in names:
+            continue
+        try:
+            results[name] = benchmark(scale)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+    return results
+
+
+def run_tier_2(output_path: str, blender_path: str, frames: int):
+    """
+    Runs the blender benchmarks in a headless blender process, they add their results to output_path
+    """
+    script = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "blender_benchmarks.py"
+    )
+    command = [
+        blender_path,
+        "-b",
+        "--factory-startup",
+        "-P",
+        script,
+        "--",
+        "--output",
+        output_path,
+        "--frames",
+        str(frames),
+    ]
+    subprocess.run(command, check=True)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--tier", choices=["1", "2", "all"], default="1")
+    parser.add_argument("--blender_path", default="blender")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--benchmarks", nargs="*", default=None)
+    args = parser.parse_args(argv)
+    output_path = os.path.abspath(args.output)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    if args.tier in ["1", "all"]:
+        results = run_tier_1(args.scale, args.benchmarks)
+        print_results(results)
+        write_results(results, output_path, tier=1)
+    if args.tier in ["2", "all"]:
+        run_tier_2(output_path, args.blender_path, args.frames)
+    print("Results are in {}".format(output_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measures the per-frame scene setup time (everything except the render itself) when the scene is
+cleared and rebuilt for every variation and when the scene objects are reused, each with and
+without bpy operators.
+
+Run inside blender:
+    blender -b -P benchmarks/scene_setup.py -- --input_path ./input_images --frames 1000
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from sim2real_docs.config import (
+    default_config_path,
+    get_required_files,
+    get_variations,
+    run_background_check,
+)
+from sim2real_docs.run_variations import (
+    run_camera_settings,
+    run_image_settings,
+    run_light_settings,
+    run_scene_settings,
+)
+from sim2real_docs.scene_graph import SceneGraph
+from sim2real_docs.utils import (
+    add_n_scale_background_image,
+    get_collection_name,
+    install_addons,
+)
+
+
+def get_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--bg_images_path", default=None)
+    parser.add_argument("--frames", type=int, default=1000)
+    return parser.parse_args(argv)
+
+
+def rebuild_frame(variation, input_path, bg_images_path, use_bpy_ops):
+    scene_variation, light_variation, camera_variation, image_variation = variation
+    scene = run_scene_settings(scene_variation, use_bpy_ops=use_bpy_ops)
+    run_camera_settings(camera_variation, get_collection_name())
+    run_light_settings(light_variation, use_bpy_ops=use_bpy_ops)
+    run_image_settings(
+        image_variation, input_path, scene_variation, use_bpy_ops=use_bpy_ops
+    )
+    if image_variation.background_image_name:
+        add_n_scale_background_image(image_variation, bg_images_path, use_bpy_ops)
+    scene.clear_scene()
+
+
+def time_frames(setup_frame, variations):
+    timings = []
+    for variation in variations:
+        start = time.perf_counter()
+        setup_frame(variation)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    args = get_arguments()
+    with open(default_config_path) as f:
+        config = json.load(f)
+    files = get_required_files(args.input_path)
+    files = (files * (args.frames // len(files) + 1))[: args.frames]
+    bg_images = run_background_check(args.bg_images_path)
+    scene_params, light_params, camera_params, _, image_params = get_variations(
+        args.frames, config, files, bg_images
+    )
+    variations = list(zip(scene_params, light_params, camera_params, image_params))
+    install_addons()
+
+    results = []
+    for use_bpy_ops in [True, False]:
+        suffix = "bpy.ops" if use_bpy_ops else "bpy.data"
+        rebuild = time_frames(
+            lambda v: rebuild_frame(
+                v, args.input_path, args.bg_images_path, use_bpy_ops
+            ),
+            variations,
+        )
+        results.append(("rebuild, " + suffix, rebuild))
+        scene_graph = SceneGraph(args.input_path, args.bg_images_path, use_bpy_ops)
+
+        def reuse_frame(variation):
+            scene_variation, light_variation, camera_variation, image_variation = (
+                variation
+            )
+            scene_graph.apply_variation(
+                scene_variation, camera_variation, light_variation, image_variation
+            )
+            scene_graph.set_background(image_variation)
+
+        results.append(("reuse, " + suffix, time_frames(reuse_frame, variations)))
+        run_scene_settings(variations[0][0]).clear_scene()
+    for name, timings in results:
+        print(
+            "{}: mean {:.2f} ms, median {:.2f} ms per frame over {} frames".format(
+                name,
+                1000 * statistics.mean(timings),
+                1000 * statistics.median(timings),
+                len(timings),
+            )
+        )
+
+
+main()
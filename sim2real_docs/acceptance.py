@@ -0,0 +1,197 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Acceptance stage between sampling and rendering.
+Document quads of sampled variations are projected with the numpy camera model and variations showing the document
+mostly cropped out, behind the camera or too small are sampled again before any render time is spent on them.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .create_random_values import get_attempt_seeds, sample_parameters
+from .projection import get_quad_loops, get_rendered_sizes, get_table_quads
+
+acceptance_options = [
+    "min_visible_fraction",
+    "min_size",
+    "max_corners_out",
+    "max_attempts",
+]
+Acceptance_tuple = namedtuple(
+    "AcceptanceParameters", acceptance_options, defaults=[0.0, 0.0, 4, 10]
+)
+
+
+def get_acceptance_parameters(acceptance_configs: dict):
+    """
+    Acceptance criteria from the acceptance_configs section of the configuration file
+    """
+    unknown = set(acceptance_configs) - set(acceptance_options)
+    assert len(unknown) == 0, "Unknown acceptance parameters {}".format(sorted(unknown))
+    return Acceptance_tuple(**acceptance_configs)
+
+
+def fill_invalid_points(points, valid):
+    """
+    Moves the valid points of every polygon to the front and repeats the last valid point in place of the others.
+    Repeated points add zero length edges, so area and extent of the polygon do not change
+    """
+    order = np.argsort(~valid, axis=1, kind="stable")
+    points = np.take_along_axis(points, order[..., None], axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    n_valid = valid.sum(axis=1)
+    points = points[:, : max(int(n_valid.max()), 1)]
+    last = np.maximum(n_valid - 1, 0)
+    index = np.minimum(np.arange(points.shape[1]), last[:, None])
+    points = np.take_along_axis(points, index[..., None], axis=1)
+    # polygons completely outside collapse to the origin
+    points[n_valid == 0] = 0.0
+    return points
+
+
+def clip_polygons(polygons, axis: int, limit, keep_below: bool):
+    """
+    Sutherland-Hodgman clipping of (n, k, 2) convex polygons against one side of the image, for all polygons at once
+    """
+    sign = -1.0 if keep_below else 1.0
+    limit = np.asarray(limit, dtype=float)[:, None]
+    start = polygons
+    end = np.roll(polygons, -1, axis=1)
+    start_inside = sign * (start[..., axis] - limit) >= 0
+    end_inside = sign * (end[..., axis] - limit) >= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (limit - start[..., axis]) / (end[..., axis] - start[..., axis])
+    t = np.where(start_inside != end_inside, t, 0.0)
+    intersection = start + t[..., None] * (end - start)
+    # every edge adds up to two points - the intersection when it crosses the side and its end point when inside
+    points = np.stack([intersection, end], axis=2).reshape(len(polygons), -1, 2)
+    valid = np.stack([start_inside != end_inside, end_inside], axis=2).reshape(
+        len(polygons), -1
+    )
+    return fill_invalid_points(points, valid)
+
+
+def get_polygon_areas(polygons):
+    """
+    Shoelace formula for (n, k, 2) polygons
+    """
+    x, y = polygons[..., 0], polygons[..., 1]
+    return 0.5 * np.abs(
+        (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1)
+    )
+
+
+def get_quad_statistics(quads, depth, rendered_sizes):
+    """
+    Visible area fraction, visible size in pixels (shorter side of the visible bounding box)
+    and number of corners outside the rendered image, for (n, 4, 2) document quads in the corner order of
+    project_document_quads
+    """
+    quads = get_quad_loops(quads)
+    width, height = rendered_sizes[:, 0], rendered_sizes[:, 1]
+    zeros = np.zeros(len(quads))
+    visible = quads
+    for axis, limit, keep_below in [
+        (0, zeros, False),
+        (0, width, True),
+        (1, zeros, False),
+        (1, height, True),
+    ]:
+        visible = clip_polygons(visible, axis, limit, keep_below)
+    quad_areas = get_polygon_areas(quads)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        visible_fraction = np.where(
+            quad_areas > 0, get_polygon_areas(visible) / quad_areas, 0.0
+        )
+    visible_size = (visible.max(axis=1) - visible.min(axis=1)).min(axis=1)
+    corners_out = (
+        (quads[..., 0] < 0)
+        | (quads[..., 0] > width[:, None])
+        | (quads[..., 1] < 0)
+        | (quads[..., 1] > height[:, None])
+        | (depth <= 0)
+    ).sum(axis=1)
+    # projected corners behind the camera are mirrored, the document is not in the image
+    behind_camera = (depth <= 0).any(axis=1)
+    visible_fraction[behind_camera] = 0.0
+    visible_size[behind_camera] = 0.0
+    return visible_fraction, visible_size, corners_out
+
+
+def get_accepted(table, plane_aspects, acceptance: namedtuple):
+    """
+    Boolean mask of the rows of a ParameterTable meeting the acceptance criteria
+    """
+    quads, depth = get_table_quads(table, plane_aspects, return_depth=True)
+    resolution = table.get_column("resolution")
+    rendered_sizes = get_rendered_sizes(
+        resolution[:, 0],
+        resolution[:, 1],
+        table.get_column("resolution_percentage"),
+        table.get_column("crop_min_x"),
+        table.get_column("crop_max_x"),
+        table.get_column("crop_min_y"),
+        table.get_column("crop_max_y"),
+    )
+    visible_fraction, visible_size, corners_out = get_quad_statistics(
+        quads, depth, rendered_sizes
+    )
+    return (
+        (visible_fraction >= acceptance.min_visible_fraction)
+        & (visible_size >= acceptance.min_size)
+        & (corners_out <= acceptance.max_corners_out)
+    )
+
+
+def sample_accepted_parameters(
+    n_variations: int,
+    configs: dict,
+    image_files: list,
+    bg_list: list,
+    rng: np.random.Generator,
+    image_indices: np.ndarray,
+    plane_aspects: np.ndarray,
+    acceptance: namedtuple,
+    variation_seeds: np.ndarray = None,
+):
+    """
+    Samples a ParameterTable and samples the rejected rows again, for the same documents, up to max_attempts times.
+    plane_aspects gives the aspect ratio of every image file.
+    With variation_seeds, every attempt of a variation is sampled from a seed derived from its variation seed,
+    so the accepted parameters of a variation do not depend on the other variations.
+    Returns the table, a mask of the accepted rows and the number of rejected samples
+    """
+    table = sample_parameters(
+        n_variations,
+        configs,
+        image_files,
+        bg_list,
+        rng,
+        image_indices,
+        variation_seeds,
+    )
+    row_aspects = np.asarray(plane_aspects)[image_indices]
+    accepted = get_accepted(table, row_aspects, acceptance)
+    n_rejected = int((~accepted).sum())
+    for attempt in range(1, acceptance.max_attempts):
+        rows = np.flatnonzero(~accepted)
+        if len(rows) == 0:
+            break
+        resampled = sample_parameters(
+            len(rows),
+            configs,
+            image_files,
+            bg_list,
+            rng,
+            image_indices[rows],
+            (
+                get_attempt_seeds(variation_seeds[rows], attempt)
+                if variation_seeds is not None
+                else None
+            ),
+        )
+        table.set_rows(rows, resampled)
+        accepted[rows] = get_accepted(resampled, row_aspects[rows], acceptance)
+        n_rejected += int((~accepted[rows]).sum())
+    return table, accepted, n_rejected
@@ -0,0 +1,216 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Renders consecutive variations as a single animation job.
+Variations that share the document, background and the settings blender cannot animate are keyframed on frames 1..K
+and rendered with one animation render. Scene sync, BVH build and kernel setup are done once per batch instead of
+once per image, and persistent data keeps them between batches.
+"""
+
+import os
+import time
+from collections import namedtuple
+
+import bpy
+
+from .create_random_values import render_quality_options
+from .masks import get_document_mask, write_mask
+from .segmentation import get_document_view_polygons
+from .file_utils import create_parent_dir, get_output_name
+from .utils import image_3d_to_2d_coords
+
+# scene settings that change between variations, keyframed when blender can animate them
+scene_properties = [
+    ("render", "resolution_x"),
+    ("render", "resolution_y"),
+    ("render", "resolution_percentage"),
+    ("render", "pixel_aspect_x"),
+    ("render", "pixel_aspect_y"),
+    ("render", "border_min_x"),
+    ("render", "border_min_y"),
+    ("render", "border_max_x"),
+    ("render", "border_max_y"),
+    ("view_settings", "exposure"),
+]
+
+
+def get_scene_values(scene_variation: namedtuple):
+    """
+    Values of the scene settings above for a variation. Exposure is reset to the same value for every variation
+    """
+    return [
+        scene_variation.resolution_x,
+        scene_variation.resolution_y,
+        scene_variation.resolution_percentage,
+        scene_variation.aspect_ratio[0],
+        scene_variation.aspect_ratio[1],
+        scene_variation.crop_min_x,
+        scene_variation.crop_min_y,
+        scene_variation.crop_max_x,
+        scene_variation.crop_max_y,
+        1.0,
+    ]
+
+
+def is_animatable(struct_name: str, property_name: str):
+    struct = getattr(bpy.context.scene, struct_name)
+    return struct.bl_rna.properties[property_name].is_animatable
+
+
+def get_batch_key(
+    scene_variation: namedtuple,
+    light_variation: namedtuple,
+    image_variation: namedtuple,
+):
+    """
+    Variations with the same key can be rendered in one batch.
+    The key holds everything that is not keyframed - images, light type, render engine, color mode, contrast,
+    render quality settings and the scene settings blender cannot animate
+    """
+    key = [
+        image_variation.image_name,
+        image_variation.background_image_name,
+        light_variation.light_type,
+        scene_variation.render_engine,
+        scene_variation.color_mode,
+        scene_variation.contrast,
+    ]
+    key.extend(getattr(scene_variation, option) for option in render_quality_options)
+    for (struct_name, property_name), value in zip(
+        scene_properties, get_scene_values(scene_variation)
+    ):
+        if not is_animatable(struct_name, property_name):
+            key.append(value)
+    return tuple(key)
+
+
+def get_batches(variations, batch_size: int):
+    """
+    Groups consecutive variations with the same batch key into batches of at most batch_size variations
+    """
+    batch = []
+    batch_key = None
+    for variation in variations:
+        key = get_batch_key(variation.scene, variation.light, variation.image)
+        if len(batch) > 0 and (key != batch_key or len(batch) == batch_size):
+            yield batch
+            batch = []
+        batch.append(variation)
+        batch_key = key
+    if len(batch) > 0:
+        yield batch
+
+
+def insert_keyframes(scene_graph, frame: int):
+    """
+    Keyframes camera, light, document, crop and exposure values of the current variation
+    """
+    camera = scene_graph.camera.camera_object
+    light = scene_graph.light.light_object
+    image = scene_graph.image.image_object
+    for data_path in ["location", "rotation_euler"]:
+        camera.keyframe_insert(data_path, frame=frame)
+    camera.data.keyframe_insert("lens", frame=frame)
+    for data_path in ["location", "color"]:
+        light.keyframe_insert(data_path, frame=frame)
+    light.data.keyframe_insert("energy", frame=frame)
+    for data_path in ["location", "rotation_euler", "scale"]:
+        image.keyframe_insert(data_path, frame=frame)
+    scene = bpy.context.scene
+    for struct_name, property_name in scene_properties:
+        if is_animatable(struct_name, property_name):
+            scene.keyframe_insert(
+                "{}.{}".format(struct_name, property_name), frame=frame
+            )
+
+
+def get_animated_ids(scene_graph):
+    return [
+        scene_graph.camera.camera_object,
+        scene_graph.camera.camera_object.data,
+        scene_graph.light.light_object,
+        scene_graph.light.light_object.data,
+        scene_graph.image.image_object,
+        bpy.context.scene,
+    ]
+
+
+def set_constant_interpolation(scene_graph):
+    """
+    Values are held between keyframes so that every frame renders exactly its variation
+    """
+    for animated_id in get_animated_ids(scene_graph):
+        if animated_id.animation_data is None:
+            continue
+        for fcurve in animated_id.animation_data.action.fcurves:
+            for keyframe in fcurve.keyframe_points:
+                keyframe.interpolation = "CONSTANT"
+
+
+def clear_keyframes(scene_graph):
+    for animated_id in get_animated_ids(scene_graph):
+        animated_id.animation_data_clear()
+
+
+def render_batch(scene_graph, variations: list, save_path: str, mask_path: str = None):
+    """
+    Keyframes the variations on frames 1..K, renders them with one animation render
+    and renames the frames to the files a still render of every variation writes, so batched and still runs
+    name the same variation the same way. With mask_path, analytical masks of the frames are written there.
+    Returns bounding boxes and rendered file name of every variation
+    """
+    scene = bpy.context.scene
+    for frame, variation in enumerate(variations, start=1):
+        scene_graph.apply_variation(
+            variation.scene, variation.camera, variation.light, variation.image
+        )
+        scene_graph.set_background(variation.image)
+        insert_keyframes(scene_graph, frame)
+    set_constant_interpolation(scene_graph)
+    # bounding boxes are calculated from the evaluated animation, same as the rendered frames
+    image_bbs = []
+    image = scene_graph.image.image_object
+    for frame, variation in enumerate(variations, start=1):
+        scene.frame_set(frame)
+        vertices = [image.matrix_world @ vertex.co for vertex in image.data.vertices]
+        image_bbs.append(image_3d_to_2d_coords(vertices, variation.scene))
+        if mask_path is not None:
+            view_polygons = get_document_view_polygons(
+                image, scene_graph.camera.camera_object
+            )
+            write_mask(
+                get_document_mask(view_polygons, variation.scene),
+                mask_path,
+                variation.render_name,
+            )
+    scene.frame_start = 1
+    scene.frame_end = len(variations)
+    scene.render.filepath = os.path.join(save_path, "batch_")
+    # persistent data keeps the scene between the frames of the batch, the persistent_data of the variations
+    # applies again to later renders
+    use_persistent_data = scene.render.use_persistent_data
+    scene.render.use_persistent_data = True
+    start = time.perf_counter()
+    try:
+        bpy.ops.render.render(animation=True)
+    finally:
+        scene.render.use_persistent_data = use_persistent_data
+    elapsed = time.perf_counter() - start
+    print(
+        "Rendered {} frames in {:.2f} s ({:.2f} frames/sec)".format(
+            len(variations), elapsed, len(variations) / elapsed
+        )
+    )
+    output_files = []
+    file_format = scene.render.image_settings.file_format
+    for frame, variation in enumerate(variations, start=1):
+        # e.g. doc_0.jpg is renamed to doc_0.png as render_scene writes it
+        output_file = get_output_name(variation.render_name, file_format)
+        create_parent_dir(os.path.join(save_path, output_file))
+        os.replace(
+            scene.render.frame_path(frame=frame), os.path.join(save_path, output_file)
+        )
+        output_files.append(output_file)
+    clear_keyframes(scene_graph)
+    scene.frame_set(1)
+    return list(zip(image_bbs, output_files))
@@ -41,3 +41,9 @@ class Camera:
         Function sets the camera focal length
         """
         self.camera_object.data.lens = self.camera_configs.camera_focal_length
+
+    def update_configs(self, camera_configs: namedtuple):
+        """
+        Function replaces the camera variation so the same camera object can be reused for the next image
+        """
+        self.camera_configs = camera_configs
@@ -6,42 +6,142 @@ The script generates variations for the parameters using configuration file and
 import json
 import os
 from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
 from .create_random_values import (
-    get_camera_parameters,
-    get_light_parameters,
-    get_scene_parameters,
+    get_name_hashes,
     get_other_blender_parameters,
-    get_image_parameters,
+    get_run_seed,
+    get_variation_seeds,
+    sample_parameters,
     Scene_tuple,
     Camera_tuple,
     Light_tuple,
     Image_tuple,
     other_parameter_tuple,
+    render_quality_options,
 )
 from pathlib import Path
-from .utils import check_path_exists
-from .create_random_values import other_parameter_tuple
+from .acceptance import get_acceptance_parameters, sample_accepted_parameters
+from .projection import get_plane_aspects
+from .file_utils import check_path_exists, iter_files, valid_image_formats
+from .config_stream import ConfigurationStream, iter_configurations
 
 current_dir = Path(__file__).parent
 default_config_path = os.path.join(current_dir, "default_config.json")
+# number of documents whose variations are sampled together by generate_variations
+sampling_chunk_size = 4096
+
+# render quality presets for the flat document scenes, selected with "render_preset" in scene_configs.
+# Values given in scene_configs take precedence. The presets are not tuned against measured render times and no
+# time per frame is recorded for them, as it depends on the blender version and the render device.
+# benchmarks/blender_benchmarks.py measures it on the target machine (render.preset_draft,
+# render.preset_train and render.preset_hq)
+render_presets = {
+    "draft": {
+        "samples": {"range": [16, 16]},
+        "adaptive_threshold": {"range": [0.1, 0.1]},
+        "max_bounces": {"range": [2, 2]},
+        "denoiser": {"range": ["OPENIMAGEDENOISE"]},
+        "tile_size": {"range": [2048]},
+        "persistent_data": {"range": [True]},
+    },
+    "train": {
+        "samples": {"range": [32, 96]},
+        "adaptive_threshold": {"range": [0.02, 0.05]},
+        "max_bounces": {"range": [4, 4]},
+        "denoiser": {"range": ["OPENIMAGEDENOISE", "NONE"], "weights": [3, 1]},
+        "tile_size": {"range": [2048]},
+        "persistent_data": {"range": [True]},
+    },
+    "hq": {
+        "samples": {"range": [512, 512]},
+        "adaptive_threshold": {"range": [0.005, 0.005]},
+        "max_bounces": {"range": [12, 12]},
+        "denoiser": {"range": ["OPENIMAGEDENOISE"]},
+        "tile_size": {"range": [2048]},
+        "persistent_data": {"range": [True]},
+    },
+}
+
+# a variation to render, render_name is the name of the rendered image
+Variation_tuple = namedtuple(
+    "Variation", ["render_name", "scene", "light", "camera", "image"]
+)
+
+
+def get_configuration_file(user_configs: str, user_all_configs: str):
+    """
+    Decides on the configuration file to use.
+    """
+    if user_configs == None and user_all_configs == None:
+        with open(default_config_path) as f:
+            default_config = json.load(f)
+        return apply_render_preset(default_config), "range"
+    elif user_configs != None and user_all_configs == None:
+        with open(user_configs) as f:
+            user_configs_values = json.load(f)
+        return apply_render_preset(user_configs_values), "range"
+    elif user_configs == None and user_all_configs != None:
+        # records are read from the file one at a time while the variations are rendered
+        return ConfigurationStream(user_all_configs), "all"
+
+
+def apply_render_preset(configs: dict):
+    """
+    Adds the render quality settings of the preset named in scene_configs, settings already in scene_configs are kept
+    """
+    scene_configs = configs.get("scene_configs", {})
+    if "render_preset" not in scene_configs:
+        return configs
+    preset = scene_configs["render_preset"]
+    assert (
+        preset in render_presets
+    ), "Unknown render preset {}, available presets are {}".format(
+        preset, list(render_presets)
+    )
+    for key, value in render_presets[preset].items():
+        scene_configs.setdefault(key, value)
+    return configs
 
 
 def get_required_files(
-    path: str,
-    valid_formats: list = [".jpg", ".jpeg", ".jp2", ".png", ".bmp", ".tiff", ".tif"],
+    path: str, valid_formats: list = valid_image_formats, recursive: bool = False
 ):
     """
     This function determines number of iteration required.
     From the give path, it calculates number of images present
     Right now we support the image formats which are  in [".jpg", ".jpeg", ".jp2", ".png", ".bmp", ".tiff", ".tif"]
+    in any case. With recursive, files in sub directories are included with their path relative to path.
+    The files listed in the manifest of path are used when there is one, listings are cached for the process
     """
-    files = os.listdir(path)
-    files = [image for image in files if os.path.splitext(image)[1] in valid_formats]
+    files = list(iter_files(path, valid_formats, recursive))
     files_present = len(files)
     print("Number of files present in the given path is {}".format(files_present))
     return files
 
 
+def get_parameter_record(
+    scene_param: namedtuple,
+    light_param: namedtuple,
+    camera_param: namedtuple,
+    image_param: namedtuple,
+    other_params: namedtuple,
+):
+    """
+    This function creates the metadata entry of a single variation
+    """
+    iteration_dict = {}
+    iteration_dict.update({"scene_configs": scene_param._asdict()})
+    iteration_dict.update({"light_configs": light_param._asdict()})
+    iteration_dict.update({"camera_configs": camera_param._asdict()})
+    iteration_dict.update({"image_configs": image_param._asdict()})
+    iteration_dict.update({"other_configs": other_params._asdict()})
+    return iteration_dict
+
+
 def parameter_file(
     scene_params: list,
     light_params: list,
@@ -50,77 +150,106 @@ def parameter_file(
     save_path: str,
     n_variations: int,
     other_params: namedtuple,
+    metadata_name: str = "metadata.json",
 ):
     """
     This function stores parameters used for rendering the image set in a json file.
     """
-    all_parameters = []
-    for i in range(n_variations):
-        iteration_dict = {}
-        iteration_dict.update({"scene_configs": scene_params[i]._asdict()})
-        iteration_dict.update({"light_configs": light_params[i]._asdict()})
-        iteration_dict.update({"camera_configs": camera_params[i]._asdict()})
-        iteration_dict.update({"image_configs": image_params[i]._asdict()})
-        iteration_dict.update({"other_configs": other_params._asdict()})
-        all_parameters.append(iteration_dict)
-    with open(os.path.join(save_path, "metadata.json"), "w") as f:
+    all_parameters = [
+        get_parameter_record(
+            scene_params[i],
+            light_params[i],
+            camera_params[i],
+            image_params[i],
+            other_params,
+        )
+        for i in range(n_variations)
+    ]
+    with open(os.path.join(save_path, metadata_name), "w") as f:
         json.dump(all_parameters, f)
 
 
+def get_record_variation(config: dict):
+    """
+    The function creates the named tuples of a single variation from the user configuration file
+    """
+    scene_parameters = Scene_tuple(
+        aspect_ratio=config["scene_configs"]["aspect_ratio"],
+        color_mode=config["scene_configs"]["color_mode"],
+        exposure_value=config["scene_configs"]["exposure_value"],
+        contrast=config["scene_configs"]["contrast"],
+        crop_min_x=config["scene_configs"]["crop_min_x"],
+        crop_max_x=config["scene_configs"]["crop_max_x"],
+        crop_min_y=config["scene_configs"]["crop_min_y"],
+        crop_max_y=config["scene_configs"]["crop_max_y"],
+        resolution_x=config["scene_configs"]["resolution_x"],
+        resolution_y=config["scene_configs"]["resolution_y"],
+        resolution_percentage=config["scene_configs"]["resolution_percentage"],
+        render_engine=config["scene_configs"]["render_engine"],
+        # render quality settings are optional, records written before they were added leave them to blender
+        **{
+            option: config["scene_configs"].get(option)
+            for option in render_quality_options
+        },
+    )
+    camera_parameters = Camera_tuple(
+        camera_x_location=config["camera_configs"]["camera_x_location"],
+        camera_y_location=config["camera_configs"]["camera_y_location"],
+        camera_z_location=config["camera_configs"]["camera_z_location"],
+        camera_focal_length=config["camera_configs"]["camera_focal_length"],
+        camera_x_rotation=config["camera_configs"]["camera_x_rotation"],
+        camera_y_rotation=config["camera_configs"]["camera_y_rotation"],
+        camera_z_rotation=config["camera_configs"]["camera_z_rotation"],
+    )
+    light_parameters = Light_tuple(
+        light_energies=config["light_configs"]["light_energies"],
+        light_x_location=config["light_configs"]["light_x_location"],
+        light_y_location=config["light_configs"]["light_y_location"],
+        light_z_location=config["light_configs"]["light_z_location"],
+        color_hue=config["light_configs"]["color_hue"],
+        color_saturation=config["light_configs"]["color_saturation"],
+        color_value=config["light_configs"]["color_value"],
+        light_type=config["light_configs"]["light_type"],
+    )
+    image_parameters = Image_tuple(
+        image_x_scale=config["image_configs"]["image_x_scale"],
+        image_y_scale=config["image_configs"]["image_y_scale"],
+        image_z_scale=config["image_configs"]["image_z_scale"],
+        image_x_rotation=config["image_configs"]["image_x_rotation"],
+        image_y_rotation=config["image_configs"]["image_y_rotation"],
+        image_z_rotation=config["image_configs"]["image_z_rotation"],
+        image_bbs=config["image_configs"]["image_bbs"],
+        image_name=config["image_configs"]["image_name"],
+        background_image_name=config["image_configs"]["background_image_name"],
+        # metadata files written before render names were added are rendered with the image name
+        render_name=config["image_configs"].get(
+            "render_name", config["image_configs"]["image_name"]
+        ),
+        variation_seed=config["image_configs"].get("variation_seed"),
+    )
+    return scene_parameters, light_parameters, camera_parameters, image_parameters
+
+
 def get_render_variations(config_values):
     """
     The function gets all the variation from the user configuration file and stores them in named tuple
     """
     n_variations = len(config_values)
-    scene_parameters_list = [Scene_tuple for i in range(n_variations)]
-    camera_parameters_list = [Camera_tuple for i in range(n_variations)]
-    light_parameters_list = [Light_tuple for i in range(n_variations)]
-    image_parameters_list = [Image_tuple for i in range(n_variations)]
-    for index, config in enumerate(config_values):
-        scene_parameters_list[index] = scene_parameters_list[index](
-            aspect_ratio=config["scene_configs"]["aspect_ratio"],
-            color_mode=config["scene_configs"]["color_mode"],
-            exposure_value=config["scene_configs"]["exposure_value"],
-            contrast=config["scene_configs"]["contrast"],
-            crop_min_x=config["scene_configs"]["crop_min_x"],
-            crop_max_x=config["scene_configs"]["crop_max_x"],
-            crop_min_y=config["scene_configs"]["crop_min_y"],
-            crop_max_y=config["scene_configs"]["crop_max_y"],
-            resolution_x=config["scene_configs"]["resolution_x"],
-            resolution_y=config["scene_configs"]["resolution_y"],
-            resolution_percentage=config["scene_configs"]["resolution_percentage"],
-            render_engine=config["scene_configs"]["render_engine"],
-        )
-        camera_parameters_list[index] = camera_parameters_list[index](
-            camera_x_location=config["camera_configs"]["camera_x_location"],
-            camera_y_location=config["camera_configs"]["camera_y_location"],
-            camera_z_location=config["camera_configs"]["camera_z_location"],
-            camera_focal_length=config["camera_configs"]["camera_focal_length"],
-            camera_x_rotation=config["camera_configs"]["camera_x_rotation"],
-            camera_y_rotation=config["camera_configs"]["camera_y_rotation"],
-            camera_z_rotation=config["camera_configs"]["camera_z_rotation"],
-        )
-        light_parameters_list[index] = light_parameters_list[index](
-            light_energies=config["light_configs"]["light_energies"],
-            light_x_location=config["light_configs"]["light_x_location"],
-            light_y_location=config["light_configs"]["light_y_location"],
-            light_z_location=config["light_configs"]["light_z_location"],
-            color_hue=config["light_configs"]["color_hue"],
-            color_saturation=config["light_configs"]["color_saturation"],
-            color_value=config["light_configs"]["color_value"],
-            light_type=config["light_configs"]["light_type"],
-        )
-        image_parameters_list[index] = image_parameters_list[index](
-            image_x_scale=config["image_configs"]["image_x_scale"],
-            image_y_scale=config["image_configs"]["image_y_scale"],
-            image_z_scale=config["image_configs"]["image_z_scale"],
-            image_x_rotation=config["image_configs"]["image_x_rotation"],
-            image_y_rotation=config["image_configs"]["image_y_rotation"],
-            image_z_rotation=config["image_configs"]["image_z_rotation"],
-            image_bbs=config["image_configs"]["image_bbs"],
-            image_name=config["image_configs"]["image_name"],
-            background_image_name=config["image_configs"]["background_image_name"],
-        )
+    scene_parameters_list = []
+    camera_parameters_list = []
+    light_parameters_list = []
+    image_parameters_list = []
+    for config in config_values:
+        (
+            scene_parameters,
+            light_parameters,
+            camera_parameters,
+            image_parameters,
+        ) = get_record_variation(config)
+        scene_parameters_list.append(scene_parameters)
+        camera_parameters_list.append(camera_parameters)
+        light_parameters_list.append(light_parameters)
+        image_parameters_list.append(image_parameters)
     return (
         n_variations,
         scene_parameters_list,
@@ -130,75 +259,236 @@ def get_render_variations(config_values):
     )
 
 
-def get_variations(n_variations: int, config: dict, image_files: list, bg_list: list):
-    scene_params = get_scene_parameters(n_variations, config["scene_configs"])
-    light_params = get_light_parameters(n_variations, config["light_configs"])
-    camera_params = get_camera_parameters(n_variations, config["camera_configs"])
+def get_variations(
+    n_variations: int,
+    config: dict,
+    image_files: list,
+    bg_list: list,
+    render_names: list = None,
+    rng: np.random.Generator = None,
+):
+    table = sample_parameters(n_variations, config, image_files, bg_list, rng)
+    scene_params = [table.get_scene(i) for i in range(n_variations)]
+    light_params = [table.get_light(i) for i in range(n_variations)]
+    camera_params = [table.get_camera(i) for i in range(n_variations)]
     other_blender_params = get_other_blender_parameters(config["others"])
-    image_params = get_image_parameters(
-        n_variations,
-        config["image_configs"],
-        image_files,
-        bg_list,
-    )
+    image_params = [
+        table.get_image(i, None if render_names is None else render_names[i])
+        for i in range(n_variations)
+    ]
     return scene_params, light_params, camera_params, other_blender_params, image_params
 
 
+def get_render_names(image_name: str, num_times: int = 1):
+    """
+    Names of the rendered images of a document. With more than one variation per document, the variation number is added
+    e.g. doc.png -> doc_0.png, doc_1.png ...
+    """
+    return [get_render_name(image_name, k, num_times) for k in range(num_times)]
+
+
+def get_render_name(image_name: str, variation_number: int, num_times: int = 1):
+    if num_times == 1:
+        return image_name
+    name, extension = os.path.splitext(image_name)
+    return "{}_{}{}".format(name, variation_number, extension)
+
+
+def get_other_parameters(configs_params, configuration_type: str):
+    """
+    Blender parameters shared by all the variations of a run
+    """
+    if configuration_type == "range":
+        return get_other_blender_parameters(configs_params["others"])
+    # only the first record is read, the render device of the other records is checked as they are rendered
+    for record in iter_configurations(configs_params):
+        return other_parameter_tuple(
+            render_device_type=record["other_configs"]["render_device_type"]
+        )
+    assert False, "The configuration file contains no variations"
+
+
+def get_number_of_variations(
+    path: str,
+    configs_params,
+    configuration_type: str,
+    num_times: int = 1,
+    recursive: bool = False,
+):
+    """
+    Number of variations generate_variations yields
+    """
+    if configuration_type == "range":
+        return len(get_required_files(path, recursive=recursive)) * num_times
+    return len(configs_params)
+
+
+def generate_variations(
+    path: str,
+    configs_params,
+    configuration_type: str,
+    background_images_list: list = [],
+    num_times: int = 1,
+    seed: int = None,
+    recursive: bool = False,
+):
+    """
+    Yields the variations one at a time, so memory does not grow with the number of variations.
+    In range mode num_times variations are sampled for every document. Parameters are drawn as columns
+    for chunks of documents. Every variation has a seed derived from the run seed (seed, a random one when it is
+    not given), its document and its number, which alone determines its parameters, so any variation can be
+    generated again with get_seeded_variation. Documents are read from the listing of path
+    as it is scanned, so the first variations are yielded before a large directory has been listed.
+    With an acceptance_configs section in the configuration, rejected variations are sampled again before they are yielded.
+    In all mode every entry of the configuration file is a variation, entries are read and validated one at a time.
+    """
+    if configuration_type == "range":
+        files = iter_files(path, recursive=recursive)
+        n_files = 0
+        run_seed = get_run_seed(seed)
+        print("Run seed is {}".format(run_seed))
+        acceptance = None
+        if "acceptance_configs" in configs_params:
+            acceptance = get_acceptance_parameters(configs_params["acceptance_configs"])
+            n_sampled, n_rejected, n_dropped = 0, 0, 0
+        while True:
+            chunk_files = list(islice(files, sampling_chunk_size))
+            if len(chunk_files) == 0:
+                break
+            n_files += len(chunk_files)
+            n_variations = len(chunk_files) * num_times
+            # rows of a document are consecutive, num_times rows per document
+            image_indices = np.arange(n_variations) // num_times
+            variation_seeds = get_variation_seeds(
+                run_seed,
+                get_name_hashes(chunk_files)[image_indices],
+                np.arange(n_variations) % num_times,
+            )
+            if acceptance is None:
+                table = sample_parameters(
+                    n_variations,
+                    configs_params,
+                    chunk_files,
+                    background_images_list,
+                    image_indices=image_indices,
+                    variation_seeds=variation_seeds,
+                )
+                accepted = np.ones(n_variations, dtype=bool)
+            else:
+                table, accepted, chunk_rejected = sample_accepted_parameters(
+                    n_variations,
+                    configs_params,
+                    chunk_files,
+                    background_images_list,
+                    None,
+                    image_indices,
+                    get_plane_aspects(path, chunk_files),
+                    acceptance,
+                    variation_seeds,
+                )
+                chunk_dropped = int((~accepted).sum())
+                # variations rejected in the last attempt are not sampled again
+                n_sampled += n_variations + chunk_rejected - chunk_dropped
+                n_rejected += chunk_rejected
+                n_dropped += chunk_dropped
+            for row in np.flatnonzero(accepted):
+                render_name = get_render_name(
+                    chunk_files[row // num_times], row % num_times, num_times
+                )
+                scene, light, camera, image = table.get_variation(row, render_name)
+                yield Variation_tuple(render_name, scene, light, camera, image)
+        print("Number of rendering generated are {}".format(n_files * num_times))
+        if acceptance is not None:
+            print(
+                "Rejected {} of {} sampled variations ({:.1%}), {} variations dropped after {} attempts".format(
+                    n_rejected,
+                    n_sampled,
+                    n_rejected / max(n_sampled, 1),
+                    n_dropped,
+                    acceptance.max_attempts,
+                )
+            )
+    else:
+        for config in iter_configurations(configs_params):
+            scene, light, camera, image = get_record_variation(config)
+            yield Variation_tuple(image.render_name, scene, light, camera, image)
+
+
+def get_seeded_variation(
+    path: str,
+    configs_params: dict,
+    image_name: str,
+    variation_number: int,
+    seed: int,
+    background_images_list: list = [],
+    num_times: int = 1,
+):
+    """
+    Generates one variation of a range configuration again from the run seed, the same as generate_variations
+    yields it, without generating the other variations of the run. Variations rejected by acceptance_configs
+    are sampled again as in the run. Returns None when the variation was dropped after max_attempts
+    """
+    variation_seeds = get_variation_seeds(
+        seed, get_name_hashes([image_name]), [variation_number]
+    )
+    if "acceptance_configs" in configs_params:
+        table, accepted, _ = sample_accepted_parameters(
+            1,
+            configs_params,
+            [image_name],
+            background_images_list,
+            None,
+            np.zeros(1, dtype=int),
+            get_plane_aspects(path, [image_name]),
+            get_acceptance_parameters(configs_params["acceptance_configs"]),
+            variation_seeds,
+        )
+        if not accepted[0]:
+            return None
+    else:
+        table = sample_parameters(
+            1,
+            configs_params,
+            [image_name],
+            background_images_list,
+            variation_seeds=variation_seeds,
+        )
+    render_name = get_render_name(image_name, variation_number, num_times)
+    scene, light, camera, image = table.get_variation(0, render_name)
+    return Variation_tuple(render_name, scene, light, camera, image)
+
+
 def get_configuration_parameters(
     path: str,
     configs_params: str,
     configuration_type: str,
     background_images_list: list = [],
-    num_times: str = 1,
+    num_times: int = 1,
+    recursive: bool = False,
 ):
     """
     Get variations from configuration file.
     Configuration file can be either defining the range/list of parameter values or all variations applied to a image.
+    In range mode, num_times variations are created for every document.
     """
-    if configuration_type == "range":
-        files = get_required_files(path)
-        number_of_variations_required = len(files)
-        print(
-            "Number of rendering generated are {}".format(number_of_variations_required)
-        )
-        (
-            scene_parameters,
-            light_parameters,
-            camera_parameters,
-            other_blender_parameters,
-            image_parameters,
-        ) = get_variations(
-            number_of_variations_required,
+    variations = list(
+        generate_variations(
+            path,
             configs_params,
-            files,
+            configuration_type,
             background_images_list,
+            num_times,
+            recursive=recursive,
         )
-    else:
-        (
-            number_of_variations_required,
-            scene_parameters,
-            light_parameters,
-            camera_parameters,
-            image_parameters,
-        ) = get_render_variations(configs_params)
-        files = [i.image_name for i in image_parameters]
-        render_device = [
-            i["other_configs"]["render_device_type"] for i in configs_params
-        ]
-        assert (
-            len(set(render_device)) == 1
-        ), "The parameter file contains multiple render devices. Please provide either a GPU or CPU"
-        other_blender_parameters = other_parameter_tuple(
-            render_device_type=render_device[0]
-        )
+    )
     return (
-        files,
-        number_of_variations_required,
-        scene_parameters,
-        light_parameters,
-        camera_parameters,
-        image_parameters,
-        other_blender_parameters,
+        [i.render_name for i in variations],
+        len(variations),
+        [i.scene for i in variations],
+        [i.light for i in variations],
+        [i.camera for i in variations],
+        [i.image for i in variations],
+        get_other_parameters(configs_params, configuration_type),
     )
 
 
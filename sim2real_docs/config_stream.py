@@ -0,0 +1,177 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Streaming reader of all_configurations files.
+Metadata files replayed in all mode can hold millions of records, they are read one record at a time instead of being
+loaded with json.load. JSON Lines files, JSON arrays (parsed incrementally) and columnar metadata stores are read,
+every record is validated as it is read.
+"""
+import json
+import os
+
+from .metadata_store import MetadataStore, schema_name
+
+# characters read at a time from a JSON array
+read_chunk_size = 1 << 20
+# sections every record of an all_configurations file needs
+record_sections = [
+    "scene_configs",
+    "light_configs",
+    "camera_configs",
+    "image_configs",
+    "other_configs",
+]
+
+
+def iter_json_array(f, chunk_size: int = read_chunk_size):
+    """
+    Yields the elements of the JSON array in the file object one at a time, only a chunk of the file is held in memory
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    end_of_file = False
+    expected = "["
+
+    def next_char():
+        # moves to the next character that is not white space, reading more of the file when needed
+        nonlocal buffer, position, end_of_file
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or end_of_file:
+                return buffer[position] if position < len(buffer) else ""
+            buffer, position = f.read(chunk_size), 0
+            end_of_file = len(buffer) == 0
+
+    while True:
+        char = next_char()
+        if expected == "[":
+            assert char == "[", "The configuration file should hold a JSON array"
+            position += 1
+            expected = "value"
+            if next_char() == "]":
+                return
+            continue
+        if expected == "separator":
+            if char == "]":
+                return
+            assert char == ",", "Expected , or ] in the JSON array, found {}".format(
+                char
+            )
+            position += 1
+            expected = "value"
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if end_of_file:
+                raise
+            value, end = None, len(buffer)
+        if end >= len(buffer) and not end_of_file:
+            # the value may continue in the next chunk
+            more = f.read(chunk_size)
+            end_of_file = len(more) == 0
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield value
+        position = end
+        expected = "separator"
+
+
+def iter_json_lines(f):
+    """
+    Yields the records of a JSON Lines file, blank lines are skipped
+    """
+    for line in f:
+        if line.strip() != "":
+            yield json.loads(line)
+
+
+def get_configuration_format(path: str):
+    """
+    Format of an all_configurations file - store for a columnar metadata store directory, jsonl for JSON Lines
+    and json for a JSON array. Files are told apart by their first character when the extension is not .jsonl
+    """
+    if os.path.isdir(path):
+        assert os.path.exists(
+            os.path.join(path, schema_name)
+        ), "{} is not a metadata store".format(path)
+        return "store"
+    if path.lower().endswith(".jsonl"):
+        return "jsonl"
+    with open(path) as f:
+        char = f.read(1)
+        while char.isspace():
+            char = f.read(1)
+    return "json" if char == "[" else "jsonl"
+
+
+def validate_record(record, row: int):
+    """
+    Checks that a record has the sections of a variation before it is used
+    """
+    assert isinstance(
+        record, dict
+    ), "Row {} of the configurations is not an object".format(row)
+    missing = [section for section in record_sections if section not in record]
+    assert len(missing) == 0, "Row {} of the configurations misses {}".format(
+        row, missing
+    )
+
+
+def iter_configurations(configs_params):
+    """
+    Yields the records of all mode configurations, a list or a ConfigurationStream, validating each record as it is read.
+    All the records should use the same render device
+    """
+    render_device = None
+    for row, record in enumerate(configs_params):
+        validate_record(record, row)
+        device = record["other_configs"]["render_device_type"]
+        if render_device is None:
+            render_device = device
+        assert (
+            device == render_device
+        ), "The parameter file contains multiple render devices. Please provide either a GPU or CPU"
+        yield record
+
+
+class ConfigurationStream:
+    def __init__(self, path: str):
+        """
+        Records of an all_configurations file, read again from the file every time they are iterated
+        """
+        self.path = path
+        self.configuration_format = get_configuration_format(path)
+        self.n_records = None
+
+    def __iter__(self):
+        if self.configuration_format == "store":
+            store = MetadataStore(self.path)
+            try:
+                yield from store.iter_records()
+            finally:
+                store.close()
+            return
+        with open(self.path) as f:
+            if self.configuration_format == "json":
+                yield from iter_json_array(f)
+            else:
+                yield from iter_json_lines(f)
+
+    def __len__(self):
+        """
+        Number of records, counted once without keeping the records
+        """
+        if self.n_records is None:
+            if self.configuration_format == "store":
+                store = MetadataStore(self.path)
+                self.n_records = len(store)
+                store.close()
+            elif self.configuration_format == "jsonl":
+                with open(self.path) as f:
+                    self.n_records = sum(1 for line in f if line.strip() != "")
+            else:
+                self.n_records = sum(1 for _ in self)
+        return self.n_records
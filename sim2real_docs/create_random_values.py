@@ -3,8 +3,7 @@
 """
 The script generates variations for the parameters using configuration file and stores them in respective named tuple
 """
-import math
-import random
+import hashlib
 from collections import namedtuple
 
 import numpy as np
@@ -23,7 +22,24 @@ scene_options = [
     "resolution_y",
     "resolution_percentage",
     "render_engine",
+    "samples",
+    "adaptive_threshold",
+    "max_bounces",
+    "denoiser",
+    "tile_size",
+    "persistent_data",
 ]
+# render quality settings are optional, blender keeps its own values for the ones not in the configuration
+render_quality_options = [
+    "samples",
+    "adaptive_threshold",
+    "max_bounces",
+    "denoiser",
+    "tile_size",
+    "persistent_data",
+]
+# sampled render quality settings that are whole numbers
+integer_parameters = ["samples", "max_bounces"]
 Scene_tuple = namedtuple(
     "SceneParameters", scene_options, defaults=[None] * len(scene_options)
 )
@@ -62,6 +78,8 @@ image_options = [
     "image_bbs",
     "background_image_name",
     "image_name",
+    "render_name",
+    "variation_seed",
 ]
 Image_tuple = namedtuple(
     "ImageParameters", image_options, defaults=[None] * len(image_options)
@@ -71,71 +89,356 @@ other_parameter_tuple = namedtuple(
     "OtherBlenderParameters", other_options, defaults=[None] * len(other_options)
 )
 
+# parameters sampled uniformly from a range - (config section, tuple field, config key)
+range_parameters = [
+    ("scene_configs", "exposure_value", "exposure"),
+    ("scene_configs", "crop_min_x", "crop_min_x"),
+    ("scene_configs", "crop_max_x", "crop_max_x"),
+    ("scene_configs", "crop_min_y", "crop_min_y"),
+    ("scene_configs", "crop_max_y", "crop_max_y"),
+    ("scene_configs", "resolution_percentage", "resolution_percentage"),
+    ("scene_configs", "samples", "samples"),
+    ("scene_configs", "adaptive_threshold", "adaptive_threshold"),
+    ("scene_configs", "max_bounces", "max_bounces"),
+    ("light_configs", "light_energies", "light_energy"),
+    ("light_configs", "color_hue", "hue"),
+    ("light_configs", "color_saturation", "saturation"),
+    ("light_configs", "color_value", "value"),
+    ("light_configs", "light_x_location", "light_x_location"),
+    # y and z light locations are drawn from the light_x_location range, as in earlier releases
+    ("light_configs", "light_y_location", "light_x_location"),
+    ("light_configs", "light_z_location", "light_x_location"),
+    ("camera_configs", "camera_x_location", "camera_x_location"),
+    ("camera_configs", "camera_y_location", "camera_y_location"),
+    ("camera_configs", "camera_z_location", "camera_z_location"),
+    ("camera_configs", "camera_x_rotation", "camera_x_rotation"),
+    ("camera_configs", "camera_y_rotation", "camera_y_rotation"),
+    ("camera_configs", "camera_z_rotation", "camera_z_rotation"),
+    ("camera_configs", "camera_focal_length", "camera_focal_length"),
+    ("image_configs", "image_x_scale", "image_x_scale"),
+    ("image_configs", "image_y_scale", "image_y_scale"),
+    ("image_configs", "image_z_scale", "image_z_scale"),
+    ("image_configs", "image_x_rotation", "image_x_rotation"),
+    ("image_configs", "image_y_rotation", "image_y_rotation"),
+    ("image_configs", "image_z_rotation", "image_z_rotation"),
+]
+# parameters sampled from a list of values with optional weights - (config section, column, config key)
+categorical_parameters = [
+    ("scene_configs", "aspect_ratio", "aspect_ratio"),
+    ("scene_configs", "color_mode", "color_modes"),
+    ("scene_configs", "contrast", "contrast"),
+    ("scene_configs", "resolution", "resolution"),
+    ("scene_configs", "render_engine", "render_engine"),
+    ("scene_configs", "denoiser", "denoiser"),
+    ("scene_configs", "tile_size", "tile_size"),
+    ("scene_configs", "persistent_data", "persistent_data"),
+    ("light_configs", "light_type", "light_types"),
+]
+# camera rotations are stored in radians
+radian_parameters = ["camera_x_rotation", "camera_y_rotation", "camera_z_rotation"]
+# variation seeds are kept below 2 ** 63 so they fit signed 64 bit integers in the metadata
+seed_mask = np.uint64(2**63 - 1)
+
 
-def random_range(configs, variable, variations):
+def is_sampled(configs: dict, section: str, name: str, key: str):
     """
-    Generate random values for the variable in continous scale
+    Parameters of the sections present in configs are sampled, optional render quality settings only when they are given
     """
+    if section not in configs:
+        return False
+    return name not in render_quality_options or key in configs[section]
+
 
-    random_values = np.random.uniform(
-        configs[variable]["range"][0], configs[variable]["range"][1], variations
+def get_weights(configs, variable):
+    """
+    Normalised weights of a categorical variable.
+    If weights values are not given, the function assign equal weight to all the values
+    """
+    weight_values = configs[variable].get(
+        "weights", [1.0] * len(configs[variable]["range"])
     )
-    return random_values
+    weight_values = np.asarray(weight_values, dtype=float)
+    return weight_values / weight_values.sum()
 
 
-def random_categorical_values(configs, variable, variations):
+def mix_seeds(values):
     """
-    Generate random values for the variable (e.g aspect ratio etc)
-    If weights values are not given, the function assign equal weight to all the values
+    splitmix64 finalizer on uint64 arrays, every input bit changes about half of the output bits
     """
-    try:
-        weight_values = configs[variable]["weights"]
-    except:
-        weight_values = [1.0] * len(configs[variable]["range"])
+    values = np.asarray(values, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        values = values + np.uint64(0x9E3779B97F4A7C15)
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
 
-    random_values = random.choices(
-        configs[variable]["range"], k=variations, weights=weight_values
+
+def get_name_hashes(names: list):
+    """
+    64 bit hashes of names, e.g. document file names or parameter names, the same on every machine and run
+    """
+    return np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(name.encode(), digest_size=8).digest(), "little"
+            )
+            for name in names
+        ],
+        dtype=np.uint64,
     )
-    return random_values
 
 
-def get_image_parameters(
-    n_variations: int, image_configs: dict, image_files: list, bg_list: list
-):
+def get_run_seed(seed: int = None):
     """
-    Generate scene variations based on random values in config file and creates a named tuple for each variation
+    Seed of a run, a random one when seed is not given
     """
-    # sampling background images from background image files
-    if len(bg_list) == 0:
-        bg_images = [""] * len(image_files)
-    else:
-        bg_images = [random.choice(bg_list) for i in range(len(image_files))]
-    image_parameters_list = [Image_tuple for i in range(n_variations)]
-    image_scale_x_values = random_range(image_configs, "image_x_scale", n_variations)
-    image_scale_y_values = random_range(image_configs, "image_y_scale", n_variations)
-    image_scale_z_values = random_range(image_configs, "image_z_scale", n_variations)
-    image_rotation_x_values = random_range(
-        image_configs, "image_x_rotation", n_variations
-    )
-    image_rotation_y_values = random_range(
-        image_configs, "image_y_rotation", n_variations
-    )
-    image_rotation_z_values = random_range(
-        image_configs, "image_z_rotation", n_variations
+    if seed is None:
+        seed = np.random.SeedSequence().entropy % 2**63
+    assert 0 <= seed < 2**64, "Seed should be an integer from 0 to 2 ** 64 - 1"
+    return int(seed)
+
+
+def get_variation_seeds(run_seed: int, document_hashes, variation_numbers):
+    """
+    Seeds of variations derived from the run seed, the hash of the document (get_name_hashes) and the number of
+    the variation of the document. A variation seed determines all the sampled parameters of the variation
+    """
+    seeds = mix_seeds(mix_seeds(np.uint64(run_seed)) ^ document_hashes)
+    return mix_seeds(seeds ^ np.asarray(variation_numbers, dtype=np.uint64)) & seed_mask
+
+
+def get_attempt_seeds(variation_seeds, attempt: int):
+    """
+    Seeds of the variations sampled again after being rejected, attempt 0 is the first sample
+    """
+    if attempt == 0:
+        return np.asarray(variation_seeds, dtype=np.uint64)
+    return mix_seeds(variation_seeds ^ mix_seeds(np.uint64(attempt))) & seed_mask
+
+
+def get_seeded_uniforms(variation_seeds, names: list):
+    """
+    Uniform values in [0, 1) of the named parameters for every variation, shape (len(names), len(variation_seeds)).
+    A value only depends on the seed of its variation and the name of the parameter
+    """
+    bits = mix_seeds(
+        np.asarray(variation_seeds, dtype=np.uint64)[None, :]
+        ^ get_name_hashes(names)[:, None]
     )
-    for index, _ in enumerate(image_parameters_list):
-        image_parameters_list[index] = image_parameters_list[index](
-            image_x_scale=image_scale_x_values[index],
-            image_y_scale=image_scale_y_values[index],
-            image_z_scale=image_scale_z_values[index],
-            image_x_rotation=image_rotation_x_values[index],
-            image_y_rotation=image_rotation_y_values[index],
-            image_z_rotation=image_rotation_z_values[index],
+    return (bits >> np.uint64(11)).astype(float) * 2.0**-53
+
+
+def get_code_type(n_values: int):
+    """
+    Smallest unsigned integer type that can index n_values categories
+    """
+    return np.min_scalar_type(max(n_values - 1, 0))
+
+
+class ParameterTable:
+    """
+    Column oriented table of sampled parameters, one row per variation.
+    Range parameters are float arrays and categorical parameters are integer codes into their list of values,
+    so a row takes a small, fixed amount of memory. Slicing a table returns a table sharing the same arrays
+    """
+
+    def __init__(self, columns: dict, categories: dict):
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.get_variation(index)
+        return ParameterTable(
+            {name: column[index] for name, column in self.columns.items()},
+            self.categories,
+        )
+
+    def set_rows(self, rows, table):
+        """
+        Replaces the given rows with the rows of another table sampled from the same configuration
+        """
+        for name, column in self.columns.items():
+            column[rows] = table.columns[name]
+
+    def get_column(self, name: str):
+        """
+        Values of a parameter for every row, categorical codes are replaced by their values
+        """
+        if name in self.categories:
+            return np.asarray(self.categories[name])[self.columns[name]]
+        return self.columns[name]
+
+    def get_value(self, name: str, index: int):
+        if name in self.categories:
+            return self.categories[name][self.columns[name][index]]
+        return float(self.columns[name][index])
+
+    def get_scene(self, index: int):
+        resolution = self.get_value("resolution", index)
+        return Scene_tuple(
+            aspect_ratio=self.get_value("aspect_ratio", index),
+            color_mode=self.get_value("color_mode", index),
+            exposure_value=self.get_value("exposure_value", index),
+            contrast=self.get_value("contrast", index),
+            crop_min_x=self.get_value("crop_min_x", index),
+            crop_max_x=self.get_value("crop_max_x", index),
+            crop_min_y=self.get_value("crop_min_y", index),
+            crop_max_y=self.get_value("crop_max_y", index),
+            resolution_x=resolution[0],
+            resolution_y=resolution[1],
+            resolution_percentage=self.get_value("resolution_percentage", index),
+            render_engine=self.get_value("render_engine", index),
+            **{
+                option: self.get_render_quality_value(option, index)
+                for option in render_quality_options
+            },
+        )
+
+    def get_render_quality_value(self, name: str, index: int):
+        if name not in self.columns:
+            return None
+        value = self.get_value(name, index)
+        return int(value) if name in integer_parameters else value
+
+    def get_light(self, index: int):
+        return Light_tuple(
+            **{option: self.get_value(option, index) for option in light_options}
+        )
+
+    def get_camera(self, index: int):
+        return Camera_tuple(
+            **{option: self.get_value(option, index) for option in camera_options}
+        )
+
+    def get_image(self, index: int, render_name: str = None):
+        image_name = self.get_value("image_name", index)
+        variation_seed = None
+        if "variation_seed" in self.columns:
+            variation_seed = int(self.columns["variation_seed"][index])
+        return Image_tuple(
+            image_x_scale=self.get_value("image_x_scale", index),
+            image_y_scale=self.get_value("image_y_scale", index),
+            image_z_scale=self.get_value("image_z_scale", index),
+            image_x_rotation=self.get_value("image_x_rotation", index),
+            image_y_rotation=self.get_value("image_y_rotation", index),
+            image_z_rotation=self.get_value("image_z_rotation", index),
             image_bbs=[],
-            image_name=image_files[index],
-            background_image_name=bg_images[index],
+            image_name=image_name,
+            background_image_name=self.get_value("background_image_name", index),
+            render_name=image_name if render_name is None else render_name,
+            variation_seed=variation_seed,
+        )
+
+    def get_variation(self, index: int, render_name: str = None):
+        """
+        Named tuples of a row - scene, light, camera and image parameters
+        """
+        return (
+            self.get_scene(index),
+            self.get_light(index),
+            self.get_camera(index),
+            self.get_image(index, render_name),
         )
-    return image_parameters_list
+
+
+def sample_parameters(
+    n_variations: int,
+    configs: dict,
+    image_files: list = [],
+    bg_list: list = [],
+    rng: np.random.Generator = None,
+    image_indices: np.ndarray = None,
+    variation_seeds: np.ndarray = None,
+):
+    """
+    Draws every parameter of n_variations variations in one pass and returns them as a ParameterTable.
+    Only the sections present in configs are sampled.
+    image_indices selects the image file of every variation, by default variation i uses image_files[i % len(image_files)]
+    With variation_seeds, the parameters of every variation are derived from its seed alone, whatever the other
+    variations sampled with it, and the seeds are kept in the variation_seed column. Otherwise rng is used
+    """
+    if variation_seeds is not None:
+        variation_seeds = np.asarray(variation_seeds, dtype=np.uint64)
+
+        def get_uniforms(names):
+            return get_seeded_uniforms(variation_seeds, names)
+
+    else:
+        if rng is None:
+            rng = np.random.default_rng()
+
+        def get_uniforms(names):
+            return rng.random((len(names), n_variations))
+
+    sampled = [i for i in range_parameters if is_sampled(configs, *i)]
+    ranges = np.array(
+        [configs[section][key]["range"][:2] for section, _, key in sampled], dtype=float
+    ).reshape(-1, 2)
+    # one row per parameter so that every column is contiguous
+    values = get_uniforms([name for _, name, _ in sampled]).reshape(-1, n_variations)
+    values *= ranges[:, 1:] - ranges[:, :1]
+    values += ranges[:, :1]
+    columns = {name: values[i] for i, (_, name, _) in enumerate(sampled)}
+    for name in radian_parameters:
+        if name in columns:
+            np.radians(columns[name], out=columns[name])
+    for name in integer_parameters:
+        if name in columns:
+            np.rint(columns[name], out=columns[name])
+    categories = {}
+    for section, name, key in categorical_parameters:
+        if not is_sampled(configs, section, name, key):
+            continue
+        categories[name] = configs[section][key]["range"]
+        cumulative_weights = np.cumsum(get_weights(configs[section], key))
+        codes = np.searchsorted(
+            cumulative_weights / cumulative_weights[-1],
+            get_uniforms([name])[0],
+            side="right",
+        )
+        columns[name] = np.minimum(codes, len(categories[name]) - 1).astype(
+            get_code_type(len(categories[name]))
+        )
+    if "image_configs" in configs:
+        if image_indices is None:
+            image_indices = np.arange(n_variations) % max(len(image_files), 1)
+        categories["image_name"] = image_files
+        columns["image_name"] = np.asarray(image_indices).astype(
+            get_code_type(len(image_files))
+        )
+        # sampling background images from background image files
+        categories["background_image_name"] = bg_list if len(bg_list) > 0 else [""]
+        n_backgrounds = len(categories["background_image_name"])
+        columns["background_image_name"] = np.minimum(
+            get_uniforms(["background_image_name"])[0] * n_backgrounds,
+            n_backgrounds - 1,
+        ).astype(get_code_type(n_backgrounds))
+    if variation_seeds is not None:
+        columns["variation_seed"] = variation_seeds.astype(np.int64)
+    return ParameterTable(columns, categories)
+
+
+def get_image_parameters(
+    n_variations: int,
+    image_configs: dict,
+    image_files: list,
+    bg_list: list,
+    render_names: list = None,
+):
+    """
+    Generate image variations based on random values in config file and creates a named tuple for each variation
+    render_names are the names of the rendered images, the image file names are used when they are not given
+    """
+    table = sample_parameters(
+        n_variations, {"image_configs": image_configs}, image_files, bg_list
+    )
+    if render_names is None:
+        render_names = image_files
+    return [table.get_image(i, render_names[i]) for i in range(n_variations)]
 
 
 def get_other_blender_parameters(other_parameters: dict):
@@ -149,110 +452,21 @@ def get_camera_parameters(n_variations: int, camera_configs: dict):
     """
     Generate camera variations based on random values in config file and creates a named tuple for each variation
     """
-    camera_parameters_list = [Camera_tuple for i in range(n_variations)]
-
-    camera_focal_length_values = random_range(
-        camera_configs, "camera_focal_length", n_variations
-    )
-    camera_x_location_values = random_range(
-        camera_configs, "camera_x_location", n_variations
-    )
-    camera_y_location_values = random_range(
-        camera_configs, "camera_y_location", n_variations
-    )
-    camera_z_location_values = random_range(
-        camera_configs, "camera_z_location", n_variations
-    )
-    camera_x_rotation_values = random_range(
-        camera_configs, "camera_x_rotation", n_variations
-    )
-    camera_y_rotation_values = random_range(
-        camera_configs, "camera_y_rotation", n_variations
-    )
-    camera_z_rotation_values = random_range(
-        camera_configs, "camera_z_rotation", n_variations
-    )
-    for index, _ in enumerate(camera_parameters_list):
-        camera_parameters_list[index] = camera_parameters_list[index](
-            camera_x_location=camera_x_location_values[index],
-            camera_y_location=camera_y_location_values[index],
-            camera_z_location=camera_z_location_values[index],
-            camera_focal_length=camera_focal_length_values[index],
-            camera_x_rotation=math.radians(camera_x_rotation_values[index]),
-            camera_y_rotation=math.radians(camera_y_rotation_values[index]),
-            camera_z_rotation=math.radians(camera_z_rotation_values[index]),
-        )
-    return camera_parameters_list
+    table = sample_parameters(n_variations, {"camera_configs": camera_configs})
+    return [table.get_camera(i) for i in range(n_variations)]
 
 
 def get_light_parameters(n_variations: int, light_configs: dict):
     """
     Generate light variations based on random values in config file and creates a named tuple for each variation
     """
-    light_parameters_list = [Light_tuple for i in range(n_variations)]
-    light_energies = random_range(light_configs, "light_energy", n_variations)
-    light_type_values = random_categorical_values(
-        light_configs, "light_types", n_variations
-    )
-    hue = random_range(light_configs, "hue", n_variations)
-    saturation = random_range(light_configs, "saturation", n_variations)
-    value = random_range(light_configs, "value", n_variations)
-    light_x_values = random_range(light_configs, "light_x_location", n_variations)
-    light_y_values = random_range(light_configs, "light_x_location", n_variations)
-    light_z_values = random_range(light_configs, "light_x_location", n_variations)
-    for index, _ in enumerate(light_parameters_list):
-        light_parameters_list[index] = light_parameters_list[index](
-            light_energies=light_energies[index],
-            light_x_location=light_x_values[index],
-            light_y_location=light_y_values[index],
-            light_z_location=light_z_values[index],
-            color_hue=hue[index],
-            color_saturation=saturation[index],
-            color_value=value[index],
-            light_type=light_type_values[index],
-        )
-    return light_parameters_list
+    table = sample_parameters(n_variations, {"light_configs": light_configs})
+    return [table.get_light(i) for i in range(n_variations)]
 
 
 def get_scene_parameters(n_variations: int, scene_config: dict):
     """
     Generate scene variations based on random values in config file and creates a named tuple for each variation
     """
-    scene_parameters_list = [Scene_tuple for i in range(n_variations)]
-    aspect_ratio_values = random_categorical_values(
-        scene_config, "aspect_ratio", n_variations
-    )
-    color_mode_values = random_categorical_values(
-        scene_config, "color_modes", n_variations
-    )
-    resolution_values = random_categorical_values(
-        scene_config, "resolution", n_variations
-    )
-    contrast_values = random_categorical_values(scene_config, "contrast", n_variations)
-    render_engine_values = random_categorical_values(
-        scene_config, "render_engine", n_variations
-    )
-    exposure_value_values = random_range(scene_config, "exposure", n_variations)
-    crop_min_x_values = random_range(scene_config, "crop_min_x", n_variations)
-    crop_max_x_values = random_range(scene_config, "crop_max_x", n_variations)
-    crop_min_y_values = random_range(scene_config, "crop_min_y", n_variations)
-    crop_max_y_values = random_range(scene_config, "crop_max_y", n_variations)
-    resolution_percentage_values = random_range(
-        scene_config, "resolution_percentage", n_variations
-    )
-    for index, _ in enumerate(scene_parameters_list):
-        scene_parameters_list[index] = scene_parameters_list[index](
-            aspect_ratio=aspect_ratio_values[index],
-            color_mode=color_mode_values[index],
-            exposure_value=exposure_value_values[index],
-            contrast=contrast_values[index],
-            crop_min_x=crop_min_x_values[index],
-            crop_max_x=crop_max_x_values[index],
-            crop_min_y=crop_min_y_values[index],
-            crop_max_y=crop_max_y_values[index],
-            resolution_x=resolution_values[index][0],
-            resolution_y=resolution_values[index][1],
-            resolution_percentage=resolution_percentage_values[index],
-            render_engine=render_engine_values[index],
-        )
-    return scene_parameters_list
+    table = sample_parameters(n_variations, {"scene_configs": scene_config})
+    return [table.get_scene(i) for i in range(n_variations)]
@@ -0,0 +1,261 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+File and path helpers that do not need blender, including the discovery of input files.
+They are imported by the configuration and sampling modules, so those can be used in plain python
+without starting blender, and are available from utils as before.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+# image formats read from the input and background paths
+valid_image_formats = [".jpg", ".jpeg", ".jp2", ".png", ".bmp", ".tiff", ".tif"]
+# a manifest file in an input directory lists its files, so the directory does not have to be scanned
+manifest_name = "sim2real_manifest.jsonl"
+Manifest_tuple = namedtuple("ManifestEntry", ["path", "size", "width", "height"])
+# (path, formats, recursive) -> (version, files) of the directories listed in this process
+listing_cache = {}
+# extensions blender accepts for the rendered file format, the first one is used when missing
+image_format_extensions = {
+    "PNG": [".png"],
+    "JPEG": [".jpg", ".jpeg"],
+    "JPEG2000": [".jp2"],
+    "BMP": [".bmp"],
+    "TIFF": [".tif", ".tiff"],
+    "TARGA": [".tga"],
+    "TARGA_RAW": [".tga"],
+    "OPEN_EXR": [".exr"],
+    "OPEN_EXR_MULTILAYER": [".exr"],
+}
+# image extensions blender replaces, instead of appending the extension of the file format
+known_image_extensions = [
+    ".png",
+    ".tga",
+    ".bmp",
+    ".jpg",
+    ".jpeg",
+    ".sgi",
+    ".rgb",
+    ".rgba",
+    ".tif",
+    ".tiff",
+    ".tx",
+    ".jp2",
+    ".j2c",
+    ".hdr",
+    ".dds",
+    ".dpx",
+    ".cin",
+    ".exr",
+    ".psd",
+    ".pdd",
+    ".psb",
+    ".webp",
+]
+
+
+def create_dir(path: str):
+    """
+    This function creates a directory for the path specified
+    """
+    if not os.path.exists(path):
+        os.mkdir(path)
+
+
+def create_parent_dir(filepath: str):
+    """
+    Creates the directories of a file path, rendered images of documents in sub directories keep the same sub directories
+    """
+    parent_dir = os.path.dirname(filepath)
+    if parent_dir != "" and not os.path.exists(parent_dir):
+        os.makedirs(parent_dir)
+
+
+def check_path_exists(path: str):
+    """
+    Function to check if input path exists
+    """
+    assert isinstance(path, str), "Input path should be a string"
+    try:
+        if os.path.exists(path):
+            print("Input path exists")
+    except:
+        print("Provided input path does not exists")
+
+
+def get_output_name(image_name: str, file_format: str = "PNG"):
+    """
+    Name of the file blender writes for image_name with the file extension option, e.g. doc.jpg -> doc.png.
+    A name ending with an extension of the file format is kept, another known image extension is replaced
+    by the extension of the file format and any other name gets it appended
+    """
+    extensions = image_format_extensions.get(file_format, [])
+    name, extension = os.path.splitext(image_name)
+    if len(extensions) == 0 or extension.lower() in extensions:
+        return image_name
+    if extension.lower() in known_image_extensions:
+        return name + extensions[0]
+    return image_name + extensions[0]
+
+
+def scan_files(
+    path: str,
+    valid_formats: list = valid_image_formats,
+    recursive: bool = False,
+    scanned_directories: dict = None,
+):
+    """
+    Yields the paths, relative to path, of the files with one of the valid extensions (in any case).
+    Directories are read with os.scandir one at a time and the files are yielded while the scan goes on,
+    entries of a directory are sorted so the order does not depend on the file system.
+    The modification time of every directory read is added to scanned_directories, keyed by its relative path
+    """
+    directories = [""]
+    while len(directories) > 0:
+        directory = directories.pop()
+        if scanned_directories is not None:
+            scanned_directories[directory] = os.path.getmtime(
+                os.path.join(path, directory)
+            )
+        with os.scandir(os.path.join(path, directory)) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            relative_path = os.path.join(directory, entry.name)
+            if entry.is_dir():
+                if recursive:
+                    subdirectories.append(relative_path)
+            elif os.path.splitext(entry.name)[1].lower() in valid_formats:
+                yield relative_path
+        # depth first, in name order
+        directories.extend(reversed(subdirectories))
+
+
+def read_manifest(manifest_path: str):
+    """
+    Yields the entries of a manifest file, one json object per line with the path of the file relative to the
+    manifest directory and optionally its size in bytes, width and height in pixels
+    """
+    with open(manifest_path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield Manifest_tuple(
+                    path=entry["path"],
+                    size=entry.get("size"),
+                    width=entry.get("width"),
+                    height=entry.get("height"),
+                )
+
+
+def write_manifest(
+    path: str,
+    valid_formats: list = valid_image_formats,
+    recursive: bool = True,
+    with_sizes: bool = False,
+    with_dimensions: bool = False,
+):
+    """
+    Scans path once and writes its manifest file, so later runs do not list the directory.
+    with_dimensions reads the width and height of every image with Pillow
+    """
+    if with_dimensions:
+        from PIL import Image as PILImage
+    manifest_path = os.path.join(path, manifest_name)
+    n_files = 0
+    with open(manifest_path + ".tmp", "w") as f:
+        for relative_path in scan_files(path, valid_formats, recursive):
+            entry = {"path": relative_path}
+            filepath = os.path.join(path, relative_path)
+            if with_sizes:
+                entry["size"] = os.path.getsize(filepath)
+            if with_dimensions:
+                with PILImage.open(filepath) as image:
+                    entry["width"], entry["height"] = image.size
+            f.write(json.dumps(entry) + "\n")
+            n_files += 1
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return n_files
+
+
+def get_listing_key(path: str, valid_formats: list, recursive: bool):
+    """
+    Key of a directory listing in the listing cache
+    """
+    return os.path.abspath(path), tuple(valid_formats), recursive
+
+
+def get_listing_version(path: str, directories: list):
+    """
+    Version of a listing, the modification time of the manifest or of every scanned directory, as adding or removing
+    a file only modifies the directory holding it. None when a scanned directory was removed
+    """
+    manifest_path = os.path.join(path, manifest_name)
+    if os.path.exists(manifest_path):
+        return "manifest", os.path.getmtime(manifest_path)
+    try:
+        mtimes = [os.path.getmtime(os.path.join(path, i)) for i in directories]
+    except OSError:
+        return None
+    return "directory", tuple(mtimes)
+
+
+def iter_files(
+    path: str, valid_formats: list = valid_image_formats, recursive: bool = False
+):
+    """
+    Yields the files of path lazily. The manifest of the directory is used when there is one, otherwise the directory
+    is scanned. A complete listing is cached in memory, later calls in the same process do not read the directory again
+    unless the manifest or one of the scanned directories is modified. Without recursive, only the files at the top
+    level of the manifest are used
+    """
+    key = get_listing_key(path, valid_formats, recursive)
+    if key in listing_cache:
+        version, directories, listing = listing_cache[key]
+        if get_listing_version(path, directories) == version:
+            yield from listing
+            return
+    manifest_path = os.path.join(path, manifest_name)
+    directories = {}
+    if os.path.exists(manifest_path):
+        version = "manifest", os.path.getmtime(manifest_path)
+        files = (
+            entry.path
+            for entry in read_manifest(manifest_path)
+            if os.path.splitext(entry.path)[1].lower() in valid_formats
+            and (recursive or is_top_level(entry.path))
+        )
+    else:
+        version = None
+        files = scan_files(path, valid_formats, recursive, directories)
+    listing = []
+    for file in files:
+        listing.append(file)
+        yield file
+    if version is None:
+        # modification times taken when every directory was read
+        version = "directory", tuple(directories.values())
+    listing_cache[key] = (version, list(directories), listing)
+
+
+def is_top_level(relative_path: str):
+    """
+    Whether a path of a manifest is a file of the manifest directory itself, not of a sub directory
+    """
+    return os.path.dirname(os.path.normpath(relative_path)) == ""
+
+
+def get_manifest_dimensions(path: str):
+    """
+    Width and height of the images listed with their dimensions in the manifest of path
+    """
+    manifest_path = os.path.join(path, manifest_name)
+    if not os.path.exists(manifest_path):
+        return {}
+    return {
+        entry.path: (entry.width, entry.height)
+        for entry in read_manifest(manifest_path)
+        if entry.width is not None and entry.height is not None
+    }
@@ -10,15 +10,102 @@ import os
 import bmesh
 import math
 
+from .segmentation import SegmentationGraph
+
+
+def load_image(image_filepath: str, texture_cache=None):
+    """
+    Loads an image into bpy.data, through the texture cache if one is given
+    """
+    if texture_cache is not None:
+        return texture_cache.get_image(image_filepath)
+    return bpy.data.images.load(image_filepath, check_existing=True)
+
+
+def create_image_plane(image_filepath: str, object_name: str, texture_cache=None):
+    """
+    Creates a plane showing the image through bpy.data, without the import images as planes operator.
+    The plane follows the add-on defaults: 1 meter high, width from the image aspect ratio and a principled material
+    """
+    image = load_image(image_filepath, texture_cache)
+    width, height = image.size
+    half_width, half_height = width / height / 2, 0.5
+    mesh = bpy.data.meshes.new(object_name)
+    # same vertex order as the blender plane primitive - bottom left, bottom right, top left, top right
+    mesh.from_pydata(
+        [
+            (-half_width, -half_height, 0.0),
+            (half_width, -half_height, 0.0),
+            (-half_width, half_height, 0.0),
+            (half_width, half_height, 0.0),
+        ],
+        [],
+        [(0, 1, 3, 2)],
+    )
+    uv_layer = mesh.uv_layers.new()
+    for loop, uv in zip(mesh.loops, [(0, 0), (1, 0), (1, 1), (0, 1)]):
+        uv_layer.data[loop.index].uv = uv
+    mesh.update()
+    material = bpy.data.materials.new(object_name)
+    material.use_nodes = True
+    material.blend_method = "BLEND"
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    principled = [node for node in nodes if node.type == "BSDF_PRINCIPLED"][0]
+    texture = nodes.new("ShaderNodeTexImage")
+    texture.image = image
+    texture.extension = "CLIP"
+    links.new(texture.outputs["Color"], principled.inputs["Base Color"])
+    links.new(texture.outputs["Alpha"], principled.inputs["Alpha"])
+    mesh.materials.append(material)
+    plane_object = bpy.data.objects.new(object_name, mesh)
+    bpy.context.collection.objects.link(plane_object)
+    return plane_object
+
+
+def set_plane_image(plane_object, image_filepath: str, texture_cache=None):
+    """
+    Swaps the image shown on a plane created by the import images as planes add-on.
+    The plane keeps its height and its width is changed to match the aspect ratio of the new image
+    """
+    new_image = load_image(image_filepath, texture_cache)
+    texture_nodes = [
+        node
+        for node in plane_object.active_material.node_tree.nodes
+        if node.type == "TEX_IMAGE"
+    ]
+    old_image = texture_nodes[0].image
+    for node in texture_nodes:
+        node.image = new_image
+    # removing the previous image once no material is using it
+    if old_image is not None and old_image != new_image and old_image.users == 0:
+        bpy.data.images.remove(old_image)
+    width, height = new_image.size
+    vertices = plane_object.data.vertices
+    plane_height = max(v.co.y for v in vertices) - min(v.co.y for v in vertices)
+    half_width = plane_height * width / height / 2
+    for vertex in vertices:
+        vertex.co.x = math.copysign(half_width, vertex.co.x)
+    plane_object.data.update()
+    return new_image
+
 
 class Image:
-    def __init__(self, image_configs, image_path):
+    def __init__(
+        self,
+        image_configs,
+        image_path,
+        use_bpy_ops: bool = True,
+        texture_cache=None,
+        resize_cache=None,
+    ):
         self.image_configs = image_configs
         self.image_path = image_path
         self.image_name = self.image_configs.image_name
-        self.create_an_image()
-        self.image_name_in_collection = self.get_image_name()
-        self.image_object = self.get_object()
+        self.use_bpy_ops = use_bpy_ops
+        self.texture_cache = texture_cache
+        self.resize_cache = resize_cache
+        self.image_object = self.create_an_image()
         self.image_object.location[2] = 0.05
 
     def get_object(self):
@@ -41,15 +128,53 @@ class Image:
         image_name = name if len(name) <= 63 else name[:63]
         return image_name
 
+    def get_load_path(self):
+        """
+        Directory the document is loaded from, the downscaled copy in the resize cache when there is one
+        """
+        if self.resize_cache is None:
+            return self.image_path
+        return self.resize_cache.get_image_path(self.image_path, self.image_name)
+
     def create_an_image(self):
         """
-        This function imports an images as a plane to the scene
+        This function imports an images as a plane to the scene and returns the plane object
+        Without bpy operators the plane, material and image texture are built through bpy.data
         """
-        bpy.ops.import_image.to_plane(
-            files=[{"name": self.image_name}],
-            directory=self.image_path,
-            relative=False,
+        load_path = self.get_load_path()
+        image_filepath = os.path.join(load_path, self.image_name)
+        if self.use_bpy_ops:
+            if self.texture_cache is not None:
+                # the add-on reuses an image already loaded from the same file
+                self.texture_cache.get_image(image_filepath)
+            bpy.ops.import_image.to_plane(
+                files=[{"name": self.image_name}],
+                directory=load_path,
+                relative=False,
+            )
+            self.image_name_in_collection = self.get_image_name()
+            return self.get_object()
+        image_object = create_image_plane(
+            image_filepath, self.get_image_name(), self.texture_cache
         )
+        self.image_name_in_collection = image_object.name
+        return image_object
+
+    def replace_image(self, image_configs, image_path):
+        """
+        Function shows a new document on the existing image plane instead of importing a new plane
+        """
+        self.image_configs = image_configs
+        self.image_path = image_path
+        self.image_name = self.image_configs.image_name
+        set_plane_image(
+            self.image_object,
+            os.path.join(self.get_load_path(), self.image_name),
+            self.texture_cache,
+        )
+        self.image_object.name = self.get_image_name()
+        self.image_name_in_collection = self.image_object.name
+        self.image_object.location[2] = 0.05
 
     def scale_object(self):
         """
@@ -71,10 +196,12 @@ class Image:
         bpy.context.view_layer.update()
 
     def get_image_coordinates(self):
-        image_collection_name = self.get_image_name()
-        image = bpy.data.objects[image_collection_name]
+        image = self.image_object
+        if not self.use_bpy_ops:
+            # reading the mesh vertices directly, same order as the edit mode vertices
+            return [image.matrix_world @ vertex.co for vertex in image.data.vertices]
         bpy.ops.object.select_all(action="DESELECT")
-        bpy.data.objects[image_collection_name].select_set(True)
+        image.select_set(True)
         bpy.context.view_layer.objects.active = image
         bpy.ops.object.mode_set(mode="EDIT")
         bm = bmesh.from_edit_mesh(image.data)
@@ -83,27 +210,17 @@ class Image:
         bpy.ops.object.mode_set(mode="OBJECT")
         return gloabl_vertices
 
-    def get_segmentation_images(self, rendered_path: str, scene_variation: namedtuple):
-        assert (
-            scene_variation.render_engine == "CYCLES"
-        ), "Render engine should be CYCLES not EEVEE"
-        scene = bpy.context.scene
-        scene.use_nodes = True
-        image = bpy.data.objects[self.image_name_in_collection]
-        image.pass_index = 255
-        nodes = scene.node_tree.nodes
-        links = scene.node_tree.links
-        scene.view_layers["View Layer"].use_pass_object_index = True
-        render_layers = nodes["Render Layers"]
-        output_file = nodes.new("CompositorNodeOutputFile")
-        output_file.base_path = rendered_path
-        output_file.format.color_mode = "BW"
-        output_file.format.color_depth = "8"
-        math_node = nodes.new("CompositorNodeMath")
-        math_node.operation = "DIVIDE"
-        links.new(render_layers.outputs["IndexOB"], math_node.inputs["Value"])
-        math_node.inputs[1].default_value = 255
-        links.new(math_node.outputs["Value"], output_file.inputs["Image"])
-        filename, _ = os.path.splitext(self.image_name)
-        output_file.file_slots[0].path = filename
-        return nodes
+    def get_segmentation_images(
+        self, rendered_path: str, scene_variation: namedtuple, render_name: str = None
+    ):
+        """
+        Adds compositor nodes writing the segmentation image of the document, named after render_name when it is given.
+        Nodes already added by an earlier variation are reused
+        """
+        segmentation_graph = SegmentationGraph(rendered_path)
+        segmentation_graph.set_frame(
+            bpy.data.objects[self.image_name_in_collection],
+            scene_variation,
+            self.image_name if render_name is None else render_name,
+        )
+        return bpy.context.scene.node_tree.nodes
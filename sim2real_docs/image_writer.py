@@ -0,0 +1,137 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Asynchronous write out of the rendered images.
+Blender saves the render result uncompressed to a local staging directory, a bounded pool of threads encodes it to the
+output format and writes it to save_path, so that the scene setup of the next variation overlaps with the file write.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_utils import create_parent_dir, get_output_name
+
+# formats the threads encode the images to
+write_formats = ["PNG", "JPEG"]
+
+
+class ImageWriter:
+    def __init__(
+        self,
+        save_path: str,
+        n_threads: int = 2,
+        max_pending: int = 4,
+        file_format: str = "PNG",
+        png_compression: int = 6,
+        jpeg_quality: int = 90,
+        staging_path: str = None,
+    ):
+        """
+        n_threads encode and write the images, submitting waits while max_pending images are not written yet.
+        png_compression is the zlib level (0-9) of PNG files and jpeg_quality the quality (1-95) of JPEG files.
+        Staged images are kept in staging_path, a temporary directory by default
+        """
+        assert file_format in write_formats, "Write format should be one of {}".format(
+            write_formats
+        )
+        self.save_path = save_path
+        self.file_format = file_format
+        self.png_compression = png_compression
+        self.jpeg_quality = jpeg_quality
+        self.remove_staging = staging_path is None
+        self.staging_path = (
+            staging_path if staging_path is not None else tempfile.mkdtemp()
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=n_threads, thread_name_prefix="image_writer"
+        )
+        # backpressure, a slot is taken for every image until it is written
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = set()
+        self.lock = threading.Lock()
+        self.errors = []
+        self.written = 0
+        self.staged = 0
+        self.closed = False
+        # images still in the queue are written when the interpreter exits
+        atexit.register(self.close)
+
+    def get_output_name(self, image_name: str):
+        return get_output_name(image_name, self.file_format)
+
+    def get_staging_file(self, image_name: str):
+        """
+        Path where blender saves the render result of image_name before it is written
+        """
+        self.staged += 1
+        staging_name = "{}_{}.png".format(self.staged, os.path.basename(image_name))
+        return os.path.join(self.staging_path, staging_name)
+
+    def submit(self, staging_file: str, image_name: str):
+        """
+        Queues the staged image to be written as image_name in save_path, waits while the queue is full.
+        Returns the name of the written file in save_path
+        """
+        self.raise_errors()
+        self.slots.acquire()
+        output_name = self.get_output_name(image_name)
+        future = self.executor.submit(self.write, staging_file, output_name)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self.release)
+        return output_name
+
+    def release(self, future):
+        with self.lock:
+            self.futures.discard(future)
+            if future.exception() is not None:
+                self.errors.append(future.exception())
+            else:
+                self.written += 1
+        self.slots.release()
+
+    def write(self, staging_file: str, output_name: str):
+        """
+        Encodes the staged image and moves it in place, a partly written file is never left under the output name
+        """
+        from PIL import Image as PILImage
+
+        output_filepath = os.path.join(self.save_path, output_name)
+        create_parent_dir(output_filepath)
+        temporary_filepath = "{}.{}.tmp".format(output_filepath, threading.get_ident())
+        with PILImage.open(staging_file) as image:
+            if self.file_format == "JPEG":
+                image.convert("RGB").save(
+                    temporary_filepath, "JPEG", quality=self.jpeg_quality
+                )
+            else:
+                image.save(
+                    temporary_filepath, "PNG", compress_level=self.png_compression
+                )
+        os.replace(temporary_filepath, output_filepath)
+        os.remove(staging_file)
+
+    def raise_errors(self):
+        with self.lock:
+            errors, self.errors = self.errors, []
+        if len(errors) > 0:
+            raise errors[0]
+
+    def close(self):
+        """
+        Waits until every queued image is written and stops the threads, errors of the writes are raised
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.shutdown(wait=True)
+        atexit.unregister(self.close)
+        if self.remove_staging:
+            shutil.rmtree(self.staging_path, ignore_errors=True)
+        self.raise_errors()
+
+    def get_stats(self):
+        return {"written": self.written, "pending": len(self.futures)}
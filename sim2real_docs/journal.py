@@ -0,0 +1,217 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Append-only journal of rendered variations.
+Every variation is written to a JSON Lines file as soon as its image is saved, so a run that stops can be resumed
+without rendering the completed variations again. metadata.json is compacted from the journal at the end of the run.
+Render events such as frames stopped by the time limit or workers restarted by the watchdog are kept with the variation
+and written to its metadata record.
+"""
+import json
+import os
+import time
+
+from .create_random_values import get_run_seed
+
+# run seed of the variations in save_path, read back by resumed runs
+run_seed_name = "run_seed.json"
+
+
+def get_journal_name(metadata_name: str):
+    """
+    Journal file name for a metadata file name, e.g. metadata.json -> metadata.jsonl
+    """
+    name, _ = os.path.splitext(metadata_name)
+    return name + ".jsonl"
+
+
+def get_progress_path(journal_path: str):
+    """
+    File holding the variation a worker is rendering, e.g. metadata.jsonl -> metadata.progress.json
+    """
+    name, _ = os.path.splitext(journal_path)
+    return name + ".progress.json"
+
+
+def read_progress(journal_path: str):
+    """
+    Output name and start time of the variation being rendered, None between runs
+    """
+    try:
+        with open(get_progress_path(journal_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_journal(journal_path: str):
+    """
+    Reads the journal and returns the last entry of every output image, with the events of all its entries.
+    A partially written last line, e.g. after a crash, is ignored
+    """
+    entries = {}
+    if not os.path.exists(journal_path):
+        return entries
+    with open(journal_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "record" not in entry:
+                # event lines add to the events of the variation, records hold all of its events
+                events = entries.get(entry["output_name"], {}).get("events", [])
+                entry["events"] = events + entry["events"]
+            entries[entry["output_name"]] = entry
+    return entries
+
+
+def append_event(journal_path: str, output_name: str, event: dict):
+    """
+    Appends a render event of a variation to a journal without a record, e.g. from the render farm watchdog
+    after the worker writing the journal was stopped
+    """
+    with open(journal_path, "a") as f:
+        f.write(
+            "\n" + json.dumps({"output_name": output_name, "events": [event]}) + "\n"
+        )
+
+
+def get_resume_seed(save_path: str, seed: int = None, resume: bool = False):
+    """
+    Run seed of the variations rendered to save_path. The seed of the first run is written to run_seed.json and
+    read back with resume, so a resumed run without seed samples the same variations
+    """
+    seed_path = os.path.join(save_path, run_seed_name)
+    if resume and os.path.exists(seed_path):
+        with open(seed_path) as f:
+            run_seed = json.load(f)["seed"]
+        assert (
+            seed is None or seed == run_seed
+        ), "Seed {} differs from the run seed {} of the resumed run".format(
+            seed, run_seed
+        )
+        return run_seed
+    assert (
+        not resume or seed is not None
+    ), "No run seed in {}, resume needs the seed of the first run".format(save_path)
+    run_seed = get_run_seed(seed)
+    with open(seed_path, "w") as f:
+        json.dump({"seed": run_seed}, f)
+    return run_seed
+
+
+class MetadataJournal:
+    def __init__(
+        self, save_path: str, metadata_name: str = "metadata.json", resume=False
+    ):
+        """
+        Opens the journal in save_path. Without resume, a journal left by a previous run is discarded
+        """
+        self.save_path = save_path
+        self.journal_path = os.path.join(save_path, get_journal_name(metadata_name))
+        if resume:
+            self.entries = read_journal(self.journal_path)
+            mode = "a"
+        else:
+            self.entries = {}
+            mode = "w"
+        self.journal_file = open(self.journal_path, mode)
+        if resume and self.journal_file.tell() > 0:
+            # starting on a new line in case the last line was partially written
+            self.journal_file.write("\n")
+
+    def is_completed(self, output_name: str):
+        """
+        A variation is completed when it is in the journal and its rendered image exists,
+        or when it was dropped after too many timeouts (output_file is None).
+        Images written to tar shards are recorded as shard/member and count as existing when the shard does
+        """
+        entry = self.entries.get(output_name)
+        if entry is None or "output_file" not in entry:
+            return False
+        if entry["output_file"] is None:
+            return True
+        output_path = os.path.join(self.save_path, entry["output_file"])
+        shard_separator = ".tar" + os.sep
+        if shard_separator in output_path:
+            output_path = output_path.split(shard_separator)[0] + ".tar"
+        return os.path.exists(output_path)
+
+    def get_events(self, output_name: str):
+        """
+        Render events of a variation recorded by earlier runs
+        """
+        return self.entries.get(output_name, {}).get("events", [])
+
+    def append(
+        self, output_name: str, output_file: str, record: dict, events: list = None
+    ):
+        """
+        Appends a rendered variation to the journal and flushes it to disk.
+        Render events are added to the record as render_events
+        """
+        entry = {"output_name": output_name, "output_file": output_file}
+        if events:
+            entry["events"] = events
+            record = dict(record, render_events=events)
+        self.journal_file.write(json.dumps(dict(entry, record=record)) + "\n")
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+        self.entries[output_name] = entry
+
+    def set_progress(self, output_name: str):
+        """
+        Records the variation that starts rendering, the render farm watchdog uses it to find hung workers
+        """
+        progress_path = get_progress_path(self.journal_path)
+        with open(progress_path + ".tmp", "w") as f:
+            json.dump({"output_name": output_name, "started": time.time()}, f)
+        os.replace(progress_path + ".tmp", progress_path)
+
+    def clear_progress(self):
+        progress_path = get_progress_path(self.journal_path)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+    def close(self):
+        self.journal_file.close()
+
+    def iter_records(self):
+        """
+        Yields the last record of every output image in journal order. Variations dropped after too many timeouts
+        have no image and are only kept in the journal.
+        Records are streamed from the journal so the whole metadata is never held in memory
+        """
+        self.journal_file.flush()
+        last_lines = {}
+        with open(self.journal_path) as f:
+            for line_number, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # event lines without a record are only read back through read_journal
+                if "record" in entry:
+                    rendered = entry["output_file"] is not None
+                    last_lines[entry["output_name"]] = line_number if rendered else None
+        keep_lines = set(last_lines.values())
+        with open(self.journal_path) as f:
+            for line_number, line in enumerate(f):
+                if line_number in keep_lines:
+                    yield json.loads(line)["record"]
+
+    def compact(self, metadata_path: str):
+        """
+        Writes the records of the journal into a json metadata file, keeping the last record of every rendered image
+        """
+        n_records = 0
+        with open(metadata_path, "w") as metadata:
+            metadata.write("[")
+            for record in self.iter_records():
+                if n_records > 0:
+                    metadata.write(", ")
+                json.dump(record, metadata)
+                n_records += 1
+            metadata.write("]")
+        return n_records
@@ -8,8 +8,9 @@ from mathutils import Color
 
 
 class Light:
-    def __init__(self, light_configs):
+    def __init__(self, light_configs, use_bpy_ops: bool = True):
         self.light_configs = light_configs
+        self.use_bpy_ops = use_bpy_ops
         light_data = bpy.data.lights.new(
             name="light", type=self.light_configs.light_type
         )
@@ -17,6 +18,15 @@ class Light:
         bpy.context.collection.objects.link(light_object)
         self.light_object = light_object
 
+    def update_configs(self, light_configs):
+        """
+        The method replaces the light variation so the same light object can be reused for the next image.
+        Light type is changed on the existing light data instead of creating a new light
+        """
+        self.light_configs = light_configs
+        if self.light_object.data.type != self.light_configs.light_type:
+            self.light_object.data.type = self.light_configs.light_type
+
     def set_light_location(self):
         """
         The method sets light location
@@ -32,16 +42,21 @@ class Light:
         """
         "Blender RGB values ranges from 0,1 instead of 255. Therefore using hsv values"
         selecting the HSV values of a light
+        Without bpy operators the color is set on the light object directly instead of selecting it first
         """
-        bpy.ops.object.select_all(action="DESELECT")
-        bpy.data.objects[self.light_object.name].select_set(True)
-        bpy.context.view_layer.objects.active = self.light_object
         color_object = Color()
         color_object.hsv = (
             self.light_configs.color_hue,
             self.light_configs.color_saturation,
             self.light_configs.color_value,
         )
-        bpy.context.object.color = (color_object.r, color_object.g, color_object.b, 1.0)
+        color = (color_object.r, color_object.g, color_object.b, 1.0)
+        if not self.use_bpy_ops:
+            self.light_object.color = color
+            return color_object
+        bpy.ops.object.select_all(action="DESELECT")
+        bpy.data.objects[self.light_object.name].select_set(True)
+        bpy.context.view_layer.objects.active = self.light_object
+        bpy.context.object.color = color
         bpy.ops.object.select_all(action="DESELECT")
         return color_object
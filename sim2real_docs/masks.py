@@ -0,0 +1,124 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Analytical segmentation masks of the document.
+The faces of the document plane are projected to the rendered image and rasterized with numpy, so masks do not need
+an object index pass and can be made with any render engine. Pixels are inside the document when their center is.
+"""
+import os
+
+import numpy as np
+
+from .file_utils import create_parent_dir
+from .projection import get_render_borders, view_to_render_pixels
+
+
+def get_mask_size(scene_variation):
+    """
+    Width and height in pixels of the rendered image of a variation, with the integer crop borders of blender
+    """
+    min_x, max_x, min_y, max_y = get_render_borders(
+        scene_variation.resolution_x,
+        scene_variation.resolution_y,
+        scene_variation.resolution_percentage,
+        scene_variation.crop_min_x,
+        scene_variation.crop_max_x,
+        scene_variation.crop_min_y,
+        scene_variation.crop_max_y,
+    )
+    return int(max_x - min_x), int(max_y - min_y)
+
+
+def rasterize_polygons(polygons: list, width: int, height: int):
+    """
+    Boolean (height, width) mask of the pixels whose center is inside one of the convex polygons.
+    Polygons are (k, 2) pixel coordinates with the origin at the top left, in either winding order
+    """
+    mask = np.zeros((height, width), dtype=bool)
+    for polygon in polygons:
+        polygon = np.asarray(polygon, dtype=float)
+        edges = np.roll(polygon, -1, axis=0) - polygon
+        area = np.sum(polygon[:, 0] * edges[:, 1] - polygon[:, 1] * edges[:, 0])
+        if area == 0 or not np.isfinite(area):
+            continue
+        # only the pixels in the bounding box of the polygon are tested
+        x_start = max(int(np.floor(polygon[:, 0].min())), 0)
+        x_end = min(int(np.ceil(polygon[:, 0].max())), width)
+        y_start = max(int(np.floor(polygon[:, 1].min())), 0)
+        y_end = min(int(np.ceil(polygon[:, 1].max())), height)
+        if x_start >= x_end or y_start >= y_end:
+            continue
+        x = np.arange(x_start, x_end)[None, :] + 0.5
+        y = np.arange(y_start, y_end)[:, None] + 0.5
+        inside = np.ones((y_end - y_start, x_end - x_start), dtype=bool)
+        for point, edge in zip(polygon, edges):
+            cross = edge[0] * (y - point[1]) - edge[1] * (x - point[0])
+            inside &= np.sign(area) * cross >= 0
+        mask[y_start:y_end, x_start:x_end] |= inside
+    return mask
+
+
+def get_document_mask(view_polygons: list, scene_variation):
+    """
+    Mask of the document in the rendered image of a variation from the faces of the document plane in normalized
+    view coordinates (x, y, depth), e.g. from segmentation.get_document_view_polygons.
+    Faces with a corner behind the camera are left out
+    """
+    render_borders = get_render_borders(
+        scene_variation.resolution_x,
+        scene_variation.resolution_y,
+        scene_variation.resolution_percentage,
+        scene_variation.crop_min_x,
+        scene_variation.crop_max_x,
+        scene_variation.crop_min_y,
+        scene_variation.crop_max_y,
+    )
+    render_scale = int(scene_variation.resolution_percentage) / 100
+    render_size = (
+        int(scene_variation.resolution_x * render_scale),
+        int(scene_variation.resolution_y * render_scale),
+    )
+    pixel_polygons = []
+    for polygon in view_polygons:
+        polygon = np.asarray(polygon, dtype=float)
+        if (polygon[:, 2] <= 0).any():
+            continue
+        pixel_polygons.append(
+            view_to_render_pixels(polygon[:, :2], render_borders, render_size)
+        )
+    return rasterize_polygons(pixel_polygons, *get_mask_size(scene_variation))
+
+
+def write_mask(mask, mask_path: str, render_name: str):
+    """
+    Writes the mask as an 8 bit png named after the rendered image, 255 on the document and 0 elsewhere.
+    Returns the name of the mask file in mask_path
+    """
+    from PIL import Image as PILImage
+
+    name, _ = os.path.splitext(render_name)
+    mask_name = name + ".png"
+    mask_filepath = os.path.join(mask_path, mask_name)
+    create_parent_dir(mask_filepath)
+    PILImage.fromarray(mask.astype(np.uint8) * 255).save(mask_filepath)
+    return mask_name
+
+
+def read_mask(mask_filepath: str, threshold: int = 128):
+    """
+    Reads a mask image, e.g. a segmentation image of the object index pass, as a boolean array
+    """
+    from PIL import Image as PILImage
+
+    with PILImage.open(mask_filepath) as mask:
+        return np.asarray(mask.convert("L")) >= threshold
+
+
+def get_mask_iou(mask, other_mask):
+    """
+    Intersection over union of two boolean masks of the same size, 1 when both are empty
+    """
+    union = np.logical_or(mask, other_mask).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(mask, other_mask).sum() / union)
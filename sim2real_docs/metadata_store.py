@@ -0,0 +1,304 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Columnar metadata store, an alternative to a single metadata.json.
+Records are appended one at a time. Numeric parameters are written to one raw binary file per column and read back as
+numpy memmaps, bounding boxes as a (n, 4, 2) float array. Names and the values that do not fit a column are kept
+in a JSON Lines file with an offset index, so any record can be read without loading the others.
+metadata.json can still be exported from a store with export_json.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+metadata_formats = ["json", "columnar"]
+schema_name = "schema.json"
+rows_name = "rows.jsonl"
+offsets_name = "rows.offsets.i8"
+# columns with a fixed shape whatever the first record holds, e.g. no bounding boxes before rendering
+fixed_shapes = {("image_configs", "image_bbs"): (4, 2)}
+
+
+def get_store_name(metadata_name: str):
+    """
+    Directory of the store for a metadata file name, e.g. metadata.json -> metadata_store
+    """
+    name, _ = os.path.splitext(metadata_name)
+    return name + "_store"
+
+
+def get_column_name(section: str, key: str):
+    return "{}.{}".format(section, key)
+
+
+def get_column_type(value, shape: tuple = None):
+    """
+    dtype and shape of the column holding a value, None for values kept in the rows file
+    """
+    if shape is not None:
+        return "f8", shape
+    if isinstance(value, bool):
+        return "b1", ()
+    if isinstance(value, int):
+        return "i8", ()
+    if isinstance(value, float):
+        return "f8", ()
+    if isinstance(value, list) and len(value) > 0:
+        array = np.asarray(value)
+        if array.dtype.kind in "iuf" and array.ndim == 1:
+            return ("i8" if array.dtype.kind in "iu" else "f8"), array.shape
+    return None
+
+
+def fits_column(value, dtype: str, shape: tuple):
+    """
+    True when the value is stored exactly in a column of the dtype and shape
+    """
+    if shape == ():
+        types = {"b1": bool, "i8": int, "f8": float}
+        return type(value) is types[dtype]
+    try:
+        array = np.asarray(value, dtype=float)
+    except (TypeError, ValueError):
+        return False
+    if array.shape != shape or not np.isfinite(array).all():
+        return False
+    return dtype == "f8" or (array == np.round(array)).all()
+
+
+def check_replaceable(store_path: str):
+    """
+    A store is only written in place of a missing or empty directory or of an earlier store
+    """
+    if not os.path.exists(store_path):
+        return
+    assert os.path.isdir(store_path), "{} is not a directory".format(store_path)
+    names = os.listdir(store_path)
+    assert (
+        len(names) == 0 or schema_name in names
+    ), "{} is not empty and is not a metadata store, it is not replaced".format(
+        store_path
+    )
+
+
+class MetadataStore:
+    def __init__(self, store_path: str, mode: str = "r"):
+        """
+        Opens the store in store_path for reading (mode "r") or creates it for writing (mode "w").
+        A store is written to a new directory next to store_path and moved in place when it is closed, replacing
+        an earlier store. Directories that are not empty and are not stores are never replaced
+        """
+        assert mode in ["r", "w"], "Mode should be r or w"
+        self.store_path = store_path
+        self.mode = mode
+        self.schema = None
+        self.column_files = {}
+        self.columns = None
+        self.n_rows = 0
+        if mode == "w":
+            check_replaceable(store_path)
+            parent_path, name = os.path.split(os.path.abspath(store_path))
+            os.makedirs(parent_path, exist_ok=True)
+            self.write_path = tempfile.mkdtemp(prefix=name + ".", dir=parent_path)
+            self.rows_file = open(os.path.join(self.write_path, rows_name), "wb")
+            self.offsets_file = open(os.path.join(self.write_path, offsets_name), "wb")
+        else:
+            with open(os.path.join(store_path, schema_name)) as f:
+                self.schema = json.load(f)
+            self.n_rows = self.schema["n_rows"]
+            self.offsets = np.fromfile(
+                os.path.join(store_path, offsets_name), dtype="i8"
+            )
+            self.rows_file = open(os.path.join(store_path, rows_name), "rb")
+
+    def __len__(self):
+        return self.n_rows
+
+    def get_schema(self, record: dict):
+        """
+        Column layout from the first record, the key order of the record is kept for the export
+        """
+        order = []
+        columns = []
+        for section, values in record.items():
+            if not isinstance(values, dict):
+                order.append([section, None])
+                continue
+            for key, value in values.items():
+                order.append([section, key])
+                column_type = get_column_type(value, fixed_shapes.get((section, key)))
+                if column_type is not None:
+                    dtype, shape = column_type
+                    columns.append(
+                        {
+                            "section": section,
+                            "key": key,
+                            "dtype": dtype,
+                            "shape": list(shape),
+                        }
+                    )
+        return {"order": order, "columns": columns, "n_rows": 0}
+
+    def append(self, record: dict):
+        """
+        Appends a record, numeric values to their columns and all the others to the rows file
+        """
+        if self.schema is None:
+            self.schema = self.get_schema(record)
+            for column in self.schema["columns"]:
+                name = get_column_name(column["section"], column["key"])
+                self.column_files[name] = open(
+                    os.path.join(self.write_path, name + "." + column["dtype"]), "wb"
+                )
+        extras = []
+        missing = []
+        column_keys = set()
+        for column in self.schema["columns"]:
+            section, key = column["section"], column["key"]
+            column_keys.add((section, key))
+            dtype, shape = column["dtype"], tuple(column["shape"])
+            values = record.get(section)
+            if not isinstance(values, dict) or key not in values:
+                missing.append([section, key])
+                value = None
+            else:
+                value = values[key]
+            if value is not None and fits_column(value, dtype, shape):
+                array = np.asarray(value, dtype=dtype)
+            else:
+                if value is not None or [section, key] not in missing:
+                    extras.append([section, key, value])
+                array = np.zeros(shape, dtype=dtype)
+                if dtype == "f8":
+                    array[...] = np.nan
+            self.column_files[get_column_name(section, key)].write(array.tobytes())
+        for section, values in record.items():
+            if not isinstance(values, dict):
+                extras.append([section, None, values])
+                continue
+            for key, value in values.items():
+                if (section, key) not in column_keys:
+                    extras.append([section, key, value])
+        row = {"extras": extras}
+        if len(missing) > 0:
+            row["missing"] = missing
+        self.offsets_file.write(np.int64(self.rows_file.tell()).tobytes())
+        self.rows_file.write((json.dumps(row) + "\n").encode("utf-8"))
+        self.n_rows += 1
+
+    def close(self):
+        self.rows_file.close()
+        if self.mode == "r":
+            return
+        self.offsets_file.close()
+        for column_file in self.column_files.values():
+            column_file.close()
+        if self.schema is None:
+            self.schema = {"order": [], "columns": [], "n_rows": 0}
+        self.schema["n_rows"] = self.n_rows
+        with open(os.path.join(self.write_path, schema_name), "w") as f:
+            json.dump(self.schema, f)
+        check_replaceable(self.store_path)
+        if os.path.exists(self.store_path):
+            shutil.rmtree(self.store_path)
+        os.rename(self.write_path, self.store_path)
+
+    def get_column(self, section: str, key: str):
+        """
+        Memmap of a numeric column, (n,) for numbers and (n,) + shape for arrays such as image_bbs
+        """
+        for column in self.schema["columns"]:
+            if column["section"] == section and column["key"] == key:
+                if self.n_rows == 0:
+                    return np.zeros((0,) + tuple(column["shape"]), column["dtype"])
+                return np.memmap(
+                    os.path.join(
+                        self.store_path,
+                        get_column_name(section, key) + "." + column["dtype"],
+                    ),
+                    dtype=column["dtype"],
+                    mode="r",
+                    shape=(self.n_rows,) + tuple(column["shape"]),
+                )
+        raise KeyError(get_column_name(section, key))
+
+    def get_image_bbs(self):
+        """
+        Bounding boxes of the documents as a (n, 4, 2) float array, NaN for records without bounding boxes
+        """
+        return self.get_column("image_configs", "image_bbs")
+
+    def get_record(self, index: int):
+        """
+        Record of a row, the same dictionary that was appended
+        """
+        return self.read_record(index, self.get_columns())
+
+    def get_columns(self):
+        if self.columns is None:
+            self.columns = [
+                (column, self.get_column(column["section"], column["key"]))
+                for column in self.schema["columns"]
+            ]
+        return self.columns
+
+    def read_record(self, index: int, columns: list):
+        self.rows_file.seek(int(self.offsets[index]))
+        row = json.loads(self.rows_file.readline())
+        values = {}
+        for column, array in columns:
+            values[column["section"], column["key"]] = array[index].tolist()
+        for section, key, value in row["extras"]:
+            values[section, key] = value
+        for section, key in row.get("missing", []):
+            del values[section, key]
+        record = {}
+        order = [tuple(i) for i in self.schema["order"]]
+        ordered = set(order)
+        order += [key for key in values if key not in ordered]
+        for section, key in order:
+            if (section, key) not in values:
+                continue
+            if key is None:
+                record[section] = values[section, key]
+            else:
+                record.setdefault(section, {})[key] = values[section, key]
+        return record
+
+    def iter_records(self):
+        """
+        Yields the records in order, reading the columns through memmaps
+        """
+        columns = self.get_columns()
+        for index in range(self.n_rows):
+            yield self.read_record(index, columns)
+
+
+def write_store(records, store_path: str):
+    """
+    Writes an iterable of records to a new store, returns the number of records
+    """
+    store = MetadataStore(store_path, "w")
+    for record in records:
+        store.append(record)
+    store.close()
+    return len(store)
+
+
+def export_json(store_path: str, metadata_path: str):
+    """
+    Writes the records of a store to a json metadata file one record at a time
+    """
+    store = MetadataStore(store_path)
+    with open(metadata_path, "w") as f:
+        f.write("[")
+        for i, record in enumerate(store.iter_records()):
+            if i > 0:
+                f.write(", ")
+            json.dump(record, f)
+        f.write("]")
+    store.close()
+    return len(store)
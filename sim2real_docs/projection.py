@@ -0,0 +1,366 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Camera model in numpy to find document bounding boxes without blender.
+The document quads of whole batches of variations are projected to pixel space from the sampled parameters,
+following the same steps as blender: import images as planes geometry, object transforms, world_to_camera_view
+and the crop calculations of image_3d_to_2d_coords.
+"""
+import os
+
+import numpy as np
+
+from .file_utils import get_manifest_dimensions
+
+# default blender camera sensor width in mm, the sensor fit is AUTO
+default_sensor_width = 36.0
+# location of the document plane set by image_utils.Image
+document_location = (0.0, 0.0, 0.05)
+# corners of the quads (top left, bottom left, top right, bottom right) in the order of a polygon loop
+quad_loop_order = [0, 1, 3, 2]
+
+
+def get_rotation_matrices(x_rotation, y_rotation, z_rotation):
+    """
+    Rotation matrices of XYZ euler angles in radians, one (3, 3) matrix per angle
+    """
+    cos_x, sin_x = np.cos(x_rotation), np.sin(x_rotation)
+    cos_y, sin_y = np.cos(y_rotation), np.sin(y_rotation)
+    cos_z, sin_z = np.cos(z_rotation), np.sin(z_rotation)
+    # R = Rz @ Ry @ Rx, same as blender euler XYZ
+    return np.stack(
+        [
+            np.stack(
+                [
+                    cos_y * cos_z,
+                    sin_x * sin_y * cos_z - cos_x * sin_z,
+                    cos_x * sin_y * cos_z + sin_x * sin_z,
+                ],
+                axis=-1,
+            ),
+            np.stack(
+                [
+                    cos_y * sin_z,
+                    sin_x * sin_y * sin_z + cos_x * cos_z,
+                    cos_x * sin_y * sin_z - sin_x * cos_z,
+                ],
+                axis=-1,
+            ),
+            np.stack([-sin_y, sin_x * cos_y, cos_x * cos_y], axis=-1),
+        ],
+        axis=-2,
+    )
+
+
+def get_plane_vertices(plane_aspects):
+    """
+    Local vertices of document planes, 1 meter high and plane_aspects (width / height) wide.
+    Vertex order of the plane primitive - bottom left, bottom right, top left, top right
+    """
+    half_width = np.asarray(plane_aspects, dtype=float) / 2
+    corners = np.array([[-1, -1], [1, -1], [-1, 1], [1, 1]], dtype=float)
+    vertices = np.zeros(half_width.shape + (4, 3))
+    vertices[..., 0] = corners[:, 0] * half_width[..., None]
+    vertices[..., 1] = corners[:, 1] * 0.5
+    return vertices
+
+
+def get_plane_aspects(image_path: str, image_names):
+    """
+    Aspect ratios of the document images. Dimensions in the manifest of image_path are used when present,
+    the other images are read from the image headers with Pillow
+    """
+    from PIL import Image as PILImage
+
+    aspects = {}
+    dimensions = get_manifest_dimensions(image_path)
+    for image_name in set(image_names):
+        if image_name in dimensions:
+            width, height = dimensions[image_name]
+            aspects[image_name] = width / height
+            continue
+        with PILImage.open(os.path.join(image_path, image_name)) as image:
+            aspects[image_name] = image.size[0] / image.size[1]
+    return np.array([aspects[image_name] for image_name in image_names])
+
+
+def get_view_frames(
+    resolution_x,
+    resolution_y,
+    pixel_aspect_x,
+    pixel_aspect_y,
+    focal_length,
+    sensor_width: float = default_sensor_width,
+):
+    """
+    Half width and half height of the camera view at a distance of 1 meter, as in Camera.view_frame.
+    The sensor fits the wider side of the render, including the pixel aspect
+    """
+    aspect_x = np.asarray(resolution_x, dtype=float) * pixel_aspect_x
+    aspect_y = np.asarray(resolution_y, dtype=float) * pixel_aspect_y
+    horizontal_fit = aspect_x >= aspect_y
+    half_size = sensor_width / (2 * np.asarray(focal_length, dtype=float))
+    half_width = np.where(horizontal_fit, 1.0, aspect_x / aspect_y) * half_size
+    half_height = np.where(horizontal_fit, aspect_y / aspect_x, 1.0) * half_size
+    return np.stack([half_width, half_height], axis=-1)
+
+
+def world_to_camera_view(points, camera_location, camera_rotation, view_frames):
+    """
+    Batched bpy_extras.object_utils.world_to_camera_view.
+    points are (n, k, 3) world coordinates, camera_location (n, 3), camera_rotation (n, 3, 3) and view_frames (n, 2).
+    Returns (n, k, 3) normalized view coordinates - (0, 0) bottom left and (1, 1) top right of the camera view - and depth
+    """
+    # camera space coordinates, the inverse of a rotation is its transpose
+    local = np.einsum(
+        "nji,nkj->nki", camera_rotation, points - camera_location[:, None, :]
+    )
+    depth = -local[..., 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        view = local[..., :2] / (depth[..., None] * view_frames[:, None, :]) / 2 + 0.5
+    # blender returns the center of the view for points on the camera plane
+    view = np.where(depth[..., None] == 0, 0.5, view)
+    return np.concatenate([view, depth[..., None]], axis=-1)
+
+
+def get_rendered_sizes(
+    resolution_x,
+    resolution_y,
+    resolution_percentage,
+    crop_min_x,
+    crop_max_x,
+    crop_min_y,
+    crop_max_y,
+):
+    """
+    Width and height in pixels of the cropped rendered images, as a (n, 2) array
+    """
+    # blender stores the resolution percentage as an integer
+    render_scale = np.trunc(resolution_percentage) / 100
+    render_width = np.trunc(np.asarray(resolution_x) * render_scale)
+    render_height = np.trunc(np.asarray(resolution_y) * render_scale)
+    crop_width = np.asarray(crop_max_x) - crop_min_x
+    crop_height = np.asarray(crop_max_y) - crop_min_y
+    return np.stack([crop_width * render_width, crop_height * render_height], axis=-1)
+
+
+def view_to_pixel_coordinates(
+    view_coordinates,
+    resolution_x,
+    resolution_y,
+    resolution_percentage,
+    crop_min_x,
+    crop_max_x,
+    crop_min_y,
+    crop_max_y,
+):
+    """
+    Batched crop calculations of image_3d_to_2d_coords.
+    Converts (n, k, 2) normalized view coordinates to pixel coordinates of the cropped rendered image,
+    with the origin at the top left. Values can be negative or larger than the image when a corner is cropped out
+    """
+    rendered_sizes = get_rendered_sizes(
+        resolution_x,
+        resolution_y,
+        resolution_percentage,
+        crop_min_x,
+        crop_max_x,
+        crop_min_y,
+        crop_max_y,
+    )
+    crop_min = np.stack([crop_min_x, crop_min_y], axis=-1)[:, None, :]
+    crop_size = np.stack(
+        [np.asarray(crop_max_x) - crop_min_x, np.asarray(crop_max_y) - crop_min_y],
+        axis=-1,
+    )[:, None, :]
+    pixels = rendered_sizes[:, None, :] * (view_coordinates - crop_min) / crop_size
+    pixels[..., 1] = rendered_sizes[:, None, 1] - pixels[..., 1]
+    return pixels
+
+
+def get_render_borders(
+    resolution_x,
+    resolution_y,
+    resolution_percentage,
+    crop_min_x,
+    crop_max_x,
+    crop_min_y,
+    crop_max_y,
+):
+    """
+    Pixel borders of the cropped renders in the full frame as blender computes them, truncating the crop values
+    times the frame size. Returns a (n, 4) integer array - min x, max x, min y, max y with y from the bottom
+    """
+    render_scale = np.trunc(resolution_percentage) / 100
+    render_width = np.trunc(np.asarray(resolution_x) * render_scale)
+    render_height = np.trunc(np.asarray(resolution_y) * render_scale)
+    borders = np.stack(
+        [
+            np.asarray(crop_min_x) * render_width,
+            np.asarray(crop_max_x) * render_width,
+            np.asarray(crop_min_y) * render_height,
+            np.asarray(crop_max_y) * render_height,
+        ],
+        axis=-1,
+    )
+    return np.trunc(borders).astype(int)
+
+
+def view_to_render_pixels(view_coordinates, render_borders, render_size):
+    """
+    Converts (k, 2) normalized view coordinates of one variation to pixel coordinates of the rendered image,
+    origin at the top left, using the integer borders of get_render_borders and the (width, height) of the full frame.
+    Unlike image_3d_to_2d_coords, the pixels line up exactly with the pixels blender renders
+    """
+    min_x, _, min_y, max_y = render_borders
+    pixels = np.asarray(view_coordinates, dtype=float) * render_size
+    pixels[:, 0] -= min_x
+    pixels[:, 1] = max_y - pixels[:, 1]
+    return pixels
+
+
+def project_document_quads(
+    plane_aspects,
+    image_scale,
+    image_rotation,
+    camera_location,
+    camera_rotation,
+    focal_length,
+    resolution,
+    pixel_aspect,
+    resolution_percentage,
+    crop,
+    sensor_width: float = default_sensor_width,
+    return_depth: bool = False,
+):
+    """
+    Pixel coordinates of the document corners for n variations, as a (n, 4, 2) array ordered
+    top left, bottom left, top right, bottom right like image_3d_to_2d_coords. This order is not a polygon loop,
+    reorder the corners with get_quad_loops before computing areas or edges.
+    With return_depth, the (n, 4) distances of the corners in front of the camera are returned as well.
+    image_scale, image_rotation, camera_location, camera_rotation, resolution, pixel_aspect are (n, 3) or (n, 2) arrays,
+    crop is (n, 4) - min x, max x, min y, max y.
+    Rotations are the values stored in the variations, they are converted with radians like camera_utils and image_utils do
+    """
+    image_scale = np.asarray(image_scale, dtype=float)
+    image_rotation = np.radians(np.asarray(image_rotation, dtype=float))
+    camera_rotation = np.radians(np.asarray(camera_rotation, dtype=float))
+    resolution = np.asarray(resolution)
+    pixel_aspect = np.asarray(pixel_aspect, dtype=float)
+    crop = np.asarray(crop, dtype=float)
+    vertices = get_plane_vertices(plane_aspects) * image_scale[:, None, :]
+    document_rotation = get_rotation_matrices(*image_rotation.T)
+    points = np.einsum("nij,nkj->nki", document_rotation, vertices) + document_location
+    view_frames = get_view_frames(
+        resolution[:, 0],
+        resolution[:, 1],
+        pixel_aspect[:, 0],
+        pixel_aspect[:, 1],
+        focal_length,
+        sensor_width,
+    )
+    view_coordinates = world_to_camera_view(
+        points,
+        np.asarray(camera_location, dtype=float),
+        get_rotation_matrices(*camera_rotation.T),
+        view_frames,
+    )
+    # top left, bottom left, top right, bottom right
+    view_coordinates = view_coordinates[:, [2, 0, 3, 1]]
+    quads = view_to_pixel_coordinates(
+        view_coordinates[..., :2],
+        resolution[:, 0],
+        resolution[:, 1],
+        resolution_percentage,
+        *crop.T
+    )
+    if return_depth:
+        return quads, view_coordinates[..., 2]
+    return quads
+
+
+def get_quad_loops(quads):
+    """
+    Corners of (n, 4, 2) quads in polygon loop order - top left, bottom left, bottom right, top right
+    """
+    return quads[:, quad_loop_order]
+
+
+def get_table_quads(
+    table,
+    plane_aspects,
+    sensor_width: float = default_sensor_width,
+    return_depth: bool = False,
+):
+    """
+    Document quads of every row of a ParameterTable, plane_aspects gives the aspect ratio of each row's document
+    """
+    return project_document_quads(
+        plane_aspects,
+        image_scale=np.stack(
+            [table.get_column("image_{}_scale".format(axis)) for axis in "xyz"], axis=-1
+        ),
+        image_rotation=np.stack(
+            [table.get_column("image_{}_rotation".format(axis)) for axis in "xyz"],
+            axis=-1,
+        ),
+        camera_location=np.stack(
+            [table.get_column("camera_{}_location".format(axis)) for axis in "xyz"],
+            axis=-1,
+        ),
+        camera_rotation=np.stack(
+            [table.get_column("camera_{}_rotation".format(axis)) for axis in "xyz"],
+            axis=-1,
+        ),
+        focal_length=table.get_column("camera_focal_length"),
+        resolution=table.get_column("resolution"),
+        pixel_aspect=table.get_column("aspect_ratio"),
+        resolution_percentage=table.get_column("resolution_percentage"),
+        crop=np.stack(
+            [
+                table.get_column(name)
+                for name in ["crop_min_x", "crop_max_x", "crop_min_y", "crop_max_y"]
+            ],
+            axis=-1,
+        ),
+        sensor_width=sensor_width,
+        return_depth=return_depth,
+    )
+
+
+def get_variation_quads(
+    variations,
+    plane_aspects,
+    sensor_width: float = default_sensor_width,
+    return_depth: bool = False,
+):
+    """
+    Document quads of a list of variations (Variation_tuple), e.g. variations read from a configuration file
+    """
+    scenes = [i.scene for i in variations]
+    cameras = [i.camera for i in variations]
+    images = [i.image for i in variations]
+    return project_document_quads(
+        plane_aspects,
+        image_scale=[
+            (i.image_x_scale, i.image_y_scale, i.image_z_scale) for i in images
+        ],
+        image_rotation=[
+            (i.image_x_rotation, i.image_y_rotation, i.image_z_rotation) for i in images
+        ],
+        camera_location=[
+            (i.camera_x_location, i.camera_y_location, i.camera_z_location)
+            for i in cameras
+        ],
+        camera_rotation=[
+            (i.camera_x_rotation, i.camera_y_rotation, i.camera_z_rotation)
+            for i in cameras
+        ],
+        focal_length=[i.camera_focal_length for i in cameras],
+        resolution=[(i.resolution_x, i.resolution_y) for i in scenes],
+        pixel_aspect=[i.aspect_ratio for i in scenes],
+        resolution_percentage=[i.resolution_percentage for i in scenes],
+        crop=[(i.crop_min_x, i.crop_max_x, i.crop_min_y, i.crop_max_y) for i in scenes],
+        sensor_width=sensor_width,
+        return_depth=return_depth,
+    )
@@ -0,0 +1,236 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Content addressed cache of rendered images.
+A variation is keyed by a hash of its parameters, the contents of its document and background files and the render
+settings of the run. When the same variation was rendered before, its image, masks and bounding boxes are taken from
+the cache instead of rendering it again. The least recently used entries are removed above the size budget.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .file_utils import create_parent_dir, get_output_name
+from .resize_cache import get_file_hash
+
+entry_name = "entry.json"
+# image parameters that name or describe the output rather than change the rendered pixels
+output_parameters = ["image_bbs", "render_name", "variation_seed"]
+
+
+def get_output_format(file_format: str, segmentation_format: str = "PNG"):
+    """
+    File format of the rendered images. With multilayer EXR segmentation, the scene is switched to OPEN_EXR_MULTILAYER
+    when the compositor graph is built for the first frame, after the render settings of the run are read
+    """
+    if segmentation_format == "OPEN_EXR_MULTILAYER":
+        return "OPEN_EXR_MULTILAYER"
+    return file_format
+
+
+class RenderCache:
+    def __init__(
+        self,
+        cache_path: str,
+        max_size_mb: float = 10240,
+        render_settings: dict = None,
+        use_hardlinks: bool = True,
+    ):
+        """
+        Entries are kept in cache_path/<key[:2]>/<key>. render_settings holds the settings of the run that change the
+        rendered images and are not in the variation parameters, e.g. the blender version and output format.
+        With use_hardlinks, cached files are hard linked to the outputs when the file system allows it, otherwise copied
+        """
+        self.cache_path = cache_path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.render_settings = render_settings if render_settings is not None else {}
+        self.use_hardlinks = use_hardlinks
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        # (file path, size, modified time) -> content hash, input files are hashed once per process
+        self.hashes = {}
+        # key -> [size in bytes, last use time]
+        self.entries = {}
+        os.makedirs(cache_path, exist_ok=True)
+        for prefix in os.listdir(cache_path):
+            prefix_path = os.path.join(cache_path, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for key in os.listdir(prefix_path):
+                entry_path = os.path.join(prefix_path, key)
+                if os.path.exists(os.path.join(entry_path, entry_name)):
+                    self.entries[key] = [
+                        get_directory_size(entry_path),
+                        os.path.getmtime(entry_path),
+                    ]
+        self.size_bytes = sum(size for size, _ in self.entries.values())
+
+    def get_file_hash(self, filepath: str):
+        stat = os.stat(filepath)
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime)
+        if key not in self.hashes:
+            self.hashes[key] = get_file_hash(filepath)
+        return self.hashes[key]
+
+    def get_key(self, record: dict, input_files: list):
+        """
+        Stable hash of the parameter record of a variation without its output names and bounding boxes,
+        the contents of its input files (document and background) and the render settings
+        """
+        record = dict(record)
+        record["image_configs"] = {
+            key: value
+            for key, value in record["image_configs"].items()
+            if key not in output_parameters
+        }
+        content = {
+            "record": record,
+            "input_files": [self.get_file_hash(filepath) for filepath in input_files],
+            "render_settings": self.render_settings,
+        }
+        return hashlib.sha1(
+            json.dumps(content, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def get_output_file(self, render_name: str):
+        """
+        Name of the image blender writes for render_name in the file format of the render settings
+        """
+        return get_output_name(
+            render_name, self.render_settings.get("file_format", "PNG")
+        )
+
+    def get_entry_path(self, key: str):
+        return os.path.join(self.cache_path, key[:2], key)
+
+    def restore(self, key: str, output_files: dict):
+        """
+        Links or copies the cached files to output_files, {role: file path} with the image as "image", at the path
+        blender writes it, and masks e.g. as "mask". Returns the entry with the bounding boxes, or None when the
+        variation is not cached with all the files
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            with open(os.path.join(entry_path, entry_name)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if any(role not in entry["files"] for role in output_files):
+            self.misses += 1
+            return None
+        try:
+            for role, filepath in output_files.items():
+                self.place_file(
+                    os.path.join(entry_path, entry["files"][role]), filepath
+                )
+        except OSError:
+            # the entry was evicted by another process
+            self.misses += 1
+            return None
+        now = time.time()
+        os.utime(entry_path, (now, now))
+        if key in self.entries:
+            self.entries[key][1] = now
+        self.hits += 1
+        self.saved_seconds += entry.get("render_seconds", 0.0)
+        return entry
+
+    def place_file(self, cached_filepath: str, filepath: str):
+        create_parent_dir(filepath)
+        temporary_filepath = filepath + ".cache.tmp"
+        if os.path.exists(temporary_filepath):
+            os.remove(temporary_filepath)
+        if self.use_hardlinks:
+            try:
+                os.link(cached_filepath, temporary_filepath)
+            except OSError:
+                shutil.copyfile(cached_filepath, temporary_filepath)
+        else:
+            shutil.copyfile(cached_filepath, temporary_filepath)
+        os.replace(temporary_filepath, filepath)
+
+    def store(
+        self,
+        key: str,
+        files: dict,
+        image_bbs: list,
+        render_seconds: float = 0.0,
+    ):
+        """
+        Copies the rendered files of a variation, {role: file path} as in restore, into the cache
+        """
+        entry_path = self.get_entry_path(key)
+        temporary_path = "{}.{}.tmp".format(entry_path, os.getpid())
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        os.makedirs(temporary_path)
+        entry = {
+            "files": {},
+            "image_bbs": image_bbs,
+            "render_seconds": render_seconds,
+        }
+        for role, filepath in files.items():
+            _, extension = os.path.splitext(filepath)
+            entry["files"][role] = role + extension
+            shutil.copyfile(filepath, os.path.join(temporary_path, role + extension))
+        with open(os.path.join(temporary_path, entry_name), "w") as f:
+            json.dump(entry, f)
+        if key in self.entries:
+            self.size_bytes -= self.entries.pop(key)[0]
+        shutil.rmtree(entry_path, ignore_errors=True)
+        try:
+            os.rename(temporary_path, entry_path)
+        except OSError:
+            # stored by another process in the meantime
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            return
+        size = get_directory_size(entry_path)
+        self.entries[key] = [size, time.time()]
+        self.size_bytes += size
+        self.stored += 1
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size budget
+        """
+        if self.size_bytes <= self.max_size_bytes:
+            return
+        for key in sorted(self.entries, key=lambda key: self.entries[key][1]):
+            if self.size_bytes <= self.max_size_bytes:
+                break
+            size, _ = self.entries.pop(key)
+            self.size_bytes -= size
+            shutil.rmtree(self.get_entry_path(key), ignore_errors=True)
+            self.evictions += 1
+
+    def release_output(self, output_files: dict):
+        """
+        Removes the outputs of a variation that are hard linked to a cache entry before it is rendered again,
+        the files are written in place and the cached copies would change. output_files is as in restore
+        """
+        for filepath in output_files.values():
+            if os.path.exists(filepath) and os.stat(filepath).st_nlink > 1:
+                os.remove(filepath)
+
+    def get_stats(self):
+        """
+        Every hit is a render saved, saved_render_seconds adds up the time the cached variations took to render
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "saved_render_seconds": round(self.saved_seconds, 1),
+            "size_mb": round(self.size_bytes / (1024 * 1024), 1),
+        }
+
+
+def get_directory_size(path: str):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
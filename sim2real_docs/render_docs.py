@@ -6,12 +6,14 @@ The scripts create a synthetic images for documents.
 """
 
 import os
-import json
-from pathlib import Path
+import time
+from collections import namedtuple
 
 from .config import (
-    get_configuration_parameters,
-    parameter_file,
+    generate_variations,
+    get_configuration_file,
+    get_other_parameters,
+    get_parameter_record,
     run_background_check,
     get_sample_variations,
 )
@@ -19,12 +21,13 @@ from .utils import (
     install_addons,
     render_scene,
     set_render_device,
+    set_render_threads,
+    set_render_time_limit,
     set_render_viewport,
+    get_retry_samples,
+    get_render_settings,
     add_n_scale_background_image,
     get_collection_name,
-    check_path_exists,
-    create_dir,
-    clear_segmentation_nodes,
 )
 from .run_variations import (
     run_camera_settings,
@@ -32,27 +35,202 @@ from .run_variations import (
     run_light_settings,
     run_scene_settings,
 )
+from .scene_graph import SceneGraph
+from .texture_cache import TextureCache
+from .resize_cache import ResizeCache, get_target_height
+from .journal import MetadataJournal, get_resume_seed
+from .batch_render import get_batches, render_batch
+from .scene_utils import Scene
+from .file_utils import check_path_exists, create_dir
+from .timing import StageTimer, get_stage
+from .segmentation import SegmentationGraph, get_document_view_polygons
+from .masks import get_document_mask, write_mask
+from .image_writer import ImageWriter
+from .shard_writer import ShardWriter
+from .metadata_store import get_store_name, metadata_formats, write_store
+from .render_cache import RenderCache, get_output_format
 
-current_dir = Path(__file__).parent
-default_config_path = os.path.join(current_dir, "default_config.json")
+
+def get_pending_variations(
+    variations,
+    journal: MetadataJournal,
+    other_parameters: namedtuple,
+    max_render_attempts: int = 2,
+):
+    """
+    Yields the variations that are not rendered yet according to the journal.
+    Variations whose worker was stopped by the render farm watchdog are rendered again with half the samples
+    for every timeout, and dropped after max_render_attempts timeouts
+    """
+    for variation in variations:
+        if journal.is_completed(variation.render_name):
+            print("Skipping image - {}, already rendered".format(variation.render_name))
+            continue
+        events = journal.get_events(variation.render_name)
+        n_timeouts = len([i for i in events if i["type"] == "watchdog"])
+        if n_timeouts >= max_render_attempts:
+            print(
+                "Dropping image - {}, timed out {} times".format(
+                    variation.render_name, n_timeouts
+                )
+            )
+            journal.append(
+                variation.render_name,
+                None,
+                get_parameter_record(
+                    variation.scene,
+                    variation.light,
+                    variation.camera,
+                    variation.image,
+                    other_parameters,
+                ),
+                events + [{"type": "dropped", "timeouts": n_timeouts}],
+            )
+            continue
+        if n_timeouts > 0:
+            samples = get_retry_samples(variation.scene.samples, n_timeouts)
+            print(
+                "Rendering image - {} again with {} samples after {} timeouts".format(
+                    variation.render_name, samples, n_timeouts
+                )
+            )
+            variation = variation._replace(
+                scene=variation.scene._replace(samples=samples)
+            )
+        yield variation
+
+
+def add_to_shard(
+    shard_writer: ShardWriter,
+    render_name: str,
+    save_path: str,
+    output_file: str,
+    record: dict,
+    events: list,
+    segmentation_graph: SegmentationGraph = None,
+    mask_path: str = None,
+):
+    """
+    Moves the rendered image and its masks into the tar shards with the metadata record of the variation.
+    output_file is the file written in save_path, as returned by render_scene or render_batch, e.g. doc_0.png for doc_0.jpg.
+    Returns the path of the image in the shard relative to save_path, recorded in the journal as the output file
+    """
+    _, extension = os.path.splitext(output_file)
+    files = {extension[1:].lower(): os.path.join(save_path, output_file)}
+    # the graph is built with the first rendered frame, the format tells which files it writes
+    if segmentation_graph is not None and segmentation_graph.file_format == "PNG":
+        files["seg.png"] = segmentation_graph.get_mask_file(render_name)
+    if mask_path is not None:
+        name, _ = os.path.splitext(render_name)
+        files["mask.png"] = os.path.join(mask_path, name + ".png")
+    if events:
+        record = dict(record, render_events=events)
+    member = shard_writer.add_sample(render_name, files, record)
+    return os.path.relpath(os.path.join(shard_writer.shard_path, member), save_path)
+
+
+def get_render_key(
+    render_cache: RenderCache,
+    variation: namedtuple,
+    other_parameters: namedtuple,
+    input_path: str,
+    bg_images_path: str = None,
+):
+    """
+    Render cache key of a variation, from its parameters and the contents of its document and background files
+    """
+    record = get_parameter_record(
+        variation.scene,
+        variation.light,
+        variation.camera,
+        variation.image,
+        other_parameters,
+    )
+    input_files = [os.path.join(input_path, variation.image.image_name)]
+    if variation.image.background_image_name != "":
+        input_files.append(
+            os.path.join(bg_images_path, variation.image.background_image_name)
+        )
+    return render_cache.get_key(record, input_files)
+
+
+def get_cache_files(
+    render_name: str,
+    save_path: str,
+    output_file: str,
+    segmentation_graph: SegmentationGraph = None,
+    mask_path: str = None,
+):
+    """
+    Files of a variation kept in the render cache - the image, output_file in save_path as blender writes it,
+    and the masks
+    """
+    files = {"image": os.path.join(save_path, output_file)}
+    # the graph is built with the first rendered frame, the format tells which files it writes
+    if segmentation_graph is not None and segmentation_graph.file_format == "PNG":
+        files["seg"] = segmentation_graph.get_mask_file(render_name)
+    if mask_path is not None:
+        name, _ = os.path.splitext(render_name)
+        files["mask"] = os.path.join(mask_path, name + ".png")
+    return files
 
 
-def get_configuration_file(user_configs: str, user_all_configs: str):
+def get_uncached_variations(
+    variations,
+    render_cache: RenderCache,
+    journal: MetadataJournal,
+    other_parameters: namedtuple,
+    input_path: str,
+    save_path: str,
+    bg_images_path: str = None,
+    segmentation_graph: SegmentationGraph = None,
+    mask_path: str = None,
+    shard_writer: ShardWriter = None,
+):
     """
-    Decides on the configuration file to use.
+    Yields the variations that are not in the render cache. Cached variations are linked or copied from the cache
+    with their masks and recorded in the journal with the bounding boxes of the cached render
     """
-    if user_configs == None and user_all_configs == None:
-        with open(default_config_path) as f:
-            default_config = json.load(f)
-        return default_config, "range"
-    elif user_configs != None and user_all_configs == None:
-        with open(user_configs) as f:
-            user_configs_values = json.load(f)
-        return user_configs_values, "range"
-    elif user_configs == None and user_all_configs != None:
-        with open(user_all_configs) as f:
-            user_configs_values = json.load(f)
-        return user_configs_values, "all"
+    for variation in variations:
+        key = get_render_key(
+            render_cache, variation, other_parameters, input_path, bg_images_path
+        )
+        output_file = render_cache.get_output_file(variation.render_name)
+        cache_files = get_cache_files(
+            variation.render_name,
+            save_path,
+            output_file,
+            segmentation_graph,
+            mask_path,
+        )
+        entry = render_cache.restore(key, cache_files)
+        if entry is None:
+            render_cache.release_output(cache_files)
+            yield variation
+            continue
+        print(
+            "Restoring image - {} from the render cache".format(variation.render_name)
+        )
+        record = get_parameter_record(
+            variation.scene,
+            variation.light,
+            variation.camera,
+            variation.image._replace(image_bbs=entry["image_bbs"]),
+            other_parameters,
+        )
+        events = journal.get_events(variation.render_name)
+        if shard_writer is not None:
+            output_file = add_to_shard(
+                shard_writer,
+                variation.render_name,
+                save_path,
+                output_file,
+                record,
+                events,
+                segmentation_graph,
+                mask_path,
+            )
+        journal.append(variation.render_name, output_file, record, events)
 
 
 def get_image_renderings(
@@ -61,8 +239,37 @@ def get_image_renderings(
     add_on_paths: dict = None,
     bg_images_path: str = None,
     seg_path: str = None,
+    segmentation_format: str = "PNG",
+    mask_path: str = None,
     configs_path: str = None,
     all_configurations: str = None,
+    reuse_scene: bool = False,
+    use_bpy_ops: bool = True,
+    texture_cache_size: float = None,
+    resize_cache_path: str = None,
+    resize_target_height: int = None,
+    render_threads: int = None,
+    metadata_name: str = "metadata.json",
+    metadata_format: str = "json",
+    resume: bool = False,
+    batch_size: int = None,
+    num_times: int = 1,
+    seed: int = None,
+    recursive: bool = False,
+    frame_time_limit: float = None,
+    max_render_attempts: int = 2,
+    timing_log: str = None,
+    profile_every: int = None,
+    write_threads: int = None,
+    write_queue_size: int = 4,
+    write_format: str = "PNG",
+    png_compression: int = 6,
+    jpeg_quality: int = 90,
+    shard_path: str = None,
+    shard_size_mb: float = 1024,
+    shard_prefix: str = "shard",
+    render_cache_path: str = None,
+    render_cache_size_mb: float = 10240,
 ):
     """
     Runs blender rendering for the images or files present in the path
@@ -71,7 +278,50 @@ def get_image_renderings(
         3) renders an image
         4) clears the scene
         5) saves the metadata
+    With seg_path, masks of the document are written to seg_path by a compositor graph built once for the run.
+    With segmentation_format set to OPEN_EXR_MULTILAYER, the rendered images are multilayer EXR files holding
+    the image and the object index pass of the document mask, from the same render.
+    With mask_path, analytical masks of the document are rasterized from the projected document plane and written to
+    mask_path, they need no object index pass and work with both CYCLES and EEVEE.
+    With reuse_scene, the camera, light, document and background planes are created once and updated for every variation
+    instead of clearing and rebuilding the scene.
+    With use_bpy_ops set to False, planes, materials and image textures are built through bpy.data instead of bpy operators.
+    texture_cache_size is the memory budget in MB of a cache that keeps decoded document and background images between variations.
+    With resize_cache_path, documents larger than the largest size they can cover in the rendered images are downscaled
+    once into the cache and the copies are imported instead of the full resolution files. resize_target_height overrides
+    the document height in pixels found from the configuration.
+    render_threads pins the number of render threads, metadata_name is the name of the metadata file written in save_path.
+    Every rendered variation is appended to a journal (metadata.jsonl) and metadata.json is compacted from it at the end.
+    With metadata_format set to columnar, the journal is compacted into a columnar store (metadata_store) instead,
+    numeric parameters and bounding boxes are read back as numpy memmaps and json can be exported with
+    metadata_store.export_json.
+    With resume, variations already in the journal whose rendered image exists are skipped.
+    With batch_size, up to batch_size consecutive variations of the same document and background are keyframed and rendered
+    as one animation, the scene objects are reused as with reuse_scene.
+    num_times is the number of variations rendered for every document. Variations are generated lazily, one document at a time.
+    seed is the run seed, every variation is sampled from a seed derived from it, its document and its number, kept
+    as image_configs.variation_seed in the metadata. A random run seed is used and printed when it is not given, the run
+    seed is kept in save_path (run_seed.json) and used again with resume.
+    With recursive, documents in sub directories of input_path are rendered too, the rendered images keep their sub directories.
+    frame_time_limit is the sampling time budget of a frame in seconds, cycles stops sampling when it is reached.
+    Frames whose render, including sync, compositing and the file write, takes at least frame_time_limit seconds are
+    recorded with a slow_frame render event in the metadata. Variations whose worker was restarted by the
+    render farm watchdog are rendered again with fewer samples and dropped after max_render_attempts timeouts.
+    With timing_log, the wall time of every stage of every variation, peak memory and bpy.data block counts are written
+    to the log (csv or jsonl) and every profile_every-th frame is profiled with cProfile.
+    With write_threads, rendered images are encoded and written by a pool of write_threads threads while the next
+    variation is set up. Rendering waits when write_queue_size images are not written yet, write_format is PNG or JPEG
+    with png_compression (zlib level 0-9) or jpeg_quality (1-95). All images are written before the function returns.
+    With shard_path, every rendered image, its masks and its metadata record are moved into rolling tar shards of up to
+    shard_size_mb MB named {shard_prefix}-000000.tar..., with an index {shard_prefix}.index.jsonl of the samples.
+    With render_cache_path, rendered images, masks and bounding boxes are kept in a cache keyed by the parameters of the
+    variation, the contents of its document and background and the render settings. Variations found in the cache are
+    linked or copied from it instead of being rendered, the least recently used entries are removed above
+    render_cache_size_mb MB.
     """
+    assert (
+        metadata_format in metadata_formats
+    ), "Metadata format should be one of {}".format(metadata_formats)
     check_path_exists(input_path)
     create_dir(save_path)
     # background images
@@ -80,64 +330,323 @@ def get_image_renderings(
     configurations, config_type = get_configuration_file(
         configs_path, all_configurations
     )
-    (
-        image_files,
-        variations_required,
-        scene_variations,
-        light_variations,
-        camera_variations,
-        image_variations,
-        other_parameters,
-    ) = get_configuration_parameters(
+    other_parameters = get_other_parameters(configurations, config_type)
+    if config_type == "range":
+        seed = get_resume_seed(save_path, seed, resume)
+    variations = generate_variations(
         input_path,
         configs_params=configurations,
         configuration_type=config_type,
         background_images_list=bg_images,
+        num_times=num_times,
+        seed=seed,
+        recursive=recursive,
     )
     install_addons(add_on_paths)
     set_render_device(other_parameters.render_device_type)
+    set_render_threads(render_threads)
+    set_render_time_limit(frame_time_limit)
     set_render_viewport()
-    for i in range(variations_required):
-        print("Rendering image - {}".format(image_variations[i].image_name))
-        scene = run_scene_settings(scene_variation=scene_variations[i])
-        scene_col = get_collection_name()
-        camera = run_camera_settings(
-            camera_variation=camera_variations[i], collection_name=scene_col
-        )  # camera settings
-        _ = run_light_settings(light_variation=light_variations[i])  # light settings
-        image_2d_coords, image_obj = run_image_settings(
-            image_variation=image_variations[i],
-            path=input_path,
-            scene_variations=scene_variations[i],
+    texture_cache = (
+        TextureCache(texture_cache_size) if texture_cache_size is not None else None
+    )
+    resize_cache = None
+    if resize_cache_path is not None:
+        if resize_target_height is None:
+            resize_target_height = get_target_height(configurations, config_type)
+        resize_cache = ResizeCache(resize_cache_path, resize_target_height)
+    timer = StageTimer(timing_log, profile_every) if timing_log is not None else None
+    scene_graph = (
+        SceneGraph(
+            input_path,
+            bg_images_path,
+            use_bpy_ops,
+            texture_cache,
+            timer,
+            resize_cache,
         )
-        # updating the named tuple to add bounding boxes of document in the final rendered image
-        image_variations[i] = image_variations[i]._replace(image_bbs=image_2d_coords)
-        # segmentation check
-        if seg_path != None:
+        if reuse_scene or batch_size is not None
+        else None
+    )
+    journal = MetadataJournal(save_path, metadata_name, resume)
+    shard_writer = None
+    if shard_path is not None:
+        assert (
+            write_threads is None
+        ), "Tar shards are not supported with threaded writes"
+        create_dir(shard_path)
+        shard_writer = ShardWriter(shard_path, shard_size_mb, shard_prefix, resume)
+    image_writer = None
+    if write_threads is not None:
+        assert (
+            batch_size is None and segmentation_format == "PNG"
+        ), "Threaded writes are not supported with batched rendering or multilayer EXR images"
+        image_writer = ImageWriter(
+            save_path,
+            write_threads,
+            write_queue_size,
+            write_format,
+            png_compression,
+            jpeg_quality,
+        )
+    segmentation_graph = None
+    if seg_path is not None or segmentation_format == "OPEN_EXR_MULTILAYER":
+        if seg_path is not None:
             check_path_exists(seg_path)
-            nodes_present = image_obj.get_segmentation_images(
-                seg_path, scene_variations[i]
+        segmentation_graph = SegmentationGraph(seg_path, segmentation_format)
+    if mask_path is not None:
+        create_dir(mask_path)
+    pending = get_pending_variations(
+        variations, journal, other_parameters, max_render_attempts
+    )
+    render_cache = None
+    if render_cache_path is not None:
+        assert (
+            write_threads is None
+        ), "The render cache is not supported with threaded writes"
+        render_settings = get_render_settings()
+        render_settings["file_format"] = get_output_format(
+            render_settings["file_format"], segmentation_format
+        )
+        render_settings = dict(
+            render_settings,
+            segmentation_format=segmentation_format,
+            resize_target_height=resize_target_height,
+            use_bpy_ops=use_bpy_ops,
+        )
+        render_cache = RenderCache(
+            render_cache_path, render_cache_size_mb, render_settings
+        )
+        pending = get_uncached_variations(
+            pending,
+            render_cache,
+            journal,
+            other_parameters,
+            input_path,
+            save_path,
+            bg_images_path,
+            segmentation_graph,
+            mask_path,
+            shard_writer,
+        )
+    if batch_size is not None:
+        assert (
+            segmentation_graph is None
+        ), "Segmentation images are not supported with batched rendering"
+        for batch in get_batches(pending, batch_size):
+            print("Rendering images - {}".format([i.render_name for i in batch]))
+            journal.set_progress(batch[0].render_name)
+            if timer is not None:
+                timer.start_frame(batch[0].render_name)
+            render_start = time.perf_counter()
+            with get_stage(timer, "render_batch"):
+                rendered = render_batch(scene_graph, batch, save_path, mask_path)
+            render_time = (time.perf_counter() - render_start) / len(batch)
+            if timer is not None:
+                timer.end_frame()
+            for variation, (image_2d_coords, output_file) in zip(batch, rendered):
+                record = get_parameter_record(
+                    variation.scene,
+                    variation.light,
+                    variation.camera,
+                    variation.image._replace(image_bbs=image_2d_coords),
+                    other_parameters,
+                )
+                events = journal.get_events(variation.render_name)
+                if render_cache is not None:
+                    render_cache.store(
+                        get_render_key(
+                            render_cache,
+                            variation,
+                            other_parameters,
+                            input_path,
+                            bg_images_path,
+                        ),
+                        get_cache_files(
+                            variation.render_name,
+                            save_path,
+                            output_file,
+                            mask_path=mask_path,
+                        ),
+                        image_2d_coords,
+                        render_time,
+                    )
+                if shard_writer is not None:
+                    output_file = add_to_shard(
+                        shard_writer,
+                        variation.render_name,
+                        save_path,
+                        output_file,
+                        record,
+                        events,
+                        mask_path=mask_path,
+                    )
+                journal.append(variation.render_name, output_file, record, events)
+        # every pending variation was rendered in a batch
+        pending = []
+    for variation in pending:
+        print("Rendering image - {}".format(variation.image.image_name))
+        journal.set_progress(variation.render_name)
+        events = list(journal.get_events(variation.render_name))
+        frame_start = time.perf_counter()
+        if timer is not None:
+            timer.start_frame(variation.render_name)
+        if scene_graph is not None:
+            scene, image_2d_coords = scene_graph.apply_variation(
+                variation.scene,
+                variation.camera,
+                variation.light,
+                variation.image,
             )
+            camera, image_obj = scene_graph.camera, scene_graph.image
+        else:
+            with get_stage(timer, "scene"):
+                scene = run_scene_settings(
+                    scene_variation=variation.scene, use_bpy_ops=use_bpy_ops
+                )
+            scene_col = get_collection_name()
+            with get_stage(timer, "camera"):
+                camera = run_camera_settings(
+                    camera_variation=variation.camera, collection_name=scene_col
+                )  # camera settings
+            with get_stage(timer, "light"):
+                _ = run_light_settings(
+                    light_variation=variation.light, use_bpy_ops=use_bpy_ops
+                )  # light settings
+            with get_stage(timer, "image"):
+                image_2d_coords, image_obj = run_image_settings(
+                    image_variation=variation.image,
+                    path=input_path,
+                    scene_variations=variation.scene,
+                    use_bpy_ops=use_bpy_ops,
+                    texture_cache=texture_cache,
+                    resize_cache=resize_cache,
+                )
+        # updating the named tuple to add bounding boxes of document in the final rendered image
+        image_variation = variation.image._replace(image_bbs=image_2d_coords)
+        # segmentation check
+        if segmentation_graph is not None:
+            with get_stage(timer, "segmentation"):
+                segmentation_graph.set_frame(
+                    image_obj.image_object, variation.scene, variation.render_name
+                )
+        if mask_path is not None:
+            with get_stage(timer, "segmentation"):
+                view_polygons = get_document_view_polygons(
+                    image_obj.image_object, camera.camera_object
+                )
+                write_mask(
+                    get_document_mask(view_polygons, variation.scene),
+                    mask_path,
+                    variation.render_name,
+                )
         # background images
         if len(bg_images) > 0:
-            add_n_scale_background_image(image_variations[i], bg_images_path)
+            if scene_graph is not None:
+                scene_graph.set_background(image_variation)
+            else:
+                with get_stage(timer, "background"):
+                    add_n_scale_background_image(
+                        image_variation, bg_images_path, use_bpy_ops, texture_cache
+                    )
         # rendering the image
-        render_scene(
-            save_path, image_files[i], camera.camera_object.name
+        render_start = time.perf_counter()
+        output_file = render_scene(
+            save_path,
+            variation.render_name,
+            camera.camera_object.name,
+            use_bpy_ops,
+            timer,
+            image_writer,
         )  # render the scene
-        if seg_path != None:
-            clear_segmentation_nodes(seg_path, nodes_present)
-        scene.clear_scene()  # clear the scene
-    # saving the parameters file
-    parameter_file(
-        scene_params=scene_variations,
-        light_params=light_variations,
-        camera_params=camera_variations,
-        image_params=image_variations,
-        save_path=save_path,
-        n_variations=variations_required,
-        other_params=other_parameters,
-    )
+        # wall time of the render including sync, compositing and the file write, cycles only limits sampling time,
+        # so a slow frame did not necessarily reach the time limit
+        render_time = time.perf_counter() - render_start
+        if frame_time_limit is not None and render_time >= frame_time_limit:
+            print(
+                "Image - {} was slow, rendered in {:.1f} s".format(
+                    variation.render_name, render_time
+                )
+            )
+            events.append(
+                {
+                    "type": "slow_frame",
+                    "render_seconds": render_time,
+                    "time_limit": frame_time_limit,
+                }
+            )
+        record = get_parameter_record(
+            variation.scene,
+            variation.light,
+            variation.camera,
+            image_variation,
+            other_parameters,
+        )
+        if render_cache is not None:
+            render_cache.store(
+                get_render_key(
+                    render_cache,
+                    variation,
+                    other_parameters,
+                    input_path,
+                    bg_images_path,
+                ),
+                get_cache_files(
+                    variation.render_name,
+                    save_path,
+                    output_file,
+                    segmentation_graph,
+                    mask_path,
+                ),
+                image_2d_coords,
+                time.perf_counter() - frame_start,
+            )
+        if shard_writer is not None:
+            output_file = add_to_shard(
+                shard_writer,
+                variation.render_name,
+                save_path,
+                output_file,
+                record,
+                events,
+                segmentation_graph,
+                mask_path,
+            )
+        journal.append(variation.render_name, output_file, record, events)
+        if scene_graph is None:
+            with get_stage(timer, "clear_scene"):
+                scene.clear_scene()  # clear the scene
+        if timer is not None:
+            timer.end_frame()
+    journal.clear_progress()
+    if shard_writer is not None:
+        shard_writer.close()
+        print("Shard writer statistics - {}".format(shard_writer.get_stats()))
+    if image_writer is not None:
+        image_writer.close()
+        print("Image writer statistics - {}".format(image_writer.get_stats()))
+    if segmentation_graph is not None:
+        segmentation_graph.clear()
+    if scene_graph is not None and scene_graph.camera is not None:
+        Scene(None, use_bpy_ops).clear_scene()
+    if texture_cache is not None:
+        print("Texture cache statistics - {}".format(texture_cache.get_stats()))
+        texture_cache.clear()
+    if resize_cache is not None:
+        print("Resize cache statistics - {}".format(resize_cache.get_stats()))
+    if render_cache is not None:
+        print("Render cache statistics - {}".format(render_cache.get_stats()))
+    # saving the parameters file from the journal
+    if metadata_format == "columnar":
+        write_store(
+            journal.iter_records(),
+            os.path.join(save_path, get_store_name(metadata_name)),
+        )
+    else:
+        journal.compact(os.path.join(save_path, metadata_name))
+    journal.close()
+    if timer is not None:
+        timer.close()
 
 
 def load_config(image_path, image_name=None, bg_path=None, config_file=None):
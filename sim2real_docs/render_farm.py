@@ -0,0 +1,365 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Renders the variations with several headless blender processes.
+The variations are generated once, split into shards and each shard is rendered by a blender worker
+with a fixed number of render threads. Metadata files of all shards are merged into a single metadata.json.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from .config import (
+    generate_variations,
+    get_configuration_file,
+    get_number_of_variations,
+    get_other_parameters,
+    get_parameter_record,
+    run_background_check,
+)
+from .resize_cache import get_target_height
+from .file_utils import check_path_exists, create_dir
+from .journal import (
+    append_event,
+    get_journal_name,
+    get_progress_path,
+    get_resume_seed,
+    read_progress,
+)
+from .metadata_store import MetadataStore, get_store_name, write_store
+
+# seconds between two checks of the render farm watchdog
+watchdog_interval = 5
+
+# script run by every blender worker, the arguments of get_image_renderings are passed as json after "--"
+worker_script = """
+import json
+import sys
+from sim2real_docs.render_docs import get_image_renderings
+get_image_renderings(**json.loads(sys.argv[sys.argv.index("--") + 1]))
+"""
+
+
+def get_shards(n_variations: int, n_workers: int):
+    """
+    Splits the variations into contiguous shards of nearly equal size, returns (start, end) indices of each shard
+    """
+    n_shards = max(1, min(n_workers, n_variations))
+    shard_size, remainder = divmod(n_variations, n_shards)
+    shards = []
+    start = 0
+    for shard in range(n_shards):
+        end = start + shard_size + (1 if shard < remainder else 0)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def get_worker_command(blender_path: str, render_threads: int, render_arguments: dict):
+    """
+    Creates the command line to run a headless blender worker
+    """
+    return [
+        blender_path,
+        "-b",
+        "-t",
+        str(render_threads),
+        "--python-expr",
+        worker_script,
+        "--",
+        json.dumps(render_arguments),
+    ]
+
+
+def merge_metadata(metadata_paths: list, save_path: str, metadata_format: str = "json"):
+    """
+    Merges the metadata files of the shards, in shard order, into metadata.json.
+    Columnar stores of the shards are merged into metadata_store one record at a time
+    """
+    if metadata_format == "columnar":
+        stores = [MetadataStore(metadata_path) for metadata_path in metadata_paths]
+        n_records = write_store(
+            itertools.chain.from_iterable(store.iter_records() for store in stores),
+            os.path.join(save_path, get_store_name("metadata.json")),
+        )
+        for store in stores:
+            store.close()
+        return n_records
+    all_parameters = []
+    for metadata_path in metadata_paths:
+        with open(metadata_path) as f:
+            all_parameters.extend(json.load(f))
+    with open(os.path.join(save_path, "metadata.json"), "w") as f:
+        json.dump(all_parameters, f)
+    return len(all_parameters)
+
+
+def wait_for_workers(
+    workers: list,
+    worker_commands: list,
+    journal_paths: list,
+    worker_timeout: float = None,
+):
+    """
+    Waits for the workers to finish. With worker_timeout, a worker rendering the same variation for longer than
+    worker_timeout seconds is considered hung - it is stopped, a watchdog event is added to the journal of its shard
+    and the worker is started again to resume the shard. Returns the exit codes and the number of restarts
+    """
+    restarts = 0
+    while any(worker.poll() is None for worker in workers):
+        time.sleep(watchdog_interval if worker_timeout is not None else 1)
+        if worker_timeout is None:
+            continue
+        for shard, worker in enumerate(workers):
+            if worker.poll() is not None:
+                continue
+            progress = read_progress(journal_paths[shard])
+            if progress is None:
+                continue
+            render_seconds = time.time() - progress["started"]
+            if render_seconds <= worker_timeout:
+                continue
+            print(
+                "Blender worker {} rendered {} for {:.0f} s, restarting it".format(
+                    shard, progress["output_name"], render_seconds
+                )
+            )
+            worker.kill()
+            worker.wait()
+            append_event(
+                journal_paths[shard],
+                progress["output_name"],
+                {
+                    "type": "watchdog",
+                    "render_seconds": render_seconds,
+                    "worker_timeout": worker_timeout,
+                },
+            )
+            os.remove(get_progress_path(journal_paths[shard]))
+            workers[shard] = subprocess.Popen(worker_commands[shard])
+            restarts += 1
+    return [worker.returncode for worker in workers], restarts
+
+
+def run_render_farm(
+    input_path: str,
+    save_path: str,
+    n_workers: int,
+    render_threads: int = None,
+    blender_path: str = "blender",
+    add_on_paths: dict = None,
+    bg_images_path: str = None,
+    seg_path: str = None,
+    configs_path: str = None,
+    all_configurations: str = None,
+    num_times: int = 1,
+    seed: int = None,
+    recursive: bool = False,
+    worker_timeout: float = None,
+    **render_options
+):
+    """
+    Renders the images present in the input path with n_workers blender processes
+        1) creates the variations, same as get_image_renderings
+        2) writes contiguous shards of variations to configuration files, one variation at a time
+        3) runs a headless blender worker per shard with render_threads threads
+        4) merges metadata of the shards into metadata.json
+    When render_threads is not given, the cpu cores are divided equally between the workers.
+    With recursive, documents in sub directories of input_path are rendered too. seed is the run seed of the variations,
+    it is kept in save_path so that a run with resume samples the same variations without seed.
+    With worker_timeout, a watchdog restarts workers that render a variation for longer than worker_timeout seconds,
+    the variation is rendered again with fewer samples and dropped after max_render_attempts timeouts.
+    Other keyword arguments are passed to get_image_renderings in the workers (e.g. reuse_scene, use_bpy_ops).
+    With a resize_cache_path, the target size of the resized documents is found once from the configuration
+    so that all the workers share the same copies. The workers can share a render_cache_path, entries are added
+    atomically and read by every worker.
+    """
+    check_path_exists(input_path)
+    create_dir(save_path)
+    shard_path = os.path.join(save_path, "shards")
+    create_dir(shard_path)
+    if render_threads is None:
+        render_threads = max(1, os.cpu_count() // n_workers)
+    bg_images = run_background_check(bg_images_path)
+    configurations, config_type = get_configuration_file(
+        configs_path, all_configurations
+    )
+    other_parameters = get_other_parameters(configurations, config_type)
+    if render_options.get("resize_cache_path") is not None:
+        render_options.setdefault(
+            "resize_target_height", get_target_height(configurations, config_type)
+        )
+    if config_type == "range":
+        seed = get_resume_seed(save_path, seed, render_options.get("resume", False))
+    variations_required = get_number_of_variations(
+        input_path, configurations, config_type, num_times, recursive
+    )
+    variations = generate_variations(
+        input_path,
+        configs_params=configurations,
+        configuration_type=config_type,
+        background_images_list=bg_images,
+        num_times=num_times,
+        seed=seed,
+        recursive=recursive,
+    )
+    workers = []
+    worker_commands = []
+    journal_paths = []
+    metadata_paths = []
+    for shard, (start, end) in enumerate(get_shards(variations_required, n_workers)):
+        # JSON Lines, the workers read the configurations of their shard one record at a time
+        shard_configurations = os.path.join(shard_path, "shard_{}.jsonl".format(shard))
+        with open(shard_configurations, "w") as f:
+            for variation in itertools.islice(variations, end - start):
+                record = get_parameter_record(
+                    variation.scene,
+                    variation.light,
+                    variation.camera,
+                    variation.image,
+                    other_parameters,
+                )
+                f.write(json.dumps(record) + "\n")
+        metadata_name = "metadata_shard_{}.json".format(shard)
+        metadata_paths.append(os.path.join(save_path, metadata_name))
+        render_arguments = dict(
+            render_options,
+            input_path=input_path,
+            save_path=save_path,
+            add_on_paths=add_on_paths,
+            bg_images_path=bg_images_path,
+            seg_path=seg_path,
+            all_configurations=shard_configurations,
+            render_threads=render_threads,
+            metadata_name=metadata_name,
+        )
+        if render_options.get("shard_path") is not None:
+            # every worker writes its own shards and index
+            render_arguments["shard_prefix"] = "shard_{}".format(shard)
+        print(
+            "Starting blender worker {} for variations {} to {}".format(
+                shard, start, end - 1
+            )
+        )
+        workers.append(
+            subprocess.Popen(
+                get_worker_command(blender_path, render_threads, render_arguments)
+            )
+        )
+        # restarted workers resume the shard from its journal
+        worker_commands.append(
+            get_worker_command(
+                blender_path, render_threads, dict(render_arguments, resume=True)
+            )
+        )
+        journal_paths.append(os.path.join(save_path, get_journal_name(metadata_name)))
+    exit_codes, restarts = wait_for_workers(
+        workers, worker_commands, journal_paths, worker_timeout
+    )
+    failed_shards = [
+        shard for shard, exit_code in enumerate(exit_codes) if exit_code != 0
+    ]
+    assert (
+        len(failed_shards) == 0
+    ), "Blender workers failed for shards {}, shard files are kept in {}".format(
+        failed_shards, shard_path
+    )
+    metadata_format = render_options.get("metadata_format", "json")
+    if metadata_format == "columnar":
+        metadata_paths = [
+            os.path.join(save_path, get_store_name(os.path.basename(metadata_path)))
+            for metadata_path in metadata_paths
+        ]
+    n_rendered = merge_metadata(metadata_paths, save_path, metadata_format)
+    for shard, metadata_path in enumerate(metadata_paths):
+        if metadata_format == "columnar":
+            shutil.rmtree(metadata_path)
+        else:
+            os.remove(metadata_path)
+        os.remove(os.path.join(shard_path, "shard_{}.jsonl".format(shard)))
+    os.rmdir(shard_path)
+    print(
+        "Rendered {} images with {} workers, {} workers restarted by the watchdog".format(
+            n_rendered, len(workers), restarts
+        )
+    )
+
+
+def main(argv: list = None):
+    """
+    Command line entry point, arguments after "--" are used when running inside blender
+    """
+    if argv is None:
+        argv = (
+            sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+        )
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--save_path", required=True)
+    parser.add_argument("--workers", type=int, required=True)
+    parser.add_argument("--render_threads", type=int, default=None)
+    parser.add_argument("--blender_path", default="blender")
+    parser.add_argument("--bg_images_path", default=None)
+    parser.add_argument("--seg_path", default=None)
+    parser.add_argument(
+        "--segmentation_format", default="PNG", choices=["PNG", "OPEN_EXR_MULTILAYER"]
+    )
+    parser.add_argument("--mask_path", default=None)
+    parser.add_argument("--configs_path", default=None)
+    parser.add_argument("--all_configurations", default=None)
+    parser.add_argument("--num_times", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--recursive", action="store_true")
+    parser.add_argument("--reuse_scene", action="store_true")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--resize_cache_path", default=None)
+    parser.add_argument("--frame_time_limit", type=float, default=None)
+    parser.add_argument("--worker_timeout", type=float, default=None)
+    parser.add_argument("--write_threads", type=int, default=None)
+    parser.add_argument("--write_format", default="PNG", choices=["PNG", "JPEG"])
+    parser.add_argument("--shard_path", default=None)
+    parser.add_argument("--shard_size_mb", type=float, default=1024)
+    parser.add_argument(
+        "--metadata_format", default="json", choices=["json", "columnar"]
+    )
+    parser.add_argument("--render_cache_path", default=None)
+    parser.add_argument("--render_cache_size_mb", type=float, default=10240)
+    args = parser.parse_args(argv)
+    run_render_farm(
+        input_path=args.input_path,
+        save_path=args.save_path,
+        n_workers=args.workers,
+        render_threads=args.render_threads,
+        blender_path=args.blender_path,
+        bg_images_path=args.bg_images_path,
+        seg_path=args.seg_path,
+        configs_path=args.configs_path,
+        all_configurations=args.all_configurations,
+        num_times=args.num_times,
+        seed=args.seed,
+        recursive=args.recursive,
+        reuse_scene=args.reuse_scene,
+        resume=args.resume,
+        resize_cache_path=args.resize_cache_path,
+        frame_time_limit=args.frame_time_limit,
+        worker_timeout=args.worker_timeout,
+        segmentation_format=args.segmentation_format,
+        mask_path=args.mask_path,
+        write_threads=args.write_threads,
+        write_format=args.write_format,
+        shard_path=args.shard_path,
+        shard_size_mb=args.shard_size_mb,
+        metadata_format=args.metadata_format,
+        render_cache_path=args.render_cache_path,
+        render_cache_size_mb=args.render_cache_size_mb,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Cache of downscaled copies of the input documents.
+The largest size a document can cover in the rendered images of a configuration is found with the numpy camera model,
+rounded up to a power of two, and documents larger than that are resized once with Pillow and loaded from the cache
+instead of decoding the full resolution scan for every variation.
+"""
+import hashlib
+import math
+import os
+from itertools import islice
+
+import numpy as np
+
+from .config import Variation_tuple, get_record_variation
+from .config_stream import iter_configurations
+from .create_random_values import sample_parameters
+from .file_utils import create_parent_dir, get_manifest_dimensions
+from .projection import get_quad_loops, get_table_quads, get_variation_quads
+
+# number of variations sampled from a range configuration to find the largest document footprint
+footprint_samples = 100000
+# smallest size of the cached copies
+min_target_height = 64
+
+
+def get_edge_lengths(quads, depth):
+    """
+    Length in pixels of the 4 edges of every document quad. Quads with a corner behind the camera are left out
+    """
+    in_front = (depth > 0).all(axis=1)
+    quads = get_quad_loops(quads[in_front])
+    return np.linalg.norm(np.roll(quads, -1, axis=1) - quads, axis=2)
+
+
+def get_target_height(
+    configs_params, configuration_type: str, n_samples: int = footprint_samples
+):
+    """
+    Height in pixels of the document texture needed for the largest document footprint of the configuration.
+    Quads are projected for a square document, so the longest edge in pixels is the number of texels needed along
+    both sides of the document, the width of a document follows from its aspect ratio.
+    Range configurations are sampled with a fixed seed, the largest footprint is rounded up to a power of two
+    """
+    if configuration_type == "range":
+        table = sample_parameters(
+            n_samples, configs_params, ["document"], [], np.random.default_rng(0)
+        )
+        quads, depth = get_table_quads(table, np.ones(n_samples), return_depth=True)
+        edge_lengths = get_edge_lengths(quads, depth)
+        footprint = edge_lengths.max() if edge_lengths.size > 0 else 0
+    else:
+        # records of all mode are projected in chunks, they are streamed from the configuration file
+        configurations = iter_configurations(configs_params)
+        footprint = 0
+        while True:
+            variations = [
+                Variation_tuple(None, *get_record_variation(config))
+                for config in islice(configurations, n_samples)
+            ]
+            if len(variations) == 0:
+                break
+            quads, depth = get_variation_quads(
+                variations, np.ones(len(variations)), return_depth=True
+            )
+            edge_lengths = get_edge_lengths(quads, depth)
+            if edge_lengths.size > 0:
+                footprint = max(footprint, edge_lengths.max())
+    footprint = footprint if footprint > 0 else min_target_height
+    return max(min_target_height, 2 ** math.ceil(math.log2(max(footprint, 1))))
+
+
+def get_file_hash(filepath: str):
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class ResizeCache:
+    def __init__(self, cache_path: str, target_height: int):
+        """
+        Copies are stored in cache_path/<source hash>_<target height>/<image name>, so the image keeps its name
+        and the copies of different runs and configurations are shared
+        """
+        self.cache_path = cache_path
+        self.target_height = target_height
+        self.hits = 0
+        self.misses = 0
+        self.originals = 0
+        # (file path, size, modified time) -> source hash, files are hashed once per process
+        self.hashes = {}
+        self.dimensions = {}
+
+    def get_source_hash(self, image_filepath: str):
+        stat = os.stat(image_filepath)
+        key = (os.path.abspath(image_filepath), stat.st_size, stat.st_mtime)
+        if key not in self.hashes:
+            self.hashes[key] = get_file_hash(image_filepath)
+        return self.hashes[key]
+
+    def get_dimensions(self, image_path: str, image_name: str):
+        """
+        Width and height of a document, from the manifest of image_path when it has them or from the image header
+        """
+        if image_path not in self.dimensions:
+            self.dimensions[image_path] = get_manifest_dimensions(image_path)
+        if image_name not in self.dimensions[image_path]:
+            from PIL import Image as PILImage
+
+            with PILImage.open(os.path.join(image_path, image_name)) as image:
+                self.dimensions[image_path][image_name] = image.size
+        return self.dimensions[image_path][image_name]
+
+    def get_image_path(self, image_path: str, image_name: str):
+        """
+        Directory to load the document from. Documents that are not larger than the target size are loaded
+        from image_path, larger ones from their downscaled copy in the cache, which is written when missing
+        """
+        width, height = self.get_dimensions(image_path, image_name)
+        if height <= self.target_height:
+            self.originals += 1
+            return image_path
+        image_filepath = os.path.join(image_path, image_name)
+        copy_path = os.path.join(
+            self.cache_path,
+            "{}_{}".format(self.get_source_hash(image_filepath), self.target_height),
+        )
+        copy_filepath = os.path.join(copy_path, image_name)
+        if os.path.exists(copy_filepath):
+            self.hits += 1
+            return copy_path
+        self.misses += 1
+        write_resized_copy(
+            image_filepath,
+            copy_filepath,
+            (max(1, round(width * self.target_height / height)), self.target_height),
+        )
+        return copy_path
+
+    def get_stats(self):
+        """
+        Returns hit and miss statistics of the cache
+        """
+        return {
+            "target_height": self.target_height,
+            "hits": self.hits,
+            "resized": self.misses,
+            "original_size": self.originals,
+        }
+
+
+def write_resized_copy(image_filepath: str, copy_filepath: str, size: tuple):
+    """
+    Writes a copy of the image resized to size in the same format. The first page of multi page files is used,
+    as blender does. The copy is written to a temporary file first so that an interrupted write is never used
+    and workers resizing the same document at the same time do not write to the same file
+    """
+    from PIL import Image as PILImage
+
+    create_parent_dir(copy_filepath)
+    name, extension = os.path.splitext(copy_filepath)
+    temporary_filepath = "{}.{}.tmp{}".format(name, os.getpid(), extension)
+    with PILImage.open(image_filepath) as image:
+        image_format = image.format
+        # draft lets jpeg files be decoded at a reduced scale
+        image.draft(image.mode, size)
+        resized = image.resize(size, PILImage.LANCZOS)
+    if image_format == "JPEG":
+        resized.save(temporary_filepath, image_format, quality=95)
+    else:
+        resized.save(temporary_filepath, image_format)
+    os.replace(temporary_filepath, copy_filepath)
@@ -8,26 +8,39 @@ from .camera_utils import Camera
 from .utils import image_3d_to_2d_coords
 
 
-def run_camera_settings(camera_variation: namedtuple, collection_name: str):
+def run_camera_settings(
+    camera_variation: namedtuple, collection_name: str, camera_object: Camera = None
+):
     """
     Creates a camera object and applies required variations
+    If a camera object is given, it is reused and only the variations are applied
     """
-    camera_object = Camera(camera_variation, collection_name)
+    if camera_object is None:
+        camera_object = Camera(camera_variation, collection_name)
+    else:
+        camera_object.update_configs(camera_variation)
     camera_object.set_focal_length()
     camera_object.set_camera_location()
     camera_object.set_camera_rotation()
     return camera_object
 
 
-def run_scene_settings(scene_variation: namedtuple):
+def run_scene_settings(
+    scene_variation: namedtuple, clear_scene: bool = True, use_bpy_ops: bool = True
+):
     """
     Sets a scene for required image rendering.
     Scene object is created from scene_utils file and scene variations are applied
+    When clear_scene is False the objects in the scene are kept and only the render settings are reset
     """
-    scene_object = Scene(scene_variation)
-    scene_object.clear_scene()
+    scene_object = Scene(scene_variation, use_bpy_ops)
+    if clear_scene:
+        scene_object.clear_scene()
+    else:
+        scene_object.reset_render_settings()
     scene_object.set_resolution()
     scene_object.set_render_engine()
+    scene_object.set_render_quality()
     scene_object.set_color_mode()
     scene_object.set_aspect_ratio()
     scene_object.set_contrast()
@@ -35,11 +48,17 @@ def run_scene_settings(scene_variation: namedtuple):
     return scene_object
 
 
-def run_light_settings(light_variation: namedtuple):
+def run_light_settings(
+    light_variation: namedtuple, light_object: Light = None, use_bpy_ops: bool = True
+):
     """
     Creates a light object and applies required variations
+    If a light object is given, it is reused and only the variations are applied
     """
-    light_object = Light(light_variation)
+    if light_object is None:
+        light_object = Light(light_variation, use_bpy_ops)
+    else:
+        light_object.update_configs(light_variation)
     light_object.set_light_location()
     light_object.set_light_energy()
     light_object.set_light_color()
@@ -47,15 +66,27 @@ def run_light_settings(light_variation: namedtuple):
 
 
 def run_image_settings(
-    image_variation: namedtuple, path: str, scene_variations: namedtuple
+    image_variation: namedtuple,
+    path: str,
+    scene_variations: namedtuple,
+    image_object: Image = None,
+    use_bpy_ops: bool = True,
+    texture_cache=None,
+    resize_cache=None,
 ):
     """
     This fuction creates an images and applies required variations to it.
     Images are added to the scene as planes.
     It is advised to add camera to the scene before image/document is added and is placed at (0.0,0.0,3.0) to get a top angle view
+    If an image object is given, its plane is reused to show the new document
     """
     # image settings
-    image_object = Image(image_variation, path)
+    if image_object is None:
+        image_object = Image(
+            image_variation, path, use_bpy_ops, texture_cache, resize_cache
+        )
+    else:
+        image_object.replace_image(image_variation, path)
     image_object.scale_object()
     image_object.set_image_rotation()
     image_3d_coords = image_object.get_image_coordinates()
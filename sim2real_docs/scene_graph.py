@@ -0,0 +1,109 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+This script keeps the blender objects of a scene alive between variations.
+Camera, light, document plane and background plane are created once and every variation only updates
+transforms, light type and energy, focal length and the image shown on the planes.
+"""
+import os
+from collections import namedtuple
+
+from .image_utils import set_plane_image
+from .timing import get_stage
+from .utils import get_collection_name, import_background_plane
+from .run_variations import (
+    run_camera_settings,
+    run_image_settings,
+    run_light_settings,
+    run_scene_settings,
+)
+
+
+class SceneGraph:
+    def __init__(
+        self,
+        image_path: str,
+        bg_image_path: str = None,
+        use_bpy_ops: bool = True,
+        texture_cache=None,
+        timer=None,
+        resize_cache=None,
+    ):
+        self.image_path = image_path
+        self.bg_image_path = bg_image_path
+        self.use_bpy_ops = use_bpy_ops
+        self.texture_cache = texture_cache
+        self.timer = timer
+        self.resize_cache = resize_cache
+        self.camera = None
+        self.light = None
+        self.image = None
+        self.background_object = None
+
+    def apply_variation(
+        self,
+        scene_variation: namedtuple,
+        camera_variation: namedtuple,
+        light_variation: namedtuple,
+        image_variation: namedtuple,
+    ):
+        """
+        Applies a variation to the scene.
+        The scene is cleared only for the first variation, after that the existing objects are updated in place
+        """
+        with get_stage(self.timer, "scene"):
+            scene = run_scene_settings(
+                scene_variation=scene_variation,
+                clear_scene=self.camera is None,
+                use_bpy_ops=self.use_bpy_ops,
+            )
+        with get_stage(self.timer, "camera"):
+            self.camera = run_camera_settings(
+                camera_variation=camera_variation,
+                collection_name=get_collection_name(),
+                camera_object=self.camera,
+            )
+        with get_stage(self.timer, "light"):
+            self.light = run_light_settings(
+                light_variation=light_variation,
+                light_object=self.light,
+                use_bpy_ops=self.use_bpy_ops,
+            )
+        with get_stage(self.timer, "image"):
+            image_2d_coords, self.image = run_image_settings(
+                image_variation=image_variation,
+                path=self.image_path,
+                scene_variations=scene_variation,
+                image_object=self.image,
+                use_bpy_ops=self.use_bpy_ops,
+                texture_cache=self.texture_cache,
+                resize_cache=self.resize_cache,
+            )
+        return scene, image_2d_coords
+
+    def set_background(self, image_variation: namedtuple):
+        """
+        Shows the background image of the variation on the background plane.
+        The plane is hidden from the render when the variation has no background image
+        """
+        with get_stage(self.timer, "background"):
+            bg_image_name = image_variation.background_image_name
+            if not bg_image_name:
+                if self.background_object is not None:
+                    self.background_object.hide_render = True
+                return None
+            if self.background_object is None:
+                self.background_object = import_background_plane(
+                    image_variation,
+                    self.bg_image_path,
+                    self.use_bpy_ops,
+                    self.texture_cache,
+                )
+            else:
+                set_plane_image(
+                    self.background_object,
+                    os.path.join(self.bg_image_path, bg_image_name),
+                    self.texture_cache,
+                )
+                self.background_object.hide_render = False
+            return bg_image_name
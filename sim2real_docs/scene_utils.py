@@ -8,15 +8,18 @@ import bpy
 
 
 class Scene:
-    def __init__(self, scene_configs):
+    def __init__(self, scene_configs, use_bpy_ops: bool = True):
         self.scene_configs = scene_configs
+        self.use_bpy_ops = use_bpy_ops
 
     def clear_images(self):
         """
         The function clears the images in the data
+        Images with a fake user are kept, the texture cache uses it to keep images between variations
         """
-        for img in bpy.data.images:
-            bpy.data.images.remove(img)
+        for img in list(bpy.data.images):
+            if not img.use_fake_user:
+                bpy.data.images.remove(img)
 
     def clear_meshes(self):
         """
@@ -37,21 +40,32 @@ class Scene:
         Blender scene starts with a cube camera and a light object.
         Type of light is a parameter and will change on every iteration. Therefore the initial light objects are removed
         Cube object is deleted as it is not required.
+        Without bpy operators the objects are removed from bpy.data directly instead of selecting and deleting them
         """
         initial_objects = []
         for collection in bpy.data.collections:
             for obj in collection.all_objects:
                 initial_objects.append(obj.name)
-        for o in bpy.data.objects:
-            if o.name in initial_objects:
-                o.select_set(True)
-        # deleting all the selected objects
-        bpy.ops.object.delete(use_global=False)
+        if self.use_bpy_ops:
+            for o in bpy.data.objects:
+                if o.name in initial_objects:
+                    o.select_set(True)
+            # deleting all the selected objects
+            bpy.ops.object.delete(use_global=False)
+        else:
+            for name in set(initial_objects):
+                bpy.data.objects.remove(bpy.data.objects[name], do_unlink=True)
         self.clear_images()
         self.clear_light_points()
         self.clear_meshes()
         self.clear_material()
-        # resetting the scene borders
+        self.reset_render_settings()
+
+    def reset_render_settings(self):
+        """
+        Resets the scene borders, exposure and contrast to the values every variation starts from.
+        Used on its own when the scene objects are reused between variations instead of being cleared.
+        """
         bpy.context.scene.render.border_min_x = 0
         bpy.context.scene.render.border_min_y = 0
         bpy.context.scene.render.border_max_x = 1
@@ -82,6 +96,41 @@ class Scene:
     def set_render_engine(self):
         bpy.context.scene.render.engine = self.scene_configs.render_engine
 
+    def set_render_quality(self):
+        """
+        Setting samples, adaptive sampling, light bounces, denoiser, tile size and persistent data.
+        Settings that are None are left at the values of the blender file. Settings missing in the running
+        blender version are skipped
+        """
+        scene = bpy.context.scene
+        configs = self.scene_configs
+        if configs.samples is not None:
+            if scene.render.engine == "CYCLES":
+                scene.cycles.samples = configs.samples
+            elif hasattr(scene, "eevee"):
+                scene.eevee.taa_render_samples = configs.samples
+        if configs.adaptive_threshold is not None and hasattr(
+            scene.cycles, "use_adaptive_sampling"
+        ):
+            scene.cycles.use_adaptive_sampling = configs.adaptive_threshold > 0
+            scene.cycles.adaptive_threshold = configs.adaptive_threshold
+        if configs.max_bounces is not None:
+            scene.cycles.max_bounces = configs.max_bounces
+        if configs.denoiser is not None:
+            scene.cycles.use_denoising = configs.denoiser != "NONE"
+            if configs.denoiser != "NONE" and hasattr(scene.cycles, "denoiser"):
+                scene.cycles.denoiser = configs.denoiser
+        if configs.tile_size is not None:
+            if hasattr(scene.cycles, "tile_size"):
+                # blender 3.0 and later render with one tile size
+                scene.cycles.use_auto_tile = True
+                scene.cycles.tile_size = configs.tile_size
+            else:
+                scene.render.tile_x = configs.tile_size
+                scene.render.tile_y = configs.tile_size
+        if configs.persistent_data is not None:
+            scene.render.use_persistent_data = configs.persistent_data
+
     def set_color_mode(self):
         """
         Setting final image color mode - RGB, RGBA, BW
@@ -0,0 +1,123 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Segmentation masks of the document written by the same render as the image.
+The compositor graph writing the mask is built once and only the file slot path changes for every variation.
+With the multilayer format, no compositor nodes are used and the object index pass is saved with the image
+in one multilayer EXR file. Analytical masks (masks.py) need neither and work with EEVEE too.
+"""
+import os
+
+import bpy
+from bpy_extras.object_utils import world_to_camera_view
+
+# index of the document in the object index pass, the mask is the pass divided by it
+document_pass_index = 255
+# names of the compositor nodes owned by the segmentation graph
+output_node_name = "Segmentation Output"
+math_node_name = "Segmentation Divide"
+segmentation_formats = ["PNG", "OPEN_EXR_MULTILAYER"]
+
+
+class SegmentationGraph:
+    def __init__(self, segmentation_path: str, file_format: str = "PNG"):
+        """
+        With PNG, masks are written to segmentation_path next to the rendered images, named after the render names.
+        With OPEN_EXR_MULTILAYER, the rendered images are multilayer EXR files holding the image and the IndexOB pass
+        """
+        assert (
+            file_format in segmentation_formats
+        ), "Segmentation format should be one of {}".format(segmentation_formats)
+        self.segmentation_path = segmentation_path
+        self.file_format = file_format
+        self.output_node = None
+
+    def build(self):
+        """
+        Enables the object index pass and adds the divide and file output nodes, unless they are in the scene already
+        """
+        scene = bpy.context.scene
+        bpy.context.view_layer.use_pass_object_index = True
+        if self.file_format == "OPEN_EXR_MULTILAYER":
+            scene.render.image_settings.file_format = "OPEN_EXR_MULTILAYER"
+            return
+        scene.use_nodes = True
+        nodes = scene.node_tree.nodes
+        if output_node_name in nodes:
+            self.output_node = nodes[output_node_name]
+            self.output_node.base_path = self.segmentation_path
+            return
+        render_layers = nodes["Render Layers"]
+        self.output_node = nodes.new("CompositorNodeOutputFile")
+        self.output_node.name = output_node_name
+        self.output_node.base_path = self.segmentation_path
+        self.output_node.format.color_mode = "BW"
+        self.output_node.format.color_depth = "8"
+        math_node = nodes.new("CompositorNodeMath")
+        math_node.name = math_node_name
+        math_node.operation = "DIVIDE"
+        math_node.inputs[1].default_value = document_pass_index
+        links = scene.node_tree.links
+        links.new(render_layers.outputs["IndexOB"], math_node.inputs["Value"])
+        links.new(math_node.outputs["Value"], self.output_node.inputs["Image"])
+
+    def is_built(self):
+        if self.file_format == "OPEN_EXR_MULTILAYER":
+            file_format = bpy.context.scene.render.image_settings.file_format
+            return file_format == "OPEN_EXR_MULTILAYER"
+        node_tree = bpy.context.scene.node_tree
+        return node_tree is not None and output_node_name in node_tree.nodes
+
+    def set_frame(self, image_object, scene_variation, render_name: str):
+        """
+        Marks the document in the object index pass and names the mask of the frame after render_name
+        """
+        assert (
+            scene_variation.render_engine == "CYCLES"
+        ), "Render engine should be CYCLES not EEVEE"
+        if not self.is_built():
+            self.build()
+        image_object.pass_index = document_pass_index
+        if self.output_node is not None:
+            filename, _ = os.path.splitext(render_name)
+            self.output_node.file_slots[0].path = filename
+
+    def get_mask_file(self, render_name: str):
+        """
+        Path of the mask written for render_name, the file output node adds the frame number to the name
+        """
+        filename, _ = os.path.splitext(render_name)
+        return os.path.join(
+            self.segmentation_path,
+            "{}{:04d}.png".format(filename, bpy.context.scene.frame_current),
+        )
+
+    def clear(self):
+        """
+        Removes the nodes of the graph once all the variations are rendered
+        """
+        node_tree = bpy.context.scene.node_tree
+        if node_tree is None:
+            return
+        for name in [output_node_name, math_node_name]:
+            if name in node_tree.nodes:
+                node_tree.nodes.remove(node_tree.nodes[name])
+        self.output_node = None
+
+
+def get_document_view_polygons(image_object, camera_object):
+    """
+    Faces of the document plane in normalized view coordinates (x, y, depth) of the camera, as evaluated in the
+    current frame. Used to rasterize analytical masks with masks.get_document_mask
+    """
+    scene = bpy.context.scene
+    vertices = [
+        world_to_camera_view(
+            scene, camera_object, image_object.matrix_world @ vertex.co
+        )
+        for vertex in image_object.data.vertices
+    ]
+    return [
+        [tuple(vertices[i]) for i in polygon.vertices]
+        for polygon in image_object.data.polygons
+    ]
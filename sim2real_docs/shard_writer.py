@@ -0,0 +1,154 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Rolling tar shards of the rendered samples, in the layout of WebDataset.
+The rendered image, its mask and its metadata record are added to the current shard as {key}.png, {key}.mask.png and
+{key}.json, a new shard is started once the shard reaches its maximum size. Every sample is written to an index
+with its shard, byte offset and size, so samples can be read sequentially or looked up without listing the tar files.
+"""
+import glob
+import io
+import json
+import os
+import tarfile
+
+# name of the index of a writer, next to its shards
+index_extension = ".index.jsonl"
+
+
+def get_sample_key(render_name: str):
+    """
+    Key of a rendered sample, the render name without extension. Dots are replaced as loaders split the
+    member names of a sample at the first dot of the file name
+    """
+    name, _ = os.path.splitext(render_name)
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, filename.replace(".", "_"))
+
+
+def read_index(shard_path: str):
+    """
+    Index entries of all the shards in shard_path, in the order they were written by each writer
+    """
+    entries = []
+    for index_path in sorted(
+        glob.glob(os.path.join(shard_path, "*" + index_extension))
+    ):
+        with open(index_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def read_sample(shard_path: str, entry: dict):
+    """
+    Reads the files of one sample of the index with a single seek, returns {member extension: bytes}
+    """
+    with open(os.path.join(shard_path, entry["shard"]), "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["size"])
+    sample = {}
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        for member in tar:
+            extension = member.name[len(entry["key"]) + 1 :]
+            sample[extension] = tar.extractfile(member).read()
+    return sample
+
+
+class ShardWriter:
+    def __init__(
+        self,
+        shard_path: str,
+        max_shard_size_mb: float = 1024,
+        prefix: str = "shard",
+        resume: bool = False,
+    ):
+        """
+        Shards are written to shard_path as {prefix}-000000.tar, {prefix}-000001.tar... and indexed in
+        {prefix}.index.jsonl. With resume, new shards are added after the ones of the previous run
+        """
+        self.shard_path = shard_path
+        self.max_shard_size_bytes = int(max_shard_size_mb * 1024 * 1024)
+        self.prefix = prefix
+        self.index_path = os.path.join(shard_path, prefix + index_extension)
+        self.shard_number = 0
+        if resume:
+            self.shard_number = len(
+                glob.glob(os.path.join(shard_path, "{}-*.tar".format(prefix)))
+            )
+        self.index_file = open(self.index_path, "a" if resume else "w")
+        if resume and self.index_file.tell() > 0:
+            # starting on a new line in case the last line was partially written
+            self.index_file.write("\n")
+        self.shard_file = None
+        self.tar = None
+        self.shard_name = None
+        self.n_samples = 0
+
+    def open_shard(self):
+        self.shard_name = "{}-{:06d}.tar".format(self.prefix, self.shard_number)
+        self.shard_number += 1
+        self.shard_file = open(os.path.join(self.shard_path, self.shard_name), "wb")
+        self.tar = tarfile.open(fileobj=self.shard_file, mode="w")
+
+    def close_shard(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.shard_file.close()
+        self.tar = None
+        self.shard_file = None
+
+    def add_sample(
+        self, render_name: str, files: dict, record: dict, remove_files: bool = True
+    ):
+        """
+        Adds a sample to the current shard. files maps member extensions, e.g. "png" or "mask.png", to the files
+        rendered for the sample, record is written as the json member. With remove_files, the files are removed
+        once they are in the shard. Returns the name of the image member as shard/member
+        """
+        key = get_sample_key(render_name)
+        members = list(files.items())
+        record_bytes = json.dumps(record).encode("utf-8")
+        sample_size = sum(os.path.getsize(filepath) for _, filepath in members)
+        sample_size += len(record_bytes)
+        if (
+            self.tar is not None
+            and self.shard_file.tell() + sample_size > self.max_shard_size_bytes
+        ):
+            self.close_shard()
+        if self.tar is None:
+            self.open_shard()
+        offset = self.shard_file.tell()
+        names = []
+        for extension, filepath in members:
+            names.append("{}.{}".format(key, extension))
+            self.tar.add(filepath, arcname=names[-1], recursive=False)
+        names.append("{}.json".format(key))
+        member = tarfile.TarInfo(names[-1])
+        member.size = len(record_bytes)
+        self.tar.addfile(member, io.BytesIO(record_bytes))
+        self.shard_file.flush()
+        entry = {
+            "key": key,
+            "shard": self.shard_name,
+            "offset": offset,
+            "size": self.shard_file.tell() - offset,
+            "members": names,
+        }
+        self.index_file.write(json.dumps(entry) + "\n")
+        self.index_file.flush()
+        self.n_samples += 1
+        if remove_files:
+            for _, filepath in members:
+                os.remove(filepath)
+        return os.path.join(self.shard_name, names[0])
+
+    def close(self):
+        self.close_shard()
+        self.index_file.close()
+
+    def get_stats(self):
+        return {"samples": self.n_samples, "shards": self.shard_number}
@@ -0,0 +1,99 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+This script defines a least recently used cache of blender images.
+Document and background images are decoded once and kept in bpy.data between variations instead of being
+imported again for every rendering.
+"""
+import os
+from collections import OrderedDict
+
+import bpy
+
+
+class TextureCache:
+    def __init__(self, max_size_mb: float = 2048):
+        """
+        max_size_mb is the memory budget of the decoded images kept in the cache
+        """
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (file path, modified time) -> (blender image name, size in bytes)
+        self.images = OrderedDict()
+
+    def get_image(self, image_filepath: str):
+        """
+        Returns the blender image for the file, loading it only if it is not in the cache or the file changed on disk
+        """
+        image_filepath = os.path.abspath(image_filepath)
+        key = (image_filepath, os.path.getmtime(image_filepath))
+        if key in self.images and self.images[key][0] in bpy.data.images:
+            self.hits += 1
+            self.images.move_to_end(key)
+            return bpy.data.images[self.images[key][0]]
+        self.misses += 1
+        self.remove_path(image_filepath)
+        image = bpy.data.images.load(image_filepath, check_existing=False)
+        # fake user keeps the image when the scene is cleared
+        image.use_fake_user = True
+        image_size = get_image_size_bytes(image)
+        self.images[key] = (image.name, image_size)
+        self.size_bytes += image_size
+        self.evict()
+        return image
+
+    def remove_path(self, image_filepath: str):
+        """
+        Removes cached images of a file, used when the file was modified since it was cached
+        """
+        for key in [key for key in self.images if key[0] == image_filepath]:
+            self.remove(key)
+
+    def remove(self, key):
+        image_name, image_size = self.images.pop(key)
+        self.size_bytes -= image_size
+        if image_name in bpy.data.images:
+            bpy.data.images.remove(bpy.data.images[image_name])
+
+    def evict(self):
+        """
+        Removes least recently used images until the cache fits the memory budget.
+        Images still used by a material in the scene are kept.
+        """
+        for key in list(self.images):
+            if self.size_bytes <= self.max_size_bytes:
+                break
+            image_name = self.images[key][0]
+            if image_name in bpy.data.images and bpy.data.images[image_name].users > 1:
+                continue
+            self.remove(key)
+            self.evictions += 1
+
+    def clear(self):
+        for key in list(self.images):
+            self.remove(key)
+
+    def get_stats(self):
+        """
+        Returns hit and miss statistics of the cache
+        """
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests > 0 else 0.0,
+            "evictions": self.evictions,
+            "images": len(self.images),
+            "size_mb": self.size_bytes / (1024 * 1024),
+        }
+
+
+def get_image_size_bytes(image):
+    """
+    Estimates memory used by the decoded image
+    """
+    bytes_per_channel = 4 if image.is_float else 1
+    return image.size[0] * image.size[1] * image.channels * bytes_per_channel
@@ -0,0 +1,146 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+"""
+Per stage timing of the render loop.
+Wall time of every stage of a variation (scene, camera, light, image, background, segmentation, render, write and
+clear) is written to a CSV or JSON Lines log together with peak memory and the number of blocks in bpy.data.
+Every Nth frame can be profiled with cProfile.
+"""
+import contextlib
+import cProfile
+import csv
+import json
+import os
+import sys
+import time
+
+# stages recorded for every variation, in the order they run
+timing_stages = [
+    "scene",
+    "camera",
+    "light",
+    "image",
+    "background",
+    "segmentation",
+    "render",
+    "write",
+    "clear_scene",
+    "render_batch",
+]
+# bpy.data collections counted after every variation, growing counts show blocks that are not removed
+data_blocks = [
+    "objects",
+    "meshes",
+    "materials",
+    "images",
+    "lights",
+    "cameras",
+    "textures",
+    "node_groups",
+    "actions",
+    "collections",
+]
+
+
+def get_peak_rss_mb():
+    """
+    Peak resident memory of the process in MB, None where the resource module is not available
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def get_data_block_counts():
+    import bpy
+
+    return {
+        "data_{}".format(name): len(getattr(bpy.data, name)) for name in data_blocks
+    }
+
+
+def get_stage(timer, stage_name: str):
+    """
+    Context manager timing a stage, does nothing when there is no timer
+    """
+    if timer is None:
+        return contextlib.nullcontext()
+    return timer.stage(stage_name)
+
+
+class StageTimer:
+    def __init__(
+        self, log_path: str, profile_every: int = None, profile_path: str = None
+    ):
+        """
+        The log is written as CSV when log_path ends with .csv and as JSON Lines otherwise.
+        With profile_every, every Nth frame is profiled and the statistics are dumped to profile_path
+        """
+        self.log_path = log_path
+        self.profile_every = profile_every
+        self.profile_path = (
+            profile_path
+            if profile_path is not None
+            else os.path.join(os.path.dirname(os.path.abspath(log_path)), "profiles")
+        )
+        self.columns = (
+            ["frame", "render_name"]
+            + timing_stages
+            + ["total", "peak_rss_mb"]
+            + ["data_{}".format(name) for name in data_blocks]
+        )
+        self.log_file = open(log_path, "w", newline="")
+        self.csv_writer = None
+        if log_path.lower().endswith(".csv"):
+            self.csv_writer = csv.DictWriter(
+                self.log_file, fieldnames=self.columns, restval=""
+            )
+            self.csv_writer.writeheader()
+        self.frame = 0
+        self.record = None
+        self.profile = None
+
+    def start_frame(self, render_name: str):
+        self.record = {"frame": self.frame, "render_name": render_name}
+        self.frame_start = time.perf_counter()
+        if self.profile_every is not None and self.frame % self.profile_every == 0:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    @contextlib.contextmanager
+    def stage(self, stage_name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record[stage_name] = self.record.get(stage_name, 0.0) + elapsed
+
+    def end_frame(self):
+        """
+        Writes the timings of the frame with memory and bpy.data statistics to the log
+        """
+        self.record["total"] = time.perf_counter() - self.frame_start
+        if self.profile is not None:
+            self.profile.disable()
+            name, _ = os.path.splitext(self.record["render_name"])
+            profile_file = os.path.join(self.profile_path, "{}.prof".format(name))
+            os.makedirs(os.path.dirname(profile_file), exist_ok=True)
+            self.profile.dump_stats(profile_file)
+            self.profile = None
+        self.record["peak_rss_mb"] = get_peak_rss_mb()
+        self.record.update(get_data_block_counts())
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(self.record)
+        else:
+            self.log_file.write(json.dumps(self.record) + "\n")
+        self.log_file.flush()
+        self.frame += 1
+        self.record = None
+
+    def close(self):
+        self.log_file.close()
@@ -1,14 +1,15 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: Apache-2.0
 """
-Below functions are defined in the scripts 
-    1) Add-on installations 
+Below functions are defined in the scripts
+    1) Add-on installations
     2) Setting rendering device - GPU/CPU
     3) Rendering scene
     4) Setting viewport - as renderview mode
     5) Finding document bounding boxes in final rendered image
     6) Adding background image to scene
 """
+
 import os
 import math
 from collections import namedtuple
@@ -17,6 +18,17 @@ import bpy
 import numpy as np
 from bpy_extras.object_utils import world_to_camera_view
 
+from .file_utils import (
+    check_path_exists,
+    create_dir,
+    create_parent_dir,
+    get_output_name,
+    image_format_extensions,
+)
+from .image_utils import create_image_plane
+from .timing import get_stage
+
+
 def install_addons(add_on_filepaths: dict = None):
     """
     Install add-ons provided by the user as well as some default add ons
@@ -39,9 +51,9 @@ def set_render_device(device_type):
     """
     if device_type == "GPU":
         bpy.context.scene.cycles.device = "GPU"
-        bpy.context.preferences.addons[
-            "cycles"
-        ].preferences.compute_device_type = "CUDA"
+        bpy.context.preferences.addons["cycles"].preferences.compute_device_type = (
+            "CUDA"
+        )
         prefs = bpy.context.preferences.addons["cycles"].preferences
         print("The computing device is {}".format(prefs.compute_device_type))
         for device in prefs.devices:
@@ -51,14 +63,111 @@ def set_render_device(device_type):
         bpy.context.scene.cycles.device = "CPU"
 
 
-def render_scene(save_path: str, image_name: str, camera_name: str):
+def set_render_threads(threads: int = None):
+    """
+    Pins the number of threads used for rendering. The scene setting is left unchanged when threads is None
     """
-    Renders the entire scene.
+    if threads is not None:
+        bpy.context.scene.render.threads_mode = "FIXED"
+        bpy.context.scene.render.threads = threads
+
+
+def set_render_time_limit(time_limit: float = None):
+    """
+    Limits the sampling time of every cycles render in seconds, sampling stops early when the limit is reached.
+    The scene setting is left unchanged when time_limit is None
+    """
+    if time_limit is not None and hasattr(bpy.context.scene.cycles, "time_limit"):
+        bpy.context.scene.cycles.time_limit = time_limit
+
+
+def get_retry_samples(samples: int, n_timeouts: int):
     """
-    bpy.ops.object.select_all(action="DESELECT")
-    bpy.data.objects[camera_name].select_set(True)
-    bpy.context.scene.render.filepath = os.path.join(save_path, image_name)
-    bpy.ops.render.render(write_still=True)
+    Samples of a variation rendered again after n_timeouts timeouts, halved for every timeout.
+    When the variation does not set samples, the samples of the scene are used
+    """
+    if samples is None:
+        samples = bpy.context.scene.cycles.samples
+    return max(1, samples // 2**n_timeouts)
+
+
+def get_render_settings():
+    """
+    Settings of the scene that change the rendered images but are not variation parameters, with the blender version
+    """
+    scene = bpy.context.scene
+    image_settings = scene.render.image_settings
+    return {
+        "blender_version": bpy.app.version_string,
+        "render_engine": scene.render.engine,
+        "file_format": image_settings.file_format,
+        "color_depth": image_settings.color_depth,
+        "compression": image_settings.compression,
+        "time_limit": getattr(scene.cycles, "time_limit", None),
+    }
+
+
+def render_scene(
+    save_path: str,
+    image_name: str,
+    camera_name: str,
+    use_bpy_ops: bool = True,
+    timer=None,
+    image_writer=None,
+):
+    """
+    Renders the entire scene and returns the name of the rendered file in save_path.
+    Selection does not change the render, so it is skipped when bpy operators are not used
+    With a timer, the render result is saved separately so that render and file write are timed as different stages
+    With an image_writer, the render result is saved uncompressed to its staging directory and written to save_path
+    by its threads, the write stage only times the staging save and the wait for a free slot
+    """
+    if use_bpy_ops:
+        bpy.ops.object.select_all(action="DESELECT")
+        bpy.data.objects[camera_name].select_set(True)
+    output_name = get_output_name(
+        image_name, bpy.context.scene.render.image_settings.file_format
+    )
+    # write_still and save_render write the same file, whether the render is timed or not
+    output_filepath = os.path.join(save_path, output_name)
+    bpy.context.scene.render.filepath = output_filepath
+    if image_writer is not None:
+        with get_stage(timer, "render"):
+            bpy.ops.render.render()
+        with get_stage(timer, "write"):
+            staging_file = image_writer.get_staging_file(image_name)
+            save_staging_render(staging_file)
+            return image_writer.submit(staging_file, image_name)
+    if timer is None:
+        bpy.ops.render.render(write_still=True)
+        return output_name
+    with timer.stage("render"):
+        bpy.ops.render.render()
+    with timer.stage("write"):
+        create_parent_dir(output_filepath)
+        bpy.data.images["Render Result"].save_render(filepath=output_filepath)
+    return output_name
+
+
+def save_staging_render(staging_file: str):
+    """
+    Saves the render result as an uncompressed 8 bit png, the image settings of the scene are restored afterwards
+    """
+    image_settings = bpy.context.scene.render.image_settings
+    settings = (
+        image_settings.file_format,
+        image_settings.color_depth,
+        image_settings.compression,
+    )
+    image_settings.file_format = "PNG"
+    image_settings.color_depth = "8"
+    image_settings.compression = 0
+    bpy.data.images["Render Result"].save_render(filepath=staging_file)
+    (
+        image_settings.file_format,
+        image_settings.color_depth,
+        image_settings.compression,
+    ) = settings
 
 
 def set_render_viewport():
@@ -75,7 +184,8 @@ def image_3d_to_2d_coords(vertices, scene_configs):
     """
     This function converts 3d coordinates of an image object to 2d coordinates (pixel space)
     """
-    # aranging the coordinates according in the direction of top left, bottom left, bottom right, top right
+    # aranging the coordinates in the order top left, bottom left, top right, bottom right, as image_bbs
+    # (projection.get_quad_loops gives the loop order for drawing)
     # vertex_indices
     # 0 bottom left
     # 1 bottom right
@@ -114,30 +224,58 @@ def image_3d_to_2d_coords(vertices, scene_configs):
     return bbox_px
 
 
-def add_n_scale_background_image(image_variation: namedtuple, bg_image_path: str):
+def add_n_scale_background_image(
+    image_variation: namedtuple,
+    bg_image_path: str,
+    use_bpy_ops: bool = True,
+    texture_cache=None,
+):
     """
     This function adds a background image to the scene.
     The image added here is scaled to a fixed dimensions for it to appear as background images
     The assumption is that original image dimension is not greater than (4,0,4.0, 4.0). The dimensions here are in meters
     """
+    import_background_plane(image_variation, bg_image_path, use_bpy_ops, texture_cache)
+    return image_variation.background_image_name
+
+
+def import_background_plane(
+    image_variation: namedtuple,
+    bg_image_path: str,
+    use_bpy_ops: bool = True,
+    texture_cache=None,
+):
+    """
+    This function imports the background image as a plane, scales it and returns the plane object
+    Without bpy operators the plane is built through bpy.data
+    """
     bg_image_name = image_variation.background_image_name
     bg_scale_x, bg_scale_y, bg_scale_z = (4.0, 4.0, 0.010)
-    bpy.ops.import_image.to_plane(
-        files=[
-            {
-                "name": "{}".format(bg_image_name),
-            }
-        ],
-        directory=bg_image_path,
-        relative=False,
-    )
-    bg_object_name = bpy.context.view_layer.objects.active.name
-    bg_image = bpy.data.objects[bg_object_name]
+    bg_image_filepath = os.path.join(bg_image_path, bg_image_name)
+    if use_bpy_ops:
+        if texture_cache is not None:
+            # the add-on reuses an image already loaded from the same file
+            texture_cache.get_image(bg_image_filepath)
+        bpy.ops.import_image.to_plane(
+            files=[
+                {
+                    "name": "{}".format(bg_image_name),
+                }
+            ],
+            directory=bg_image_path,
+            relative=False,
+        )
+        bg_object_name = bpy.context.view_layer.objects.active.name
+        bg_image = bpy.data.objects[bg_object_name]
+    else:
+        name, _ = os.path.splitext(bg_image_name)
+        bg_image = create_image_plane(bg_image_filepath, name[:63], texture_cache)
     bg_image.scale[0] = bg_scale_x
     bg_image.scale[1] = bg_scale_y
     bg_image.scale[2] = bg_scale_z
-    bpy.ops.object.select_all(action="DESELECT")
-    return bg_image_name
+    if use_bpy_ops:
+        bpy.ops.object.select_all(action="DESELECT")
+    return bg_image
 
 
 def get_collection_name():
@@ -151,26 +289,6 @@ def get_collection_name():
     return collection_name
 
 
-def create_dir(path: str):
-    """
-    This function creates a directory for the path specified
-    """
-    if not os.path.exists(path):
-        os.mkdir(path)
-
-
-def check_path_exists(path: str):
-    """
-    Function to check if input path exists
-    """
-    assert isinstance(path, str), "Input path should be a string"
-    try:
-        if os.path.exists(path):
-            print("Input path exists")
-    except:
-        print("Provided input path does not exists")
-
-
 def clear_segmentation_nodes(segmentation_path: str, comp_nodes):
     for node in list(comp_nodes):
         if node.name not in ["Composite", "Render Layers"]:
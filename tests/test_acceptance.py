@@ -0,0 +1,58 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+
+from sim2real_docs.acceptance import (
+    clip_polygons,
+    get_polygon_areas,
+    get_quad_statistics,
+)
+
+
+def get_quad(left, top, right, bottom):
+    """
+    Axis aligned quad in the corner order of project_document_quads - top left, bottom left, top right, bottom right
+    """
+    return [[left, top], [left, bottom], [right, top], [right, bottom]]
+
+
+def test_clip_polygons():
+    square = np.array([[[-10, 0], [10, 0], [10, 10], [-10, 10]]], dtype=float)
+    clipped = clip_polygons(square, 0, np.zeros(1), keep_below=False)
+    assert np.allclose(get_polygon_areas(clipped), [100.0])
+    assert clipped[..., 0].min() == 0.0
+    outside = clip_polygons(square, 0, np.full(1, 20.0), keep_below=False)
+    assert np.allclose(get_polygon_areas(outside), [0.0])
+
+
+def test_fully_visible_quad():
+    quads = np.array([get_quad(10, 20, 90, 80)], dtype=float)
+    visible_fraction, visible_size, corners_out = get_quad_statistics(
+        quads, np.ones((1, 4)), np.array([[100, 100]])
+    )
+    assert np.allclose(visible_fraction, [1.0])
+    assert np.allclose(visible_size, [60.0])
+    assert corners_out.tolist() == [0]
+
+
+def test_partly_visible_quads():
+    quads = np.array(
+        [get_quad(-50, 0, 50, 100), get_quad(50, 50, 150, 150)], dtype=float
+    )
+    visible_fraction, visible_size, corners_out = get_quad_statistics(
+        quads, np.ones((2, 4)), np.array([[100, 100], [100, 100]])
+    )
+    assert np.allclose(visible_fraction, [0.5, 0.25])
+    assert np.allclose(visible_size, [50.0, 50.0])
+    assert corners_out.tolist() == [2, 3]
+
+
+def test_quad_behind_camera():
+    quads = np.array([get_quad(10, 20, 90, 80)], dtype=float)
+    depth = np.array([[1.0, 1.0, -1.0, 1.0]])
+    visible_fraction, visible_size, corners_out = get_quad_statistics(
+        quads, depth, np.array([[100, 100]])
+    )
+    assert visible_fraction.tolist() == [0.0]
+    assert visible_size.tolist() == [0.0]
+    assert corners_out.tolist() == [1]
@@ -0,0 +1,54 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import json
+import os
+
+from sim2real_docs.file_utils import (
+    get_output_name,
+    iter_files,
+    listing_cache,
+    manifest_name,
+)
+
+
+def test_output_name_replaces_image_extensions():
+    assert get_output_name("doc_0.jpg") == "doc_0.png"
+    assert get_output_name("doc_0.JPG") == "doc_0.png"
+    assert get_output_name("scans/doc_0.tif") == "scans/doc_0.png"
+    assert get_output_name("doc_0.png", "OPEN_EXR_MULTILAYER") == "doc_0.exr"
+
+
+def test_output_name_keeps_format_extensions():
+    assert get_output_name("doc_0.png") == "doc_0.png"
+    assert get_output_name("doc_0.PNG") == "doc_0.PNG"
+    assert get_output_name("doc_0.jpeg", "JPEG") == "doc_0.jpeg"
+
+
+def test_output_name_appends_extension():
+    assert get_output_name("doc_0") == "doc_0.png"
+    assert get_output_name("doc.v2_0") == "doc.v2_0.png"
+    assert get_output_name("doc_0.jpg", "UNKNOWN") == "doc_0.jpg"
+
+
+def test_listing_detects_changes_in_sub_directories(tmp_path):
+    os.makedirs(str(tmp_path / "scans" / "old"))
+    (tmp_path / "doc.png").write_bytes(b"")
+    (tmp_path / "scans" / "old" / "doc.jpg").write_bytes(b"")
+    listing_cache.clear()
+    expected = ["doc.png", os.path.join("scans", "old", "doc.jpg")]
+    assert list(iter_files(str(tmp_path), recursive=True)) == expected
+    # the listing is cached until a scanned directory is modified
+    assert list(iter_files(str(tmp_path), recursive=True)) == expected
+    (tmp_path / "scans" / "old" / "other.jpg").write_bytes(b"")
+    os.utime(str(tmp_path / "scans" / "old"), (1, 1))
+    assert len(list(iter_files(str(tmp_path), recursive=True))) == 3
+    assert list(iter_files(str(tmp_path))) == ["doc.png"]
+
+
+def test_manifest_without_recursive(tmp_path):
+    with open(str(tmp_path / manifest_name), "w") as f:
+        for path in ["doc.png", os.path.join("scans", "doc.jpg")]:
+            f.write(json.dumps({"path": path}) + "\n")
+    listing_cache.clear()
+    assert list(iter_files(str(tmp_path))) == ["doc.png"]
+    assert len(list(iter_files(str(tmp_path), recursive=True))) == 2
@@ -0,0 +1,37 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import json
+
+import pytest
+
+from sim2real_docs.journal import MetadataJournal, get_resume_seed
+
+
+def test_resume_seed(tmp_path):
+    save_path = str(tmp_path)
+    with pytest.raises(AssertionError):
+        get_resume_seed(save_path, resume=True)
+    run_seed = get_resume_seed(save_path)
+    # a resumed run samples the variations of the first run
+    assert get_resume_seed(save_path, resume=True) == run_seed
+    assert get_resume_seed(save_path, run_seed, resume=True) == run_seed
+    with pytest.raises(AssertionError):
+        get_resume_seed(save_path, run_seed + 1, resume=True)
+    assert get_resume_seed(save_path, 7) == 7
+
+
+def test_compact_leaves_out_dropped_variations(tmp_path):
+    save_path = str(tmp_path)
+    journal = MetadataJournal(save_path)
+    journal.append("doc_0.png", "doc_0.png", {"render_name": "doc_0.png"})
+    events = [{"type": "watchdog"}, {"type": "dropped", "timeouts": 1}]
+    journal.append("doc_1.png", None, {"render_name": "doc_1.png"}, events)
+    assert journal.compact(str(tmp_path / "metadata.json")) == 1
+    journal.close()
+    with open(str(tmp_path / "metadata.json")) as f:
+        assert json.load(f) == [{"render_name": "doc_0.png"}]
+    # the dropped variation stays in the journal and is not rendered again on resume
+    journal = MetadataJournal(save_path, resume=True)
+    assert journal.is_completed("doc_1.png")
+    assert journal.get_events("doc_1.png") == events
+    journal.close()
@@ -0,0 +1,77 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+from collections import namedtuple
+
+import numpy as np
+
+from sim2real_docs.masks import get_document_mask, get_mask_iou, rasterize_polygons
+
+Scene_tuple = namedtuple(
+    "Scene",
+    [
+        "resolution_x",
+        "resolution_y",
+        "resolution_percentage",
+        "crop_min_x",
+        "crop_max_x",
+        "crop_min_y",
+        "crop_max_y",
+    ],
+)
+
+
+def get_reference_mask(polygon, width: int, height: int):
+    """
+    Pixel centers inside a convex polygon, tested one pixel at a time
+    """
+    polygon = np.asarray(polygon, dtype=float)
+    mask = np.zeros((height, width), dtype=bool)
+    for y in range(height):
+        for x in range(width):
+            point = np.array([x + 0.5, y + 0.5])
+            crosses = []
+            for start, end in zip(polygon, np.roll(polygon, -1, axis=0)):
+                edge, offset = end - start, point - start
+                crosses.append(edge[0] * offset[1] - edge[1] * offset[0])
+            mask[y, x] = all(i >= 0 for i in crosses) or all(i <= 0 for i in crosses)
+    return mask
+
+
+def test_rectangle():
+    mask = rasterize_polygons([[(2, 1), (2, 5), (8, 5), (8, 1)]], 10, 8)
+    assert mask.sum() == 6 * 4
+    assert mask[1:5, 2:8].all()
+
+
+def test_winding_order_and_clipping():
+    polygon = [(-3.2, 1.7), (4.6, -2.1), (12.3, 6.8), (2.5, 9.9)]
+    mask = rasterize_polygons([polygon], 10, 8)
+    assert (mask == rasterize_polygons([polygon[::-1]], 10, 8)).all()
+    assert (mask == get_reference_mask(polygon, 10, 8)).all()
+
+
+def test_degenerate_polygons():
+    mask = rasterize_polygons([[(1, 1), (5, 5), (9, 9)], [(0, 0)] * 4], 10, 10)
+    assert not mask.any()
+
+
+def test_document_mask():
+    scene = Scene_tuple(200, 100, 50, 0.0, 1.0, 0.0, 1.0)
+    # the document covers the left half of the view, the second face is behind the camera
+    view_polygons = [
+        [(0.0, 0.0, 1.0), (0.5, 0.0, 1.0), (0.5, 1.0, 1.0), (0.0, 1.0, 1.0)],
+        [(0.5, 0.0, -1.0), (1.0, 0.0, -1.0), (1.0, 1.0, -1.0), (0.5, 1.0, -1.0)],
+    ]
+    mask = get_document_mask(view_polygons, scene)
+    assert mask.shape == (50, 100)
+    assert mask[:, :50].all()
+    assert not mask[:, 50:].any()
+
+
+def test_mask_iou():
+    mask = np.zeros((4, 4), dtype=bool)
+    other_mask = mask.copy()
+    assert get_mask_iou(mask, other_mask) == 1.0
+    mask[:2] = True
+    other_mask[1:3] = True
+    assert np.isclose(get_mask_iou(mask, other_mask), 1 / 3)
@@ -0,0 +1,47 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+import numpy as np
+import pytest
+
+from sim2real_docs.metadata_store import MetadataStore, write_store
+
+
+def get_records(n_records: int):
+    return [
+        {
+            "scene_configs": {"samples": i, "render_engine": "CYCLES"},
+            "image_configs": {
+                "render_name": "doc_{}.png".format(i),
+                "image_bbs": [[i, 0.5]] * 4,
+            },
+        }
+        for i in range(n_records)
+    ]
+
+
+def test_round_trip(tmp_path):
+    store_path = str(tmp_path / "metadata_store")
+    records = get_records(3)
+    assert write_store(records, store_path) == 3
+    store = MetadataStore(store_path)
+    assert list(store.iter_records()) == records
+    assert np.allclose(store.get_image_bbs()[:, 0, 0], [0, 1, 2])
+    store.close()
+    # a new store replaces the earlier one
+    write_store(get_records(1), store_path)
+    store = MetadataStore(store_path)
+    assert len(store) == 1
+    store.close()
+    assert os.listdir(str(tmp_path)) == ["metadata_store"]
+
+
+def test_directory_is_not_replaced(tmp_path):
+    store_path = tmp_path / "results"
+    os.makedirs(store_path / "images")
+    with open(store_path / "notes.txt", "w") as f:
+        f.write("notes")
+    with pytest.raises(AssertionError):
+        write_store(get_records(1), str(store_path))
+    assert sorted(os.listdir(store_path)) == ["images", "notes.txt"]
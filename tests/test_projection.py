@@ -0,0 +1,164 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import math
+
+import numpy as np
+
+from sim2real_docs.projection import (
+    default_sensor_width,
+    document_location,
+    get_quad_loops,
+    project_document_quads,
+)
+
+
+def get_matrix_world(location, rotation, scale):
+    """
+    Object matrix of blender, location @ euler XYZ rotation @ scale, rotation in radians
+    """
+    cos_x, sin_x = math.cos(rotation[0]), math.sin(rotation[0])
+    cos_y, sin_y = math.cos(rotation[1]), math.sin(rotation[1])
+    cos_z, sin_z = math.cos(rotation[2]), math.sin(rotation[2])
+    rotation_x = np.array([[1, 0, 0], [0, cos_x, -sin_x], [0, sin_x, cos_x]])
+    rotation_y = np.array([[cos_y, 0, sin_y], [0, 1, 0], [-sin_y, 0, cos_y]])
+    rotation_z = np.array([[cos_z, -sin_z, 0], [sin_z, cos_z, 0], [0, 0, 1]])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation_z @ rotation_y @ rotation_x @ np.diag(scale)
+    matrix[:3, 3] = location
+    return matrix
+
+
+def world_to_camera_view(camera_matrix, view_frame, coord):
+    """
+    Port of bpy_extras.object_utils.world_to_camera_view for a perspective camera
+    """
+    co_local = np.linalg.inv(camera_matrix) @ np.append(coord, 1.0)
+    z = -co_local[2]
+    if z == 0.0:
+        return np.array([0.5, 0.5, 0.0])
+    frame = [-(v / (v[2] / z)) for v in view_frame[:3]]
+    min_x, max_x = frame[2][0], frame[1][0]
+    min_y, max_y = frame[1][1], frame[0][1]
+    x = (co_local[0] - min_x) / (max_x - min_x)
+    y = (co_local[1] - min_y) / (max_y - min_y)
+    return np.array([x, y, z])
+
+
+def get_view_frame(focal_length, resolution, pixel_aspect):
+    """
+    Camera.view_frame(scene) with the AUTO sensor fit
+    """
+    aspect_x = resolution[0] * pixel_aspect[0]
+    aspect_y = resolution[1] * pixel_aspect[1]
+    if aspect_x >= aspect_y:
+        aspect = (1.0, aspect_y / aspect_x)
+    else:
+        aspect = (aspect_x / aspect_y, 1.0)
+    depth = -focal_length / (0.5 * default_sensor_width)
+    x, y = aspect
+    return [
+        np.array([x, y, depth]),
+        np.array([x, -y, depth]),
+        np.array([-x, -y, depth]),
+        np.array([-x, y, depth]),
+    ]
+
+
+def image_3d_to_2d_coords(vertices, view, resolution, resolution_percentage, crop):
+    """
+    Port of utils.image_3d_to_2d_coords with the camera of view
+    """
+    vertices = [vertices[i] for i in [2, 0, 3, 1]]
+    render_scale = int(resolution_percentage) / 100
+    render_size = (
+        int(resolution[0] * render_scale),
+        int(resolution[1] * render_scale),
+    )
+    crop_min_x, crop_max_x, crop_min_y, crop_max_y = crop
+    relative_crop_width = crop_max_x - crop_min_x
+    relative_crop_height = crop_max_y - crop_min_y
+    rendered_width = relative_crop_width * render_size[0]
+    rendered_height = relative_crop_height * render_size[1]
+    bbox_px = []
+    for coord in vertices:
+        x, y = view(coord)[:2]
+        bbox_px.append(
+            (
+                rendered_width * (x - crop_min_x) / relative_crop_width,
+                rendered_height
+                - rendered_height * (y - crop_min_y) / relative_crop_height,
+            )
+        )
+    return bbox_px
+
+
+def test_project_document_quads():
+    rng = np.random.default_rng(0)
+    n = 50
+    plane_aspects = rng.uniform(0.5, 1.5, n)
+    image_scale = rng.uniform(0.5, 2.0, (n, 3))
+    image_rotation = rng.uniform(-30, 30, (n, 3))
+    camera_location = np.stack(
+        [rng.uniform(-0.5, 0.5, n), rng.uniform(-0.5, 0.5, n), rng.uniform(2, 5, n)],
+        axis=-1,
+    )
+    camera_rotation = rng.uniform(-20, 20, (n, 3))
+    focal_length = rng.uniform(25, 80, n)
+    resolution = np.stack(
+        [rng.integers(400, 2000, n), rng.integers(400, 2000, n)], axis=-1
+    )
+    pixel_aspect = rng.uniform(0.8, 1.2, (n, 2))
+    resolution_percentage = rng.integers(50, 101, n)
+    crop = np.stack(
+        [
+            rng.uniform(0, 0.2, n),
+            rng.uniform(0.8, 1, n),
+            rng.uniform(0, 0.2, n),
+            rng.uniform(0.8, 1, n),
+        ],
+        axis=-1,
+    )
+    quads = project_document_quads(
+        plane_aspects,
+        image_scale,
+        image_rotation,
+        camera_location,
+        camera_rotation,
+        focal_length,
+        resolution,
+        pixel_aspect,
+        resolution_percentage,
+        crop,
+    )
+    for i in range(n):
+        # vertices of the imported plane - bottom left, bottom right, top left, top right
+        half_width = plane_aspects[i] / 2
+        local_vertices = [
+            (-half_width, -0.5, 0.0),
+            (half_width, -0.5, 0.0),
+            (-half_width, 0.5, 0.0),
+            (half_width, 0.5, 0.0),
+        ]
+        document_matrix = get_matrix_world(
+            document_location, np.radians(image_rotation[i]), image_scale[i]
+        )
+        vertices = [(document_matrix @ np.append(v, 1.0))[:3] for v in local_vertices]
+        camera_matrix = get_matrix_world(
+            camera_location[i], np.radians(camera_rotation[i]), (1.0, 1.0, 1.0)
+        )
+        view_frame = get_view_frame(focal_length[i], resolution[i], pixel_aspect[i])
+        expected = image_3d_to_2d_coords(
+            vertices,
+            lambda coord: world_to_camera_view(camera_matrix, view_frame, coord),
+            resolution[i],
+            resolution_percentage[i],
+            crop[i],
+        )
+        assert np.allclose(quads[i], expected, atol=1e-6)
+
+
+def test_quad_loops():
+    # top left, bottom left, top right, bottom right
+    quads = np.array([[[0, 0], [0, 10], [20, 0], [20, 10]]])
+    loops = get_quad_loops(quads)
+    assert loops.tolist() == [[[0, 0], [0, 10], [20, 10], [20, 0]]]
@@ -0,0 +1,95 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+from sim2real_docs.render_cache import RenderCache, get_output_format
+
+
+def get_record(render_name: str, samples: int = 16):
+    return {
+        "scene_configs": {"samples": samples},
+        "image_configs": {
+            "image_name": "doc.jpg",
+            "render_name": render_name,
+            "variation_seed": 1,
+            "image_bbs": [],
+        },
+    }
+
+
+def write_file(filepath, data: bytes):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(data)
+
+
+def test_key(tmp_path):
+    document = str(tmp_path / "doc.jpg")
+    write_file(document, b"document")
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    key = render_cache.get_key(get_record("doc_0.jpg"), [document])
+    assert key == render_cache.get_key(get_record("doc_1.jpg"), [document])
+    assert key != render_cache.get_key(get_record("doc_0.jpg", 32), [document])
+    write_file(document, b"other document")
+    assert key != render_cache.get_key(get_record("doc_0.jpg"), [document])
+
+
+def test_store_and_restore(tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    files = {
+        "image": str(tmp_path / "render" / "doc_0.png"),
+        "mask": str(tmp_path / "masks" / "doc_0.png"),
+    }
+    assert render_cache.restore("ab" * 20, files) is None
+    write_file(files["image"], b"image")
+    write_file(files["mask"], b"mask")
+    render_cache.store("ab" * 20, files, [[0, 0]] * 4, 2.0)
+    restored = {
+        "image": str(tmp_path / "render2" / "doc_0.png"),
+        "mask": str(tmp_path / "masks2" / "doc_0.png"),
+    }
+    entry = render_cache.restore("ab" * 20, restored)
+    assert entry["image_bbs"] == [[0, 0]] * 4
+    with open(restored["image"], "rb") as f:
+        assert f.read() == b"image"
+    # a variation rendered again does not write through the link into the cache
+    render_cache.release_output(restored)
+    assert not os.path.exists(restored["image"])
+    assert render_cache.restore("ab" * 20, dict(restored, seg="seg.png")) is None
+    assert render_cache.get_stats()["hits"] == 1
+
+
+def test_eviction(tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"), max_size_mb=0.01)
+    image = str(tmp_path / "render" / "image.png")
+    for i in range(5):
+        write_file(image, os.urandom(4000))
+        render_cache.store("{:040x}".format(i), {"image": image}, [], 1.0)
+    assert render_cache.size_bytes <= render_cache.max_size_bytes
+    assert render_cache.evictions > 0
+    # the most recent entry is kept
+    assert "{:040x}".format(4) in render_cache.entries
+    assert len(RenderCache(str(tmp_path / "cache")).entries) == len(
+        render_cache.entries
+    )
+
+
+def test_restore_multilayer_exr(tmp_path):
+    render_settings = {"file_format": get_output_format("PNG", "OPEN_EXR_MULTILAYER")}
+    render_cache = RenderCache(str(tmp_path / "cache"), render_settings=render_settings)
+    output_file = render_cache.get_output_file("doc_0.jpg")
+    assert output_file == "doc_0.exr"
+    image = str(tmp_path / "render" / output_file)
+    write_file(image, b"multilayer")
+    key = render_cache.get_key(get_record("doc_0.jpg"), [])
+    render_cache.store(key, {"image": image}, [], 1.0)
+    restored = str(tmp_path / "render2" / output_file)
+    assert render_cache.restore(key, {"image": restored}) is not None
+    with open(restored, "rb") as f:
+        assert f.read() == b"multilayer"
+    # renders of the png mode do not hit the exr entries
+    png_cache = RenderCache(
+        str(tmp_path / "cache"), render_settings={"file_format": "PNG"}
+    )
+    assert png_cache.get_output_file("doc_0.jpg") == "doc_0.png"
+    assert png_cache.get_key(get_record("doc_0.jpg"), []) != key
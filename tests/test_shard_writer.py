@@ -0,0 +1,30 @@
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+from sim2real_docs.file_utils import get_output_name
+from sim2real_docs.shard_writer import ShardWriter, read_index, read_sample
+
+
+def test_jpg_render_name(tmp_path):
+    save_path = tmp_path / "render"
+    shard_path = tmp_path / "shards"
+    os.makedirs(save_path / "scans")
+    os.makedirs(shard_path)
+    render_name = os.path.join("scans", "doc_0.jpg")
+    # the file blender writes for the render name
+    output_file = get_output_name(render_name)
+    with open(save_path / output_file, "wb") as f:
+        f.write(b"image")
+    shard_writer = ShardWriter(str(shard_path))
+    member = shard_writer.add_sample(
+        render_name, {"png": str(save_path / output_file)}, {"image_configs": {}}
+    )
+    shard_writer.close()
+    assert member == os.path.join("shard-000000.tar", "scans", "doc_0.png")
+    assert not os.path.exists(save_path / output_file)
+    entries = read_index(str(shard_path))
+    assert len(entries) == 1
+    sample = read_sample(str(shard_path), entries[0])
+    assert sample["png"] == b"image"
+    assert sample["json"] == b'{"image_configs": {}}'